@@ -22,3 +22,12 @@ def get_current_user_id(token: str = Depends(oauth2_scheme)) -> str:
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Could not validate credentials")
+
+# Users allowed on operational endpoints (/ws/stats, /metrics/queries), comma-separated;
+# unset, nobody is. They expose query text, table names and worker internals
+OPS_USER_IDS = {user_id.strip() for user_id in os.getenv("OPS_USER_IDS", "").split(",") if user_id.strip()}
+
+def get_ops_user_id(user_id: str = Depends(get_current_user_id)) -> str:
+    if user_id not in OPS_USER_IDS:
+        raise HTTPException(status_code=403, detail="Not allowed to read service metrics")
+    return user_id
@@ -0,0 +1,85 @@
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+from db import get_rows_by_ids
+
+# PostgREST puts the id list in the query string; keep each .in_() well under URL limits
+BATCH_LOADER_MAX_KEYS = int(os.getenv("BATCH_LOADER_MAX_KEYS", "200"))
+
+BatchFetch = Callable[[List[str]], Awaitable[Optional[Dict[str, Dict]]]]
+
+
+class BatchLoader:
+    """
+    DataLoader-style loader: every load(id) made in the same event-loop tick is
+    fetched with one query, and each id is fetched at most once per loader.
+    Create one per request (see get_loaders) so results never outlive it.
+    """
+
+    def __init__(self, fetch: BatchFetch, max_keys: int = None):
+        self.fetch = fetch
+        self.max_keys = max_keys or BATCH_LOADER_MAX_KEYS
+        self._results: Dict[str, asyncio.Future] = {}
+        self._queue: List[str] = []
+        self.batches = 0
+
+    def load(self, key: str) -> "asyncio.Future[Optional[Dict]]":
+        """Future resolving to the row for key, or None if it does not exist or the fetch failed."""
+        future = self._results.get(key)
+        if future is not None:
+            return future
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._results[key] = future
+        self._queue.append(key)
+        if len(self._queue) == 1:
+            # Runs after everything already scheduled in this tick has had its chance to load()
+            loop.call_soon(self._dispatch)
+        return future
+
+    async def load_many(self, keys: Iterable[str]) -> List[Optional[Dict]]:
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def prime(self, key: str, row: Dict):
+        """Seed a row fetched some other way so later loads reuse it."""
+        if key not in self._results:
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(row)
+            self._results[key] = future
+
+    def _dispatch(self):
+        keys, self._queue = self._queue, []
+        for start in range(0, len(keys), self.max_keys):
+            asyncio.create_task(self._fetch(keys[start:start + self.max_keys]))
+
+    async def _fetch(self, keys: List[str]):
+        self.batches += 1
+        try:
+            rows = await self.fetch(keys)
+        except Exception as e:
+            print(f"❌ Batch load of {len(keys)} keys failed: {e}")
+            rows = None
+
+        for key in keys:
+            future = self._results[key]
+            if rows is None:
+                # Forget the failure so a later load in the same request can retry
+                del self._results[key]
+            if not future.done():
+                future.set_result(rows.get(key) if rows is not None else None)
+
+
+class Loaders:
+    """The batch loaders of one request."""
+
+    def __init__(self):
+        self.profiles = BatchLoader(lambda ids: get_rows_by_ids("profiles", ids))
+        self.rooms = BatchLoader(lambda ids: get_rows_by_ids("rooms", ids))
+        self.projects = BatchLoader(lambda ids: get_rows_by_ids("app_projects", ids))
+
+
+async def get_loaders() -> Loaders:
+    """FastAPI dependency: fresh loaders for every request."""
+    return Loaders()
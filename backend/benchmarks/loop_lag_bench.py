@@ -0,0 +1,150 @@
+"""
+Event-loop lag under concurrent database load.
+
+Points the real Supabase client at a local stand-in PostgREST server that answers
+every request after a fixed delay, then runs N concurrent callers through the
+db.py functions the chat and notification routes use. A probe task measures how
+late the event loop wakes it up. Each run is made twice: with queries executed
+inline on the loop (the old behaviour) and offloaded to the db_executor pool.
+
+Run from backend/:
+    python -m benchmarks.loop_lag_bench
+    python -m benchmarks.loop_lag_bench --concurrency 100 --latency-ms 80 --duration 10
+    python -m benchmarks.loop_lag_bench --mode offload --json lag.json
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from supabase import create_client
+
+import db
+import db_executor
+from benchmarks.stats import summarize_ms
+
+PROBE_INTERVAL = 0.005
+
+
+class StandInPostgREST(BaseHTTPRequestHandler):
+    """Answers every PostgREST request with an empty result after `latency` seconds."""
+
+    latency = 0.05
+
+    def _reply(self):
+        time.sleep(self.latency)
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        body = b"[]"
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Range", "*/0")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_PATCH = do_HEAD = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stand_in(latency_ms: float) -> ThreadingHTTPServer:
+    StandInPostgREST.latency = latency_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInPostgREST)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def execute_inline(query):
+    # What every db.py helper did before: a blocking round trip on the event loop
+    return query.execute()
+
+
+# The mix of calls a logged-in user's page load makes
+CALLS = [
+    lambda i: db.get_user_conv(f"bench-user-{i}"),
+    lambda i: db.get_notifications(f"bench-user-{i}"),
+    lambda i: db.get_room_messages(f"bench-room-{i}"),
+    lambda i: db.get_last_message(f"bench-room-{i}"),
+]
+
+
+async def probe(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(max(0.0, time.perf_counter() - started - PROBE_INTERVAL))
+
+
+async def caller(index: int, deadline: float, latencies: list):
+    n = 0
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        await CALLS[(index + n) % len(CALLS)](index)
+        latencies.append(time.perf_counter() - started)
+        n += 1
+
+
+async def run_mode(mode: str, args) -> dict:
+    db.run_query = execute_inline if mode == "inline" else db_executor.run_query
+
+    lags, latencies = [], []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(stop, lags))
+
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*(caller(i, deadline, latencies) for i in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await probe_task
+
+    return {
+        "loop_lag": summarize_ms(lags),
+        "call_latency": summarize_ms(latencies),
+        "calls_per_second": round(len(latencies) / elapsed, 1),
+    }
+
+
+async def run(args) -> dict:
+    server = start_stand_in(args.latency_ms)
+    db.supabase = create_client(f"http://127.0.0.1:{server.server_address[1]}", "bench-key")
+
+    modes = ["inline", "offload"] if args.mode == "both" else [args.mode]
+    report = {"config": vars(args), "db_threadpool_size": db_executor.DB_THREADPOOL_SIZE}
+    for mode in modes:
+        # db.py logs every call; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            report[mode] = await run_mode(mode, args)
+    report["executor"] = db_executor.get_executor_stats()
+
+    server.shutdown()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure event-loop lag under concurrent Supabase calls")
+    parser.add_argument("--concurrency", type=int, default=50, help="concurrent callers")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="stand-in PostgREST response time")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per mode")
+    parser.add_argument("--mode", choices=("both", "inline", "offload"), default="both")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
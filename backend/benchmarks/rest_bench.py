@@ -0,0 +1,430 @@
+"""
+End-to-end REST benchmark for every router main.py mounts.
+
+Seeds the in-process fake Supabase backend (SUPABASE_BACKEND=fake) with a
+deterministic dataset of roughly 1k, 100k or 1M rows, then drives main.app over
+ASGI: chat_app, community_app, search_app, notifrouter and the feed and project
+routes in main.py. Each endpoint gets its own timed run, recording throughput,
+p50/p95/p99 latency, database queries per request (X-DB-Query-Count) and RSS.
+
+Run from backend/:
+    python -m benchmarks.rest_bench --scale 1k
+    python -m benchmarks.rest_bench --scale 100k --json baseline.json
+    python -m benchmarks.rest_bench --scale 100k --compare baseline.json --threshold 0.25
+    python -m benchmarks.rest_bench --scale 1k --only feed,search_devs
+
+Each endpoint is run --repeat times and, as timeit does, the best result is
+kept: the lowest latency distribution and the highest throughput. With --compare the run exits with
+status 1 if any endpoint's p95 grew (by more than --min-delta-ms too), or its
+throughput dropped, by more than --threshold, if it makes more queries per
+request, or if it started failing. The fake backend scans Python lists where
+Postgres would use indexes, so only compare against baselines recorded with the
+same scale on the same machine.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+BENCH_SECRET = "rest-bench-secret-rest-bench-secret-00"
+os.environ["SUPABASE_BACKEND"] = "fake"
+os.environ.setdefault("SUPABASE_URL", "http://fake-supabase.local")
+os.environ.setdefault("SUPABASE_KEY", "bench-key")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "bench-key")
+os.environ.setdefault("SUPABASE_JWT_SECRET", BENCH_SECRET)
+os.environ.setdefault("SUPABASE_PROJECT_ID", "bench")
+os.environ.setdefault("OPENROUTER_API_KEY", "bench-key")
+os.environ.setdefault("EMAIL_ADDRESS", "bench@example.com")
+os.environ.setdefault("EMAIL_PASSWORD", "bench")
+
+import httpx
+import jwt
+
+# Every module logs on import and on each call; keep the report readable
+with contextlib.redirect_stdout(io.StringIO()):
+    import main
+    from fake_supabase import get_fake_database
+
+from benchmarks.stats import summarize_ms, rss_bytes, peak_rss_bytes
+
+SCALES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+# Share of the total row count that goes to each table
+SHARES = {
+    "messages": 0.35,
+    "likes": 0.15,
+    "comments": 0.12,
+    "notifications": 0.10,
+    "posts": 0.08,
+    "connections": 0.05,
+    "project_members": 0.04,
+    "projects": 0.01,
+}
+PROFILE_SHARE = 0.02
+MIN_PROFILES = 50
+COMMUNITY_MEMBERS = 20
+
+# Extra queries per request, on average, that --compare still accepts
+QUERY_TOLERANCE = 0.5
+
+DOMAINS = ["web", "mobile", "ai", "data", "devops", "games", "security", "blockchain"]
+DIFFICULTIES = ["beginner", "intermediate", "advanced", "expert"]
+SKILLS = ["python", "react", "rust", "go", "sql", "docker", "kotlin", "swift", "typescript", "ml"]
+WORDS = ["build", "ship", "scale", "debug", "deploy", "design", "refactor", "test", "learn", "review"]
+NAMES = ["Ada", "Linus", "Grace", "Alan", "Barbara", "Dennis", "Margaret", "Ken", "Radia", "Guido"]
+
+EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+class Dataset:
+    """Ids of the seeded rows the scenarios draw their requests from."""
+
+    def __init__(self):
+        self.users = []
+        self.private_rooms = []       # (room_id, user1_id, user2_id)
+        self.communities = []         # (room_id, [member ids])
+        self.posts = []
+        self.counts = {}
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _timestamp(rng: random.Random) -> str:
+    return (EPOCH + timedelta(seconds=rng.randrange(365 * 24 * 3600))).isoformat()
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def _pairs(rng: random.Random, count: int, left: list, right: list) -> set:
+    """Up to `count` distinct (left, right) pairs with left != right."""
+    pairs = set()
+    for _ in range(count * 2):
+        if len(pairs) >= count:
+            break
+        a, b = rng.choice(left), rng.choice(right)
+        if a != b:
+            pairs.add((a, b))
+    return pairs
+
+
+def seed(database, total: int, rng: random.Random) -> Dataset:
+    data = Dataset()
+    n = {table: max(1, int(total * share)) for table, share in SHARES.items()}
+    n_users = max(MIN_PROFILES, int(total * PROFILE_SHARE))
+
+    profiles = []
+    for i in range(n_users):
+        user_id = _uuid(rng)
+        name = f"{rng.choice(NAMES)} {i}"
+        profiles.append({
+            "id": user_id, "username": f"dev{i}", "full_name": name, "email": f"dev{i}@example.com",
+            "bio": _sentence(rng, 8), "skills": rng.sample(SKILLS, 3), "created_at": _timestamp(rng),
+        })
+        data.users.append(user_id)
+    database.seed("profiles", profiles)
+    users = data.users
+
+    # Every user has about two private conversations, and a handful of communities
+    rooms, private_rooms, members = [], [], []
+    for i in range(n_users):
+        room_id = _uuid(rng)
+        user1, user2 = users[i], users[(i + 1 + rng.randrange(n_users - 1)) % n_users]
+        rooms.append({"id": room_id, "name": f"dm-{i}", "type": "private", "created_by": user1,
+                      "created_at": _timestamp(rng)})
+        private_rooms.append({"id": _uuid(rng), "room_id": room_id, "user1_id": user1, "user2_id": user2})
+        members += [{"id": _uuid(rng), "room_id": room_id, "user_id": user, "role": "member"}
+                    for user in (user1, user2)]
+        data.private_rooms.append((room_id, user1, user2))
+
+    for i in range(max(5, n_users // 20)):
+        room_id = _uuid(rng)
+        community = rng.sample(users, min(COMMUNITY_MEMBERS, n_users))
+        rooms.append({"id": room_id, "name": f"community {i}", "type": rng.choice(["group", "private_group"]),
+                      "description": _sentence(rng, 6), "created_by": community[0], "created_at": _timestamp(rng)})
+        members += [{"id": _uuid(rng), "room_id": room_id, "user_id": user,
+                     "role": "admin" if j == 0 else "member"} for j, user in enumerate(community)]
+        data.communities.append((room_id, community))
+    database.seed("rooms", rooms)
+    database.seed("private_rooms", private_rooms)
+    database.seed("room_members", members)
+
+    room_ids = [room["id"] for room in rooms]
+    room_users = {room_id: [] for room_id in room_ids}
+    for member in members:
+        room_users[member["room_id"]].append(member["user_id"])
+    messages = []
+    for _ in range(n["messages"]):
+        room_id = rng.choice(room_ids)
+        messages.append({"id": _uuid(rng), "room_id": room_id, "sender_id": rng.choice(room_users[room_id]),
+                         "content": _sentence(rng, 10), "created_at": _timestamp(rng)})
+    database.seed("messages", messages)
+
+    posts = [{"id": _uuid(rng), "author_id": rng.choice(users), "content": _sentence(rng, 20),
+              "tags": rng.sample(SKILLS, 2), "created_at": _timestamp(rng)} for _ in range(n["posts"])]
+    data.posts = [post["id"] for post in posts]
+    likes = [{"id": _uuid(rng), "post_id": post_id, "user_id": user_id, "created_at": _timestamp(rng)}
+             for post_id, user_id in _pairs(rng, n["likes"], data.posts, users)]
+    comments = [{"id": _uuid(rng), "post_id": rng.choice(data.posts), "user_id": rng.choice(users),
+                 "text": _sentence(rng, 8), "created_at": _timestamp(rng)} for _ in range(n["comments"])]
+    # Seeding skips triggers, so the counters are filled in here
+    like_counts, comment_counts = {}, {}
+    for like in likes:
+        like_counts[like["post_id"]] = like_counts.get(like["post_id"], 0) + 1
+    for comment in comments:
+        comment_counts[comment["post_id"]] = comment_counts.get(comment["post_id"], 0) + 1
+    for post in posts:
+        post["like_count"] = like_counts.get(post["id"], 0)
+        post["comment_count"] = comment_counts.get(post["id"], 0)
+    database.seed("posts", posts)
+    database.seed("post_likes", likes)
+    database.seed("post_comments", comments)
+
+    database.seed("notifications", [{
+        "id": _uuid(rng), "recipient_id": rng.choice(users), "sender_id": rng.choice(users),
+        "type": "follow", "title": "New follower", "message": _sentence(rng, 6),
+        "is_read": rng.random() < 0.5, "created_at": _timestamp(rng),
+    } for _ in range(n["notifications"])])
+    database.seed("user_connections", [
+        {"id": _uuid(rng), "follower_id": a, "following_id": b, "created_at": _timestamp(rng)}
+        for a, b in _pairs(rng, n["connections"], users, users)
+    ])
+
+    projects = [{
+        "id": _uuid(rng), "title": f"{rng.choice(WORDS)} {rng.choice(SKILLS)} {i}", "description": _sentence(rng, 12),
+        "domain": rng.choice(DOMAINS), "difficulty_level": rng.choice(DIFFICULTIES),
+        "tech_stack": rng.sample(SKILLS, 3), "programming_languages": rng.sample(SKILLS, 2),
+        "is_recruiting": rng.random() < 0.7, "is_remote": rng.random() < 0.8,
+        "created_by": rng.choice(users), "created_at": _timestamp(rng),
+    } for i in range(n["projects"])]
+    database.seed("app_projects", projects)
+    database.seed("app_project_members", [
+        {"id": _uuid(rng), "project_id": project_id, "user_id": user_id,
+         "role": "member", "status": rng.choice(["active", "pending"])}
+        for project_id, user_id in _pairs(rng, n["project_members"], [p["id"] for p in projects], users)
+    ])
+
+    data.counts = {name: len(table.rows) for name, table in database.tables.items()}
+    return data
+
+
+def _token(user_id: str) -> str:
+    claims = {"sub": user_id, "aud": "authenticated", "exp": int(time.time()) + 24 * 3600}
+    return jwt.encode(claims, os.environ["SUPABASE_JWT_SECRET"], algorithm="HS256")
+
+
+# name -> (method, request builder); builders take (data, i, rng) and return
+# (path, viewer user id, params or json body)
+def _private_room(data, i, rng):
+    room_id, user1, _ = data.private_rooms[i % len(data.private_rooms)]
+    return room_id, user1
+
+
+def _community(data, i, rng):
+    room_id, members = data.communities[i % len(data.communities)]
+    return room_id, members[i % len(members)]
+
+
+SCENARIOS = {
+    "chat_conversations": ("GET", lambda d, i, r: ("/chat/conversations", d.users[i % len(d.users)], None)),
+    "chat_room_messages": ("GET", lambda d, i, r: (
+        f"/chat/rooms/{_private_room(d, i, r)[0]}/messages", _private_room(d, i, r)[1], None)),
+    "chat_profile_detailed": ("GET", lambda d, i, r: (
+        f"/chat/profile/{r.choice(d.users)}/detailed", d.users[i % len(d.users)], None)),
+    "community_explore": ("GET", lambda d, i, r: ("/communities/explore", d.users[i % len(d.users)], None)),
+    "community_joined": ("GET", lambda d, i, r: ("/communities/joined", _community(d, i, r)[1], None)),
+    "community_chat": ("GET", lambda d, i, r: (
+        f"/communities/{_community(d, i, r)[0]}/chat", _community(d, i, r)[1], None)),
+    "community_members": ("GET", lambda d, i, r: (
+        f"/communities/{_community(d, i, r)[0]}/members", _community(d, i, r)[1], None)),
+    "community_post_message": ("POST", lambda d, i, r: (
+        f"/communities/{_community(d, i, r)[0]}/messages", _community(d, i, r)[1],
+        {"content": _sentence(r, 6)})),
+    "search_devs": ("GET", lambda d, i, r: ("/search/devs", d.users[i % len(d.users)],
+                                            {"q": r.choice(NAMES).lower()[:3]})),
+    "search_projects": ("GET", lambda d, i, r: ("/search/projects", d.users[i % len(d.users)],
+                                                {"q": r.choice(SKILLS)})),
+    "search_suggest": ("GET", lambda d, i, r: ("/search/suggest", d.users[i % len(d.users)],
+                                               {"q": r.choice(NAMES + SKILLS)[:r.randint(1, 4)].lower()})),
+    "notifications": ("GET", lambda d, i, r: ("/notifications", d.users[i % len(d.users)], None)),
+    "notifications_mark_all_read": ("PATCH", lambda d, i, r: (
+        "/notifications/mark-all-read", d.users[i % len(d.users)], None)),
+    "feed": ("GET", lambda d, i, r: (f"/feed/{d.users[i % len(d.users)]}", None, None)),
+    "feed_comments": ("GET", lambda d, i, r: (f"/feed/{r.choice(d.posts)}/comments", None, None)),
+    "feed_like": ("POST", lambda d, i, r: (f"/feed/{r.choice(d.posts)}/like", None,
+                                           {"user_id": d.users[i % len(d.users)]})),
+    "feed_comment": ("POST", lambda d, i, r: (f"/feed/{r.choice(d.posts)}/comment", None,
+                                              {"user_id": d.users[i % len(d.users)], "comment": _sentence(r, 5)})),
+    "projects": ("GET", lambda d, i, r: ("/api/app_projects", d.users[i % len(d.users)], None)),
+    "projects_filtered": ("GET", lambda d, i, r: ("/api/app_projects", d.users[i % len(d.users)], {
+        "domain": r.choice(DOMAINS), "is_recruiting": "true", "include_members": "true"})),
+    "projects_facets": ("GET", lambda d, i, r: ("/api/app_projects/facets", d.users[i % len(d.users)], {
+        "domain": r.sample(DOMAINS, 2), "tech_stack": r.choice(SKILLS), "is_remote": "true"})),
+    "projects_with_members": ("GET", lambda d, i, r: (
+        "/api/app_projects_with_members", d.users[i % len(d.users)], None)),
+}
+
+
+async def run_endpoint(client: httpx.AsyncClient, data: Dataset, name: str, args) -> dict:
+    method, build = SCENARIOS[name]
+    rng = random.Random(f"{args.seed}-{name}")
+    tokens = {}
+
+    async def call(i: int):
+        path, viewer, payload = build(data, i, rng)
+        headers = {}
+        if viewer:
+            if viewer not in tokens:
+                tokens[viewer] = _token(viewer)
+            headers["Authorization"] = f"Bearer {tokens[viewer]}"
+        if method == "GET":
+            return await client.get(path, params=payload, headers=headers)
+        return await client.request(method, path, json=payload, headers=headers)
+
+    for i in range(args.warmup):
+        await call(i)
+
+    latencies, queries, errors = [], [], 0
+    counter = iter(range(args.requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            response = await call(i)
+            latencies.append(time.perf_counter() - started)
+            queries.append(int(response.headers.get("X-DB-Query-Count", 0)))
+            errors += response.status_code >= 400
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "method": method,
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "latency": summarize_ms(latencies),
+        "queries_per_request": round(sum(queries) / len(queries), 2) if queries else 0,
+        "max_queries": max(queries, default=0),
+        "rss_bytes": rss_bytes(),
+    }
+
+
+def _selected(only: str) -> list:
+    if not only:
+        return list(SCENARIOS)
+    wanted = [item.strip() for item in only.split(",") if item.strip()]
+    # A prefix such as "feed" or "community" selects every scenario of that router
+    names = [name for name in SCENARIOS if any(name == w or name.startswith(f"{w}_") for w in wanted)]
+    if not names:
+        raise SystemExit(f"No scenarios match --only {only!r}; choose from {', '.join(SCENARIOS)}")
+    return names
+
+
+async def run(args) -> dict:
+    database = get_fake_database()
+    database.reset()
+    rss_before = rss_bytes()
+    started = time.perf_counter()
+    data = seed(database, SCALES[args.scale], random.Random(args.seed))
+    seed_seconds = time.perf_counter() - started
+
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("json", "compare", "threshold", "min_delta_ms")},
+        "rows": sum(data.counts.values()),
+        "tables": data.counts,
+        "seed_seconds": round(seed_seconds, 2),
+        "seed_rss_bytes": rss_bytes() - rss_before,
+        "endpoints": {},
+    }
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name in _selected(args.only):
+            with contextlib.redirect_stdout(io.StringIO()):
+                runs = [await run_endpoint(client, data, name, args) for _ in range(args.repeat)]
+            result = min(runs, key=lambda run: run["latency"].get("p95_ms", 0))
+            result["requests_per_second"] = max(run["requests_per_second"] for run in runs)
+            report["endpoints"][name] = result
+            print(f"{name:30} {result['requests_per_second']:>9} req/s  p95 {result['latency'].get('p95_ms', 0):>9} ms"
+                  f"  {result['queries_per_request']:>5} q/req  {result['errors']} errors", file=sys.stderr)
+    report["peak_rss_bytes"] = peak_rss_bytes()
+    return report
+
+
+def compare(report: dict, baseline: dict, threshold: float, min_delta_ms: float) -> list:
+    """Regressions of `report` against `baseline`, as human-readable lines."""
+    regressions = []
+    if baseline.get("config", {}).get("scale") != report["config"]["scale"]:
+        print(f"⚠️ Baseline was recorded at scale {baseline.get('config', {}).get('scale')}, "
+              f"this run is {report['config']['scale']}", file=sys.stderr)
+
+    for name, current in report["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(name)
+        if before is None:
+            continue
+        p95, p95_before = current["latency"].get("p95_ms", 0), before["latency"].get("p95_ms", 0)
+        if p95_before and p95 > p95_before * (1 + threshold) and p95 - p95_before > min_delta_ms:
+            regressions.append(f"{name}: p95 {p95_before} -> {p95} ms")
+        rps, rps_before = current["requests_per_second"], before["requests_per_second"]
+        if rps < rps_before * (1 - threshold):
+            regressions.append(f"{name}: throughput {rps_before} -> {rps} req/s")
+        # Only cache hits make query counts vary between runs; a whole extra query per request is a real change
+        if current["queries_per_request"] >= before["queries_per_request"] + QUERY_TOLERANCE:
+            regressions.append(f"{name}: queries per request {before['queries_per_request']} "
+                               f"-> {current['queries_per_request']}")
+        if current["errors"] and not before["errors"]:
+            regressions.append(f"{name}: {current['errors']} errors, none in the baseline")
+
+    peak, peak_before = report["peak_rss_bytes"], baseline.get("peak_rss_bytes")
+    if peak_before and peak > peak_before * (1 + threshold):
+        regressions.append(f"peak RSS {peak_before} -> {peak} bytes")
+    return regressions
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark the REST routers against the fake Supabase backend")
+    parser.add_argument("--scale", choices=tuple(SCALES), default="1k", help="approximate seeded row count")
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight per endpoint")
+    parser.add_argument("--warmup", type=int, default=10, help="untimed requests per endpoint")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per endpoint; the best one is reported")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for the dataset and requests")
+    parser.add_argument("--only", help="comma-separated scenarios or router prefixes (chat, community, feed, ...)")
+    parser.add_argument("--json", help="also write the report to this file, e.g. as a baseline")
+    parser.add_argument("--compare", help="baseline report to compare against; exits 1 on regression")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative regression")
+    parser.add_argument("--min-delta-ms", type=float, default=20.0,
+                        help="p95 increases smaller than this are noise, whatever the ratio")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold, args.min_delta_ms)
+        for line in regressions:
+            print(f"❌ Regression: {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"✅ No regressions past {args.threshold:.0%} against {args.compare}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main_cli()
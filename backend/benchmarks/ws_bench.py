@@ -0,0 +1,228 @@
+"""
+WebSocket load generator and latency benchmark for chat_ws.
+
+Runs the WebSocket router in-process under uvicorn, with message persistence
+and room membership replaced by local stand-ins, then opens N simulated
+clients spread across M rooms. A few clients per room send at a fixed rate;
+every client records the time from send to receipt of each broadcast.
+
+Run from backend/:
+    python -m benchmarks.ws_bench --clients 1000 --rooms 20
+    python -m benchmarks.ws_bench --clients 500 --rooms 1 --senders 5 --duration 20
+    python -m benchmarks.ws_bench --clients 10000 --rooms 200 --endpoint multiplexed --json result.json
+
+Clients and server share one process and one event loop, so latencies include
+client-side scheduling; compare runs made with the same flags on the same machine.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+BENCH_SECRET = "ws-bench-secret-ws-bench-secret-0000"
+os.environ.setdefault("SUPABASE_JWT_SECRET", BENCH_SECRET)
+
+import uvicorn
+import websockets
+from fastapi import FastAPI
+from jose import jwt
+
+import chat_ws
+from message_journal import message_journal
+from room_roster import room_roster
+from ws_connection import send_stats
+from benchmarks.stats import summarize_ms, rss_bytes
+
+CONNECT_CONCURRENCY = 200
+
+
+class LocalMessageStore:
+    """Stand-in for the messages table: accepts journal batches after a fixed delay."""
+
+    def __init__(self, latency_ms: float):
+        self.latency = latency_ms / 1000
+        self.rows = 0
+        self.batches = 0
+
+    async def write(self, rows):
+        await asyncio.sleep(self.latency)
+        self.rows += len(rows)
+        self.batches += 1
+        return True
+
+
+class SimClient:
+    def __init__(self, index: int, room_id: str):
+        self.index = index
+        self.room_id = room_id
+        self.user_id = f"bench-user-{index}"
+        self.socket = None
+        self.connect_time = None
+        self.latencies = []
+        self.received = 0
+        self.sent = 0
+
+    def token(self) -> str:
+        return jwt.encode(
+            {"sub": self.user_id, "aud": "authenticated"},
+            os.environ["SUPABASE_JWT_SECRET"],
+            algorithm="HS256",
+        )
+
+    async def connect(self, base_url: str, endpoint: str):
+        started = time.perf_counter()
+        if endpoint == "legacy":
+            self.socket = await websockets.connect(f"{base_url}/ws/{self.room_id}?token={self.token()}", max_queue=None)
+        else:
+            self.socket = await websockets.connect(f"{base_url}/ws?token={self.token()}", max_queue=None)
+            await self.socket.send(json.dumps({"type": "subscribe", "room_id": self.room_id}))
+            await self.socket.recv()
+        self.connect_time = time.perf_counter() - started
+
+    async def receive(self):
+        try:
+            async for raw in self.socket:
+                frame = json.loads(raw)
+                if frame.get("type") != "message":
+                    continue
+                self.received += 1
+                sent_at = float(frame["content"].split("|", 1)[1])
+                self.latencies.append(time.perf_counter() - sent_at)
+        except websockets.ConnectionClosed:
+            pass
+
+    async def send_loop(self, rate: float, duration: float, endpoint: str):
+        interval = 1 / rate
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            content = f"bench-{self.index}|{time.perf_counter()}"
+            if endpoint == "legacy":
+                frame = {"content": content}
+            else:
+                frame = {"type": "message", "room_id": self.room_id, "content": content}
+            await self.socket.send(json.dumps(frame))
+            self.sent += 1
+            await asyncio.sleep(interval)
+
+
+async def start_server(persist_latency_ms: float, members: dict):
+    store = LocalMessageStore(persist_latency_ms)
+    message_journal.writer = store.write
+
+    async def load_members(room_id):
+        return members.get(room_id, [])
+
+    room_roster.loader = load_members
+
+    app = FastAPI()
+    app.include_router(chat_ws.ws_router)
+
+    config = uvicorn.Config(app, host="127.0.0.1", port=0, log_level="error", ws_ping_interval=None)
+    server = uvicorn.Server(config)
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, server_task, store, f"ws://127.0.0.1:{port}"
+
+
+async def run(args) -> dict:
+    clients = [SimClient(i, f"bench-room-{i % args.rooms}") for i in range(args.clients)]
+    members = {}
+    for client in clients:
+        members.setdefault(client.room_id, []).append(client.user_id)
+
+    server, server_task, store, base_url = await start_server(args.persist_latency_ms, members)
+
+    rss_before = rss_bytes()
+    gate = asyncio.Semaphore(CONNECT_CONCURRENCY)
+
+    async def connect(client):
+        async with gate:
+            await client.connect(base_url, args.endpoint)
+
+    connect_started = time.perf_counter()
+    await asyncio.gather(*(connect(client) for client in clients))
+    connect_elapsed = time.perf_counter() - connect_started
+    rss_connected = rss_bytes()
+
+    receivers = [asyncio.create_task(client.receive()) for client in clients]
+
+    # The first `senders` clients of every room generate traffic
+    senders = [client for client in clients if client.index // args.rooms < args.senders]
+    send_started = time.perf_counter()
+    await asyncio.gather(*(client.send_loop(args.rate, args.duration, args.endpoint) for client in senders))
+    send_elapsed = time.perf_counter() - send_started
+
+    # Let in-flight broadcasts drain
+    await asyncio.sleep(args.drain)
+
+    for client in clients:
+        await client.socket.close()
+    await asyncio.gather(*receivers, return_exceptions=True)
+
+    server.should_exit = True
+    await server_task
+
+    room_sizes = {}
+    for client in clients:
+        room_sizes[client.room_id] = room_sizes.get(client.room_id, 0) + 1
+    sent = sum(client.sent for client in senders)
+    expected = sum(client.sent * room_sizes[client.room_id] for client in senders)
+    received = sum(client.received for client in clients)
+
+    return {
+        "config": vars(args),
+        "connect": {
+            **summarize_ms([client.connect_time for client in clients]),
+            "total_s": round(connect_elapsed, 3),
+            "per_second": round(len(clients) / connect_elapsed, 1),
+        },
+        "fanout_latency": summarize_ms([l for client in clients for l in client.latencies]),
+        "throughput": {
+            "messages_sent": sent,
+            "frames_expected": expected,
+            "frames_received": received,
+            "delivery_ratio": round(received / expected, 4) if expected else None,
+            "messages_per_second": round(sent / send_elapsed, 1),
+            "frames_per_second": round(received / send_elapsed, 1),
+        },
+        "memory": {
+            "rss_before_mb": round(rss_before / 2**20, 1),
+            "rss_connected_mb": round(rss_connected / 2**20, 1),
+            # Includes the client-side socket as well as the server-side connection
+            "per_connection_kb": round((rss_connected - rss_before) / len(clients) / 1024, 2),
+        },
+        "server": {
+            "dropped_frames": send_stats["dropped_frames"],
+            "slow_consumer_disconnects": send_stats["slow_consumer_disconnects"],
+            "persisted_rows": store.rows,
+            "persist_batches": store.batches,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chat_ws fan-out")
+    parser.add_argument("--clients", type=int, default=1000, help="simulated sockets")
+    parser.add_argument("--rooms", type=int, default=10, help="rooms the clients are spread across")
+    parser.add_argument("--senders", type=int, default=1, help="sending clients per room")
+    parser.add_argument("--rate", type=float, default=2.0, help="messages per second per sender")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of traffic")
+    parser.add_argument("--drain", type=float, default=2.0, help="seconds to wait for in-flight frames")
+    parser.add_argument("--endpoint", choices=("legacy", "multiplexed"), default="legacy")
+    parser.add_argument("--persist-latency-ms", type=float, default=20.0, help="stand-in insert latency")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
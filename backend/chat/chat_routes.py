@@ -1,8 +1,14 @@
-from db import get_user_conv, get_last_message, get_user_profile, get_user_stats, check_following_status, follow_user , unfollow_user,create_private_room,get_room_messages
+from db import get_user_conv, get_user_profile, check_following_status, follow_user , unfollow_user,create_private_room,get_room_messages
 from fastapi import FastAPI , Depends , status , HTTPException
 from fastapi.responses import JSONResponse
 from auth.dependencies import get_current_user_id
 from pydantic import BaseModel
+from typing import Optional
+from presence import presence_tracker
+from pagination import MESSAGE_PAGE_DEFAULT, page_params
+from last_messages import last_messages
+from user_stats import user_stats
+from suggestions import suggestions
 
 
 chat_app = FastAPI()
@@ -31,15 +37,15 @@ async def get_conversations(user_id: str = Depends(get_current_user_id)):
                 content={"message": "No conversations found."}
             )
 
-        # Fetch last messages for each room
-        enriched_conversations = []
-        for conv in conversations:
-            room_id = conv["room_id"]
-            last_msg = await get_last_message(room_id)
+        # Last message of every room in one batched lookup
+        last_msgs = await last_messages.get_many(conv["room_id"] for conv in conversations)
 
+        enriched_conversations = []
+        for conv, last_msg in zip(conversations, last_msgs):
             enriched_conversations.append({
                 **conv,  # All room details
-                "last_message": last_msg  # Might be None if no messages yet
+                "last_message": last_msg,  # Might be None if no messages yet
+                "other_user_status": presence_tracker.status(conv["other_user"]["id"])
             })
 
         return JSONResponse(
@@ -89,19 +95,23 @@ async def create_room(
 @chat_app.get("/rooms/{room_id}/messages")
 async def get_messages(
     room_id: str,
-    limit: int = 50,
-    offset: int = 0,
+    limit: int = MESSAGE_PAGE_DEFAULT,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
     user_id: str = Depends(get_current_user_id)
 ):
     """
-    Get messages for a specific room
+    Get a page of messages for a specific room, oldest first.
+    Without a cursor this is the newest page; pass next_cursor back as `before`
+    to scroll further back, or a cursor as `after` to fetch newer messages.
     """
+    limit, before_cursor, after_cursor = page_params(limit, before, after)
     try:
-        messages = await get_room_messages(room_id, limit, offset)
+        page = await get_room_messages(room_id, limit, before_cursor, after_cursor)
         
         return JSONResponse(
             status_code=status.HTTP_200_OK,
-            content={"messages": messages or []}
+            content=page
         )
     
     except Exception as e:
@@ -160,7 +170,7 @@ async def get_detailed_profile(
             )
         
         # Get user stats
-        stats = await get_user_stats(user_id)
+        stats = await user_stats.get(user_id)
         
         # Check if current user is following this user
         is_following = await check_following_status(current_user_id, user_id)
@@ -206,6 +216,8 @@ async def follow_user_route(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=result.get("message", "Failed to follow user")
             )
+        user_stats.followed(current_user_id, request.user_id)
+        suggestions.followed(request.user_id)
         
         return JSONResponse(
             status_code=status.HTTP_200_OK,
@@ -237,6 +249,9 @@ async def unfollow_user_route(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=result.get("message", "Failed to unfollow user")
             )
+        if result.get("removed"):
+            user_stats.unfollowed(current_user_id, request.user_id)
+            suggestions.unfollowed(request.user_id)
         
         return JSONResponse(
             status_code=status.HTTP_200_OK,
@@ -1,14 +1,27 @@
-from fastapi import WebSocket, WebSocketDisconnect, APIRouter , HTTPException
-from typing import Dict, List
+from fastapi import WebSocket, WebSocketDisconnect, APIRouter , HTTPException, Depends
+from pydantic import BaseModel
+from typing import Dict, List, Optional, Set
 from jose import jwt, JWTError
 import os
 import json
 import jwt 
-from db import save_message
+from auth.dependencies import get_current_user_id, get_ops_user_id
+from db import get_messages_after
+from message_journal import message_journal
+from room_history import record_frame, frames_since, recent_frames
+from last_messages import last_messages
+from room_roster import room_roster
+from presence import presence_tracker, PRESENCE_TOPIC
+from notification_push import notification_pusher, user_topic, USER_TOPIC_PREFIX
+from ws_connection import ClientConnection, get_send_stats
+from ws_broker import create_broker
+from ws_lifecycle import LifecycleManager, lifecycle_stats
 
 ws_router = APIRouter()
 
-room_connection: Dict[str, List[WebSocket]] = {}
+# room_id -> sockets subscribed to it, user_id -> that user's sockets
+room_connection: Dict[str, Set[ClientConnection]] = {}
+user_connection: Dict[str, Set[ClientConnection]] = {}
 
 # Replace with your actual values
 SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET") 
@@ -24,53 +37,386 @@ def decode_jwt_token(token: str) -> str:
         print("❌ JWT Decode Error:", e)
         return None
 
-@ws_router.websocket("/ws/{room_id}")
-async def websocket_endpoint(websocket: WebSocket, room_id: str):
+PRESENCE_BULK_MAX = 500
+# Most messages replayed from the database to a reconnecting socket, per room
+WS_REPLAY_MAX = int(os.getenv("WS_REPLAY_MAX", "500"))
+
+class PresenceQuery(BaseModel):
+    user_ids: List[str]
+
+def deliver_to_room(room_id: str, data: str):
+    """Fan a frame out to this worker's sockets in the room."""
+    frame = json.loads(data)
+
+    if room_id == PRESENCE_TOPIC:
+        presence_tracker.receive(frame)
+        return
+
+    if room_id.startswith(USER_TOPIC_PREFIX):
+        notification_pusher.observe(room_id[len(USER_TOPIC_PREFIX):], frame)
+    else:
+        record_frame(room_id, frame, data)
+        if frame.get("type") == "message":
+            # Picks up messages journaled on other workers; this worker's own were
+            # already recorded on append, and recording them again is a no-op
+            last_messages.record_frame(frame)
+
+    # Legacy sockets only understand chat messages
+    chat_only = frame.get("type") == "message"
+    for client in room_connection.get(room_id, ()):
+        if chat_only or client.typed_frames:
+            client.send(data)
+
+# Every broadcast goes through the broker so members on other workers get it too
+broker = create_broker(deliver_to_room)
+presence_tracker.publish = broker.publish
+notification_pusher.publish = broker.publish
+
+# ---------------- connection registry ----------------
+
+def register(connection: ClientConnection):
+    user_connection.setdefault(connection.user_id, set()).add(connection)
+    presence_tracker.connected(connection.user_id)
+
+def unregister(connection: ClientConnection):
+    for room_id in list(connection.rooms):
+        unsubscribe(connection, room_id)
+
+    connections = user_connection.get(connection.user_id)
+    # unregister can run twice (writer failure, then the endpoint's finally)
+    if connections is not None and connection in connections:
+        connections.discard(connection)
+        if not connections:
+            del user_connection[connection.user_id]
+        presence_tracker.disconnected(connection.user_id)
+
+def subscribe(connection: ClientConnection, room_id: str):
+    room_connection.setdefault(room_id, set()).add(connection)
+    connection.rooms.add(room_id)
+
+def unsubscribe(connection: ClientConnection, room_id: str):
+    connection.rooms.discard(room_id)
+    members = room_connection.get(room_id)
+    if members is not None:
+        members.discard(connection)
+        if not members:
+            del room_connection[room_id]
+
+def all_connections():
+    return [conn for conns in user_connection.values() for conn in conns]
+
+# Pings heartbeat sockets and reaps idle or dead ones
+lifecycle = LifecycleManager(all_connections, unregister)
+
+@ws_router.on_event("startup")
+async def start_realtime():
+    await broker.start()
+    await message_journal.start()
+    await lifecycle.start()
+    await presence_tracker.start()
+    await notification_pusher.start()
+
+@ws_router.on_event("shutdown")
+async def stop_realtime():
+    await presence_tracker.stop()
+    await lifecycle.stop()
+    await message_journal.stop()
+    await broker.stop()
+
+def message_frame(message: dict) -> str:
+    """Serialize a messages row the way it is broadcast."""
+    return json.dumps({
+        "type": "message",
+        "sender_id": message["sender_id"],
+        "content": message["content"],
+        "room_id": message["room_id"],
+        "created_at": message["created_at"],
+        "message_id": message["id"]
+    })
+
+def valid_content(content) -> bool:
+    return isinstance(content, str) and bool(content.strip())
+
+def frame_room_ids(frame: dict) -> Optional[List[str]]:
+    """The rooms a client frame names, or None when room_id/room_ids aren't strings."""
+    room_id, room_ids = frame.get("room_id"), frame.get("room_ids")
+    if room_id is not None and not isinstance(room_id, str):
+        return None
+    if room_ids is not None and (not isinstance(room_ids, list) or not all(isinstance(r, str) for r in room_ids)):
+        return None
+    return room_ids or ([room_id] if room_id else [])
+
+def publish_message(room_id: str, user_id: str, content: str):
+    """Journal a chat message and broadcast it to the room."""
+    # Persisted in the background; broadcast right away
+    saved = message_journal.append(room_id, user_id, content)
+    broker.publish(room_id, message_frame(saved))
+    presence_tracker.activity(user_id)
+
+async def replay_missed(connection: ClientConnection, room_id: str, last_id: str) -> Dict:
+    """
+    Subscribe a reconnecting socket to the room and send it the frames it missed after last_id.
+    Served from the room's ring buffer; falls back to the database when the gap is older than the buffer.
+    Returns {"replayed": n, "gap": bool}. On a gap (last_id unknown, or more than WS_REPLAY_MAX
+    missed) nothing is replayed, since part of it would leave a hole; the client reloads history.
+    """
+    gap = False
+    frames = frames_since(room_id, last_id)
+    if frames is None:
+        unflushed = message_journal.unflushed(room_id)
+        anchor = next(((row["created_at"], row["id"]) for row in unflushed if row["id"] == last_id), None)
+        rows = await get_messages_after(room_id, last_id, limit=WS_REPLAY_MAX + 1, anchor=anchor)
+        gap = rows is None or len(rows) > WS_REPLAY_MAX
+        frames = []
+        if not gap:
+            # Nothing below awaits: rows not flushed yet come from the journal, messages
+            # broadcast while the query ran from the ring buffer, and later ones reach
+            # the socket after the replay
+            if anchor is not None:
+                unflushed = [row for row in unflushed if (row["created_at"], row["id"]) > anchor]
+            seen = set()
+            for message_id, data in [(row["id"], message_frame(row)) for row in rows + unflushed] + recent_frames(room_id):
+                if message_id not in seen:
+                    seen.add(message_id)
+                    frames.append(data)
+
+    subscribe(connection, room_id)
+    for data in frames:
+        connection.send(data)
+    return {"replayed": len(frames), "gap": gap}
+
+async def authenticate(websocket: WebSocket) -> Optional[str]:
+    """Resolve the user from the ?token= query param, closing the socket if it is missing or invalid."""
     token = websocket.query_params.get("token")
 
     if not token:
         await websocket.close(code=1008)
-        return
+        return None
 
     user_id = decode_jwt_token(token)
 
     if not user_id:
         await websocket.close(code=1008)
+        return None
+
+    return user_id
+
+@ws_router.get("/ws/stats")
+async def websocket_stats(current_user_id: str = Depends(get_ops_user_id)):
+    """
+    Live connection/room/user counts, outbound queue depth, dropped frame counters,
+    broker delivery latency and message journal backlog for this worker
+    """
+    return {
+        **get_send_stats(all_connections()),
+        "rooms": len(room_connection),
+        "users": len(user_connection),
+        "lifecycle": lifecycle_stats,
+        "roster": room_roster.snapshot(),
+        "last_messages": last_messages.snapshot(),
+        "notifications": notification_pusher.stats,
+        "broker": broker.stats(),
+        "journal": {**message_journal.stats, "backlog": message_journal.backlog},
+    }
+
+@ws_router.post("/presence")
+async def bulk_presence(query: PresenceQuery, current_user_id: str = Depends(get_current_user_id)):
+    """
+    Online/away/offline status for a list of user ids, answered from memory
+    """
+    if len(query.user_ids) > PRESENCE_BULK_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {PRESENCE_BULK_MAX} user_ids per request")
+    return {"presence": presence_tracker.bulk(query.user_ids)}
+
+@ws_router.websocket("/ws")
+async def multiplexed_websocket_endpoint(websocket: WebSocket):
+    """
+    One socket per user carrying any number of rooms. Client frames:
+        {"type": "subscribe", "room_id": "..."}      (or "room_ids": [...])
+            optional "last_id" (single room) or "last_ids": {room_id: message_id}
+            replays the frames missed since that message; rooms listed in the reply's
+            "gaps" could not be fully replayed and should reload their history
+        {"type": "unsubscribe", "room_id": "..."}    (or "room_ids": [...])
+        {"type": "message", "room_id": "...", "content": "..."}
+        {"type": "typing", "room_id": "..."}        (coalesced to one event per TYPING_MIN_INTERVAL)
+        {"type": "presence", "status": "online" | "away"}
+        {"type": "ping"} / {"type": "pong"}
+    Broadcasts arrive with the same shape as on /ws/{room_id}. The socket also receives
+    {"type": "notification", "notification": {...}, "unread_count": n} and
+    {"type": "notifications_read", "unread_count": n} for its user. The server sends
+    {"type": "ping"} periodically; a socket that sends nothing for WS_IDLE_TIMEOUT is closed.
+    """
+    user_id = await authenticate(websocket)
+    if not user_id:
         return
 
     await websocket.accept()
 
-    if room_id not in room_connection:
-        room_connection[room_id] = []
+    connection = ClientConnection(websocket, user_id, on_failure=unregister)
+    connection.start()
+    register(connection)
+    # Notification pushes for this user
+    subscribe(connection, user_topic(user_id))
+    print(f"✅ Client [{user_id}] connected (multiplexed)")
+
+    try:
+        while True:
+            data = await websocket.receive_text()
+            connection.touch()
+
+            try:
+                frame = json.loads(data)
+            except json.JSONDecodeError:
+                connection.send(json.dumps({"type": "error", "detail": "Invalid JSON"}))
+                continue
+            if not isinstance(frame, dict):
+                connection.send(json.dumps({"type": "error", "detail": "Frame must be a JSON object"}))
+                continue
+            kind = frame.get("type")
+            room_ids = frame_room_ids(frame)
+            if room_ids is None:
+                connection.send(json.dumps({"type": "error", "detail": "room_id must be a string and room_ids a list of strings"}))
+                continue
+
+            if kind == "subscribe":
+                last_ids = frame.get("last_ids") or {}
+                if isinstance(last_ids, dict) and frame.get("last_id") and len(room_ids) == 1:
+                    last_ids[room_ids[0]] = frame["last_id"]
+                if not isinstance(last_ids, dict) or not all(isinstance(last_id, str) for last_id in last_ids.values()):
+                    connection.send(json.dumps({"type": "error", "detail": "last_ids must map room ids to message ids"}))
+                    continue
+
+                replayed = {}
+                gaps = []
+                denied = []
+                for room_id in room_ids:
+                    # Internal topics are never client-subscribable
+                    if room_id.startswith((USER_TOPIC_PREFIX, "__")) or not await room_roster.is_member(room_id, user_id):
+                        denied.append(room_id)
+                        continue
+                    if not last_ids.get(room_id):
+                        subscribe(connection, room_id)
+                        continue
+                    # Subscribes once the missed frames are fetched, so live ones follow the replay
+                    replay = await replay_missed(connection, room_id, last_ids[room_id])
+                    replayed[room_id] = replay["replayed"]
+                    if replay["gap"]:
+                        gaps.append(room_id)
+                connection.send(json.dumps({
+                    "type": "subscribed",
+                    "room_ids": [room_id for room_id in room_ids if room_id not in denied],
+                    "denied": denied,
+                    "replayed": replayed,
+                    "gaps": gaps,
+                }))
+
+            elif kind == "unsubscribe":
+                for room_id in room_ids:
+                    unsubscribe(connection, room_id)
+                connection.send(json.dumps({"type": "unsubscribed", "room_ids": room_ids}))
+
+            elif kind == "typing":
+                room_id = frame.get("room_id")
+                if room_id in connection.rooms:
+                    presence_tracker.activity(user_id)
+                    if presence_tracker.should_send_typing(room_id, user_id):
+                        broker.publish(room_id, json.dumps({"type": "typing", "room_id": room_id, "user_id": user_id}))
+
+            elif kind == "presence":
+                presence_tracker.set_away(user_id, frame.get("status") == "away")
+
+            elif kind == "ping":
+                connection.send(json.dumps({"type": "pong"}))
+
+            elif kind == "pong":
+                pass
+
+            elif kind == "message":
+                room_id = frame.get("room_id")
+                if not valid_content(frame.get("content")):
+                    connection.send(json.dumps({"type": "error", "room_id": room_id, "detail": "content must be a non-empty string"}))
+                    continue
+                if room_id not in connection.rooms:
+                    connection.send(json.dumps({"type": "error", "room_id": room_id, "detail": "Not subscribed to room"}))
+                    continue
+                # Membership may have been revoked since subscribing
+                if not await room_roster.is_member(room_id, user_id):
+                    unsubscribe(connection, room_id)
+                    connection.send(json.dumps({"type": "error", "room_id": room_id, "detail": "Not a member"}))
+                    continue
+                publish_message(room_id, user_id, frame["content"])
+
+            else:
+                connection.send(json.dumps({"type": "error", "detail": f"Unknown frame type: {kind}"}))
+
+    except WebSocketDisconnect:
+        print(f"❌ Client [{user_id}] disconnected (multiplexed)")
+
+    except Exception as e:
+        print(f"❌ Unexpected error: {e}")
 
-    room_connection[room_id].append(websocket)
+    finally:
+        # Whatever ended the loop, the socket leaves every room
+        unregister(connection)
+        await connection.close()
+
+@ws_router.websocket("/ws/{room_id}")
+async def websocket_endpoint(websocket: WebSocket, room_id: str):
+    user_id = await authenticate(websocket)
+    if not user_id:
+        return
+
+    if not await room_roster.is_member(room_id, user_id):
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+
+    # Existing clients treat every frame as a chat message, so pings are opt-in here
+    heartbeat = websocket.query_params.get("heartbeat") == "1"
+    connection = ClientConnection(websocket, user_id, heartbeat=heartbeat, typed_frames=False, on_failure=unregister)
+    connection.start()
+    register(connection)
     print(f"✅ Client [{user_id}] connected to room {room_id}")
 
+    # Reconnecting clients pass the last message they saw to catch up
+    last_id = websocket.query_params.get("last_id")
+    if last_id:
+        await replay_missed(connection, room_id, last_id)
+    else:
+        subscribe(connection, room_id)
+
     try:
         while True:
             data = await websocket.receive_text()
-            parsed = json.loads(data)
-
-            content = parsed["content"]
-            saved = await save_message(room_id, user_id, content)
-
-            if saved:
-                broadcastData = json.dumps({
-                    "sender_id": user_id,
-                    "content": content,
-                    "room_id": room_id,
-                    "created_at": saved.get("created_at", "now"),
-                    "message_id": saved.get("id") 
-                })
-
-                for client in room_connection[room_id]:
-                    await client.send_text(broadcastData)
-            else:
-                print("❌ Error saving message")
+            connection.touch()
+            try:
+                parsed = json.loads(data)
+            except json.JSONDecodeError:
+                parsed = None
+            if not isinstance(parsed, dict):
+                print(f"🚫 Dropping malformed frame from [{user_id}] in room {room_id}")
+                continue
+
+            if parsed.get("type") in ("ping", "pong"):
+                continue
+
+            if not valid_content(parsed.get("content")):
+                print(f"🚫 Dropping message without content from [{user_id}] in room {room_id}")
+                continue
+
+            if not await room_roster.is_member(room_id, user_id):
+                print(f"🚫 Dropping message from [{user_id}]: no longer a member of room {room_id}")
+                continue
+
+            publish_message(room_id, user_id, parsed["content"])
 
     except WebSocketDisconnect:
-        room_connection[room_id].remove(websocket)
         print(f"❌ Client [{user_id}] disconnected from room {room_id}")
 
     except Exception as e:
         print(f"❌ Unexpected error: {e}")
+
+    finally:
+        unregister(connection)
+        await connection.close()
@@ -10,11 +10,16 @@ from db import (
     get_comminities_by_userid,
     add_community,
     Join_community,
-    check_community_membership ,
     check_community_ownership,
     get_community_messages  ,
     get_community_members
 )
+from room_roster import room_roster
+from batch_loader import Loaders, get_loaders
+from pagination import MESSAGE_PAGE_DEFAULT, page_params
+from last_messages import last_messages
+from db_executor import run_query
+from presence import presence_tracker
 
 community_app = FastAPI()
 
@@ -253,6 +258,8 @@ async def JoinCommunity(
                 detail=result["error"]
             )
         
+        room_roster.add_member(community_id, user_id)
+
         # Success response
         return {
             "status": "success",
@@ -276,13 +283,18 @@ async def JoinCommunity(
 @community_app.get("/{community_id}/chat")
 async def get_chat_messages(
     community_id: str,
+    limit: int = MESSAGE_PAGE_DEFAULT,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
     user_id: str = Depends(get_current_user_id)
 ):
     """
-    Get chat messages for a community
+    Get a page of chat messages for a community, oldest first.
+    Without a cursor this is the newest page; pass next_cursor back as `before` to scroll back.
     """
+    limit, before_cursor, after_cursor = page_params(limit, before, after)
     # Verify user is member of community
-    is_member = await check_community_membership(community_id, user_id)
+    is_member = await room_roster.is_member(community_id, user_id)
     if not is_member:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -290,17 +302,20 @@ async def get_chat_messages(
         )
     
     # Get messages from database
-    messages = await get_community_messages(community_id)
-    return {"messages": messages}
+    page = await get_community_messages(community_id, limit, before_cursor, after_cursor)
+    return page
 
 @community_app.get("/{community_id}/manage")
 async def get_community_management(
     community_id: str,
+    limit: int = MESSAGE_PAGE_DEFAULT,
+    before: Optional[str] = None,
     user_id: str = Depends(get_current_user_id)
 ):
     """
-    Get community management data
+    Get community management data (the newest page of messages; page back with `before`)
     """
+    limit, before_cursor, _ = page_params(limit, before, None)
     # Verify user is owner of community
     is_owner = await check_community_ownership(community_id, user_id)
     if not is_owner:
@@ -310,11 +325,12 @@ async def get_community_management(
         )
     
     # Get community management data
-    community = await get_community_messages(community_id)
+    page = await get_community_messages(community_id, limit, before_cursor)
     members = await get_community_members(community_id)
     
     return {
-        "community": community,
+        "community": page["messages"],
+        "next_cursor": page["next_cursor"],
         "members": members
     }
     
@@ -323,54 +339,48 @@ async def get_community_management(
 @community_app.get("/{community_id}")
 async def get_community(
     community_id: str,
-    user_id: str = Depends(get_current_user_id)
+    user_id: str = Depends(get_current_user_id),
+    loaders: Loaders = Depends(get_loaders)
 ):
     print(f"🔍 Getting community: {community_id}, user: {user_id}")
     
-    community = supabase.table("rooms") \
-                      .select("*") \
-                      .eq("id", community_id) \
-                      .single() \
-                      .execute()
+    community = await loaders.rooms.load(community_id)
     
-    if not community.data:
+    if not community:
         print(f"❌ Community not found: {community_id}")
         raise HTTPException(status_code=404, detail="Community not found")
     
-    print(f"✅ Found community: {community.data}")
-    return community.data
+    print(f"✅ Found community: {community}")
+    return community
 
 
 @community_app.post("/{community_id}/messages")
 async def create_message(
     community_id: str,
     message_data: dict,
-    user_id: str = Depends(get_current_user_id)
+    user_id: str = Depends(get_current_user_id),
+    loaders: Loaders = Depends(get_loaders)
 ):
     # Verify user is member
-    is_member = await check_community_membership(community_id, user_id)
+    is_member = await room_roster.is_member(community_id, user_id)
     if not is_member:
         raise HTTPException(status_code=403, detail="Not a member")
     
     # Create message
-    message = supabase.table("messages") \
+    message = await run_query(supabase.table("messages") \
                     .insert({
                         "room_id": community_id,
                         "sender_id": user_id,
                         "content": message_data["content"]
-                    }) \
-                    .execute()
+                    }))
+    last_messages.record(message.data[0])
     
     # Add sender info to response
-    sender = supabase.table("profiles") \
-                   .select("username") \
-                   .eq("id", user_id) \
-                   .single() \
-                   .execute()
+    sender = await loaders.profiles.load(user_id)
     
     return {
         **message.data[0],
-        "sender_name": sender.data.get("username", "Anonymous")
+        "sender_name": (sender or {}).get("username") or "Anonymous"
     }
 # @community_app.get("/{community_id}/messsages")
 # async def get_community_messages(community_id: str,userId : str = Depends(get_current_user_id)):
@@ -392,12 +402,13 @@ async def create_message(
 @community_app.get("/{room_id}/members")
 async def get_room_members(
     room_id: str,
-    user_id: str = Depends(get_current_user_id)
+    user_id: str = Depends(get_current_user_id),
+    loaders: Loaders = Depends(get_loaders)
 ):
     print(f"🔍 Getting members for room: {room_id}, user: {user_id}")
     
     # Verify user is member
-    is_member = await check_community_membership(room_id, user_id)
+    is_member = await room_roster.is_member(room_id, user_id)
     print(f"👥 Is member: {is_member}")
     
     if not is_member:
@@ -405,30 +416,22 @@ async def get_room_members(
         raise HTTPException(status_code=403, detail="Not a member")
 
     # Get room members
-    members = supabase.table("room_members") \
+    members = await run_query(supabase.table("room_members") \
                     .select("*") \
-                    .eq("room_id", room_id) \
-                    .execute()
+                    .eq("room_id", room_id))
 
     print(f"📋 Found {len(members.data)} members")
 
-    # Get profile info separately
-    profiles = {}
-    for member in members.data:
-        profile = supabase.table("profiles") \
-                       .select("*") \
-                       .eq("id", member["user_id"]) \
-                       .single() \
-                       .execute()
-        if profile.data:
-            profiles[member["user_id"]] = profile.data
+    # Profiles of every member in one batched query
+    profiles = await loaders.profiles.load_many(member["user_id"] for member in members.data)
 
     # Combine data
     result = []
-    for member in members.data:
+    for member, profile in zip(members.data, profiles):
         result.append({
             **member,
-            "profile": profiles.get(member["user_id"], {})
+            "profile": profile or {},
+            "status": presence_tracker.status(member["user_id"])
         })
     
     print(f"✅ Returning {len(result)} members with profiles")
@@ -449,11 +452,10 @@ async def get_community_requests(
         print(f"🔍 Checking requests for community: {community_id}, user: {user_id}")
         
         # Check if user is the community owner
-        community = supabase.table("rooms") \
+        community = await run_query(supabase.table("rooms") \
                           .select("*") \
                           .eq("id", community_id) \
-                          .single() \
-                          .execute()
+                          .single())
         
         if not community.data:
             print(f"❌ Community not found: {community_id}")
@@ -502,11 +504,10 @@ async def invite_member(
             raise HTTPException(status_code=400, detail="Email is required")
         
         # Check if user is the community owner
-        community = supabase.table("rooms") \
+        community = await run_query(supabase.table("rooms") \
                           .select("*") \
                           .eq("id", community_id) \
-                          .single() \
-                          .execute()
+                          .single())
         
         if not community.data:
             raise HTTPException(status_code=404, detail="Community not found")
@@ -542,11 +543,10 @@ async def update_member_role(
             raise HTTPException(status_code=400, detail="Role is required")
         
         # Check if user is the community owner
-        community = supabase.table("rooms") \
+        community = await run_query(supabase.table("rooms") \
                           .select("*") \
                           .eq("id", community_id) \
-                          .single() \
-                          .execute()
+                          .single())
         
         if not community.data:
             raise HTTPException(status_code=404, detail="Community not found")
@@ -578,11 +578,10 @@ async def remove_member(
     """
     try:
         # Check if user is the community owner
-        community = supabase.table("rooms") \
+        community = await run_query(supabase.table("rooms") \
                           .select("*") \
                           .eq("id", community_id) \
-                          .single() \
-                          .execute()
+                          .single())
         
         if not community.data:
             raise HTTPException(status_code=404, detail="Community not found")
@@ -614,11 +613,10 @@ async def update_community(
     """
     try:
         # Check if user is the community owner
-        community = supabase.table("rooms") \
+        community = await run_query(supabase.table("rooms") \
                           .select("*") \
                           .eq("id", community_id) \
-                          .single() \
-                          .execute()
+                          .single())
         
         if not community.data:
             raise HTTPException(status_code=404, detail="Community not found")
@@ -627,14 +625,13 @@ async def update_community(
             raise HTTPException(status_code=403, detail="Only community owners can update settings")
         
         # Update community settings
-        updated_community = supabase.table("rooms") \
+        updated_community = await run_query(supabase.table("rooms") \
                                    .update({
                                        "name": request.get("name", community.data.get("name")),
                                        "description": request.get("description", community.data.get("description")),
                                        "is_private": request.get("is_private", community.data.get("is_private", False))
                                    }) \
-                                   .eq("id", community_id) \
-                                   .execute()
+                                   .eq("id", community_id))
         
         return updated_community.data[0] if updated_community.data else community.data
         
@@ -657,11 +654,10 @@ async def delete_community(
     """
     try:
         # Check if user is the community owner
-        community = supabase.table("rooms") \
+        community = await run_query(supabase.table("rooms") \
                           .select("*") \
                           .eq("id", community_id) \
-                          .single() \
-                          .execute()
+                          .single())
         
         if not community.data:
             raise HTTPException(status_code=404, detail="Community not found")
@@ -670,10 +666,10 @@ async def delete_community(
             raise HTTPException(status_code=403, detail="Only community owners can delete communities")
         
         # Delete community
-        supabase.table("rooms") \
+        await run_query(supabase.table("rooms") \
                .delete() \
-               .eq("id", community_id) \
-               .execute()
+               .eq("id", community_id))
+        room_roster.invalidate(community_id)
         
         return {"message": "Community deleted successfully"}
         
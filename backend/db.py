@@ -1,14 +1,20 @@
 import os
-from supabase import create_client , Client
+import asyncio
+from supabase import Client
+from postgrest import CountMethod, ReturnMethod
 import logging
 import datetime
-from typing import List, Dict , Optional
+from typing import Callable, List, Dict , Optional
+from db_executor import run_query
+from fake_supabase import create_supabase_client
+from query_metrics import instrument
+from pagination import Cursor, encode_cursor, keyset_filter
 
 
 try:
     url: str = os.environ["SUPABASE_URL"]
     key: str = os.environ["SUPABASE_KEY"]
-    supabase:Client = create_client(url, key)
+    supabase:Client = instrument(create_supabase_client(url, key))
     logging.info("Connected to Supabase" , url, key)
 
 except KeyError:
@@ -18,11 +24,10 @@ except KeyError:
 
 async def get_user_conv(user_id: str):
     try:
-        response = (
+        response = await run_query(
             supabase.table("private_room_details")
             .select("*")
             .or_(f"user1_id.eq.{user_id},user2_id.eq.{user_id}")
-            .execute()
         )
 
         conversations = []
@@ -65,13 +70,12 @@ async def get_user_conv(user_id: str):
 
 async def get_last_message(room_id: str):
     try:
-        response = (
+        response = await run_query(
             supabase.table("messages")
             .select("*")
             .eq("room_id", room_id)
             .order("created_at", desc=True)
             .limit(1)
-            .execute()
         )
 
         if response.data:
@@ -83,25 +87,65 @@ async def get_last_message(room_id: str):
         print(f"Error fetching last message: {e}")
         return {"error": str(e)}
 
-async def get_devs(q: str):
+async def get_last_messages(room_ids: List[str]):
+    """
+    Latest message of every room in room_ids with a single RPC (see last_messages.sql).
+    Returns {room_id: message}; rooms without messages are absent. None if the lookup failed.
+    """
+    try:
+        response = await run_query(supabase.rpc("get_last_messages", {"room_ids": room_ids}))
+        return {row["room_id"]: row for row in response.data or []}
+    except Exception as e:
+        print(f"❌ Error fetching last messages for {len(room_ids)} rooms: {e}")
+        return None
+
+async def get_rows_by_ids(table: str, ids: List[str], columns: str = "*"):
+    """
+    Rows of `table` whose id is in ids, fetched with one .in_() query.
+    Returns {id: row}; missing ids are absent. None if the lookup failed.
+    """
     try:
-        response = (
+        response = await run_query(supabase.table(table).select(columns).in_("id", ids))
+        return {row["id"]: row for row in response.data or []}
+    except Exception as e:
+        print(f"❌ Error fetching {len(ids)} rows from {table}: {e}")
+        return None
+
+async def get_devs(q: str, columns: str = "id, full_name, username"):
+    try:
+        response = await run_query(
             supabase.table("profiles")
-            .select("id, full_name, username")  # Only fetch what you need
+            .select(columns)  # Only fetch what you need
             .or_(f"full_name.ilike.%{q}%,username.ilike.%{q}%")  # Case-insensitive filter
-            .execute()
         )
         return response.data
     except Exception as e:
         print(f"Error fetching developers: {e}")
         return None
 
+async def get_search_documents(table: str, columns: str, batch: int = 1000):
+    """Every row of a table, `columns` only, read in id order one keyset page at a time"""
+    try:
+        rows = []
+        while True:
+            query = supabase.table(table).select(columns).order("id").limit(batch)
+            if rows:
+                query = query.gt("id", rows[-1]["id"])
+            response = await run_query(query)
+            page = response.data or []
+            rows.extend(page)
+            if len(page) < batch:
+                return rows
+    except Exception as e:
+        print(f"Error loading {table} for the search index: {e}")
+        return None
+
 async def get_projects_with_members():
     try:
-        response = (
+        response = await run_query(
             supabase.table("app_projects")
-            .select("*, app_project_members(*, profiles(*))")
-            .execute()
+            # Card columns (no detailed_description or embedding), member profiles without their embedding vectors
+            .select(f"{PROJECT_LIST_COLUMNS}, github_url, app_project_members(*, profiles(id, full_name, username, avatar_url, email))")
         )
         projects = response.data or []
         # Add applications_count (pending) to each project
@@ -113,13 +157,187 @@ async def get_projects_with_members():
         print(f"Error fetching projects with members: {e}")
         return None
     
-async def get_projects(q:str):
+# Columns a project listing card needs; detailed_description, embedding and the
+# other heavy fields are only sent by the single-project endpoints
+PROJECT_LIST_COLUMNS = (
+    "id, title, description, status, project_type, domain, difficulty_level, "
+    "required_skills, tech_stack, programming_languages, estimated_duration, "
+    "team_size_min, team_size_max, is_remote, is_recruiting, is_public, "
+    "collaboration_type, image_url, tags, created_by, room_id, created_at, deadline"
+)
+PROJECT_MEMBER_COLUMNS = "user_id, role, status, profiles(id, full_name, username, avatar_url)"
+PROJECT_FILTERS = ("status", "domain", "difficulty_level", "is_recruiting")
+PROJECT_SORTS = ("created_at", "status", "domain", "difficulty_level", "is_recruiting")
+
+async def get_projects_page(
+    filters: Dict[str, object],
+    sort: str = "created_at",
+    desc: bool = True,
+    limit: int = 20,
+    after: Cursor = None,
+    include_members: bool = False,
+):
+    """
+    One page of projects, keyset-paginated on (sort, id).
+    applications_count (pending members) is counted by the database through an
+    embedded aggregate, so member rows are only sent when include_members is set.
+    Returns {"projects": [...], "next_cursor": token or None}.
+    """
+    select = PROJECT_LIST_COLUMNS + ", applications:app_project_members(count)"
+    if include_members:
+        select += f", members:app_project_members({PROJECT_MEMBER_COLUMNS})"
+
+    query = (
+        supabase.table("app_projects")
+        .select(select)
+        .eq("applications.status", "pending")
+        # Nullable sort columns keep their nulls at the end in both directions
+        .order(sort, desc=desc, nullsfirst=False)
+        .order("id", desc=desc)
+        .limit(limit + 1)
+    )
+    if include_members:
+        query = query.eq("members.status", "active")
+    for column, value in filters.items():
+        query = query.eq(column, value)
+    if after:
+        query = query.or_(keyset_filter(after, "lt" if desc else "gt", column=sort, nulls_last=sort != "created_at"))
+
+    response = await run_query(query)
+    rows = response.data or []
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    for project in rows:
+        applications = project.pop("applications", None) or [{}]
+        project["applications_count"] = applications[0].get("count", 0)
+
+    return {
+        "projects": rows,
+        "next_cursor": encode_cursor(rows[-1], column=sort) if has_more else None,
+    }
+
+# Feed: posts carry their own like/comment counters (post_counters.sql)
+FEED_POST_COLUMNS = "id, content, tags, created_at, author_id, like_count, comment_count, profiles(username, full_name)"
+FEED_COMMENT_COLUMNS = "id, user_id, text, created_at, user:user_id(name)"
+FEED_INLINE_COMMENTS = int(os.getenv("FEED_INLINE_COMMENTS", "3"))
+
+def _feed_comment(comment: dict) -> dict:
+    return {
+        "id": comment["id"],
+        "text": comment["text"],
+        "author": comment.get("user"),
+        "created_at": comment["created_at"],
+    }
+
+async def get_feed_page(viewer_id: str, limit: int = 20, after: Cursor = None):
+    """
+    One page of the feed, newest first, keyset-paginated on (created_at, id).
+    Each post carries its counters, liked_by_user and at most FEED_INLINE_COMMENTS
+    latest comments (oldest first); the rest come from get_post_comments_page.
+    Returns {"posts": [...], "next_cursor": token or None}.
+    """
+    query = (
+        supabase.table("posts")
+        .select(f"{FEED_POST_COLUMNS}, post_comments({FEED_COMMENT_COLUMNS})")
+        .order("created_at", desc=True)
+        .order("id", desc=True)
+        .order("created_at", desc=True, foreign_table="post_comments")
+        .limit(FEED_INLINE_COMMENTS, foreign_table="post_comments")
+        .limit(limit + 1)
+    )
+    if after:
+        query = query.or_(keyset_filter(after, "lt"))
+
+    response = await run_query(query)
+    posts = response.data or []
+    has_more = len(posts) > limit
+    posts = posts[:limit]
+
+    # Which of this page's posts the viewer liked, in one lookup
+    liked = set()
+    if posts:
+        likes = await run_query(
+            supabase.table("post_likes")
+            .select("post_id")
+            .eq("user_id", viewer_id)
+            .in_("post_id", [post["id"] for post in posts])
+        )
+        liked = {like["post_id"] for like in likes.data or []}
+
+    for post in posts:
+        post["likes"] = post["like_count"]
+        post["liked_by_user"] = post["id"] in liked
+        post["comments"] = [_feed_comment(c) for c in reversed(post.pop("post_comments", None) or [])]
+        post["has_more_comments"] = post["comment_count"] > len(post["comments"])
+
+    return {
+        "posts": posts,
+        "next_cursor": encode_cursor(posts[-1]) if has_more else None,
+    }
+
+async def get_post_comments_page(post_id: str, limit: int = 20, before: Cursor = None):
+    """
+    Comments on a post older than `before`, returned oldest first, for "load more"
+    under the inline ones. Pass next_cursor back as `before` to keep going.
+    """
+    query = (
+        supabase.table("post_comments")
+        .select(FEED_COMMENT_COLUMNS)
+        .eq("post_id", post_id)
+        .order("created_at", desc=True)
+        .order("id", desc=True)
+        .limit(limit + 1)
+    )
+    if before:
+        query = query.or_(keyset_filter(before, "lt"))
+
+    response = await run_query(query)
+    rows = response.data or []
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    return {
+        "comments": [_feed_comment(c) for c in reversed(rows)],
+        "next_cursor": encode_cursor(rows[-1]) if has_more else None,
+    }
+
+async def insert_post_like(post_id: str, user_id: str):
+    """Idempotent like; returns the post's like_count afterwards, or None if the post is gone."""
+    await run_query(
+        supabase.table("post_likes")
+        .upsert(
+            {"post_id": post_id, "user_id": user_id},
+            on_conflict="post_id,user_id",
+            ignore_duplicates=True,
+            returning=ReturnMethod.minimal,
+        )
+    )
+    response = await run_query(
+        supabase.table("posts").select("like_count").eq("id", post_id).limit(1)
+    )
+    return response.data[0]["like_count"] if response.data else None
+
+async def insert_post_comment(post_id: str, user_id: str, text: str):
+    """Insert a comment and return it, with its author, in the feed's comment shape."""
+    response = await run_query(
+        supabase.table("post_comments")
+        .insert({"post_id": post_id, "user_id": user_id, "text": text})
+    )
+    if not response.data:
+        return None
+    # The insert can't embed the author; read the row back the way the feed does
+    comment = await run_query(
+        supabase.table("post_comments").select(FEED_COMMENT_COLUMNS).eq("id", response.data[0]["id"]).limit(1)
+    )
+    return _feed_comment((comment.data or response.data)[0])
+
+async def get_projects(q:str, columns: str = "id , title , detailed_description"):
     try:
-        response = (
+        response = await run_query(
             supabase.table("app_projects")
-            .select("id , title , detailed_description")
+            .select(columns)
             .or_(f"title.ilike.%{q}%,detailed_description.ilike.%{q}%")
-            .execute()
         )
         return response.data
     except Exception as e:
@@ -129,12 +347,11 @@ async def get_projects(q:str):
 async def get_user_profile(user_id: str):
     """Get user profile by ID"""
     try:
-        response = (
+        response = await run_query(
             supabase.table("profiles")
             .select("*")
             .eq("id", user_id)
             .single()
-            .execute()
         )
         return response.data
     except Exception as e:
@@ -146,11 +363,10 @@ async def create_private_room(user1_id: str, user2_id: str):
     """Create or get existing private room between two users"""
     try:
         # Check if room already exists
-        existing_room = (
+        existing_room = await run_query(
             supabase.table("private_rooms")
             .select("*, rooms(*)")
             .or_(f"and(user1_id.eq.{user1_id},user2_id.eq.{user2_id}),and(user1_id.eq.{user2_id},user2_id.eq.{user1_id})")
-            .execute()
         )
         
         if existing_room.data:
@@ -164,7 +380,7 @@ async def create_private_room(user1_id: str, user2_id: str):
             "created_at": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         }
         
-        room_result = supabase.table("rooms").insert(room_data).execute()
+        room_result = await run_query(supabase.table("rooms").insert(room_data))
         
         if room_result.data:
             room_id = room_result.data[0]["id"]
@@ -176,7 +392,7 @@ async def create_private_room(user1_id: str, user2_id: str):
                 "user2_id": user2_id
             }
             
-            private_result = supabase.table("private_rooms").insert(private_room_data).execute()
+            private_result = await run_query(supabase.table("private_rooms").insert(private_room_data))
             
             # Add both users as room members
             members_data = [
@@ -184,7 +400,7 @@ async def create_private_room(user1_id: str, user2_id: str):
                 {"room_id": room_id, "user_id": user2_id, "role": "member"}
             ]
             
-            supabase.table("room_members").insert(members_data).execute()
+            await run_query(supabase.table("room_members").insert(members_data))
             
             return {
                 **private_result.data[0],
@@ -197,42 +413,97 @@ async def create_private_room(user1_id: str, user2_id: str):
         print(f"Error creating private room: {e}")
         return None
 
-async def get_room_messages(room_id: str, limit: int = 50, offset: int = 0):
+async def get_message_page(room_id: str, limit: int = 50, before: Cursor = None, after: Cursor = None):
+    """
+    One page of a room's messages, oldest first, by keyset on (created_at, id).
+    No cursor: the newest page. before: the page just older than the cursor. after: the page just newer.
+    Returns {"messages": [...], "next_cursor": token to continue in the same direction, or None}.
+    """
+    newest_first = after is None
+    query = (
+        supabase.table("messages")
+        .select("*")
+        .eq("room_id", room_id)
+        .order("created_at", desc=newest_first)
+        .order("id", desc=newest_first)
+        # One extra row tells whether another page exists
+        .limit(limit + 1)
+    )
+    if before:
+        query = query.or_(keyset_filter(before, "lt"))
+    if after:
+        query = query.or_(keyset_filter(after, "gt"))
+
+    response = await run_query(query)
+    rows = response.data or []
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if newest_first:
+        rows.reverse()
+
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor(rows[0] if newest_first else rows[-1])
+    return {"messages": rows, "next_cursor": next_cursor}
+
+async def get_room_messages(room_id: str, limit: int = 50, before: Cursor = None, after: Cursor = None):
+    """
+    Fetch a page of messages for a given room ID (see get_message_page).
+    Returns {"messages": [], "next_cursor": None} on error.
+    """
+    try:
+        page = await get_message_page(room_id, limit, before, after)
+        print(f"📩 {len(page['messages'])} messages fetched for room {room_id}")
+        return page
+
+    except Exception as e:
+        print(f"❌ Error fetching messages for room {room_id}: {e}")
+        return {"messages": [], "next_cursor": None}
+
+async def get_messages_after(room_id: str, message_id: str, limit: int = 500, anchor: Optional[Cursor] = None):
     """
-    Fetch messages for a given room ID.
-    Returns a list of messages, sorted by creation time.
+    Fetch up to `limit` messages posted in a room after the given message, oldest first.
+    Used to catch up reconnecting sockets when the gap is older than the in-memory history.
+    `anchor` is the message's (created_at, id) when the caller already has it, e.g. because
+    it hasn't been flushed yet. Returns None when the message can't be found or on error.
     """
     try:
-        response = (
-            supabase
-            .table("messages")
-            .select("*")   
+        if anchor is None:
+            found = await run_query(
+                supabase.table("messages")
+                .select("created_at, id")
+                .eq("id", message_id)
+                .eq("room_id", room_id)
+            )
+            if not found.data:
+                return None
+            anchor = (found.data[0]["created_at"], found.data[0]["id"])
+
+        response = await run_query(
+            supabase.table("messages")
+            .select("*")
             .eq("room_id", room_id)
+            .or_(keyset_filter(anchor, "gt"))
             .order("created_at", desc=False)
+            .order("id", desc=False)
             .limit(limit)
-            .offset(offset)
-            .execute()
         )
-
-        messages = response.data or []
-        print(f"📩 {len(messages)} messages fetched for room {room_id}")
-        return messages
+        return response.data or []
 
     except Exception as e:
-        print(f"❌ Error fetching messages for room {room_id}: {e}")
-        return []
+        print(f"❌ Error fetching messages after {message_id} in room {room_id}: {e}")
+        return None
 
 
 async def follow_user(follower_id: str, following_id: str):
     """Follow a user"""
     try:
         # Check if already following
-        existing = (
+        existing = await run_query(
             supabase.table("user_connections")
             .select("*")
             .eq("follower_id", follower_id)
             .eq("following_id", following_id)
-            .execute()
         )
         
         if existing.data:
@@ -243,7 +514,7 @@ async def follow_user(follower_id: str, following_id: str):
             "following_id": following_id
         }
         
-        result = supabase.table("user_connections").insert(connection_data).execute()
+        result = await run_query(supabase.table("user_connections").insert(connection_data))
         return {"success": True, "data": result.data[0]} if result.data else {"success": False}
     except Exception as e:
         print(f"Error following user: {e}")
@@ -252,14 +523,13 @@ async def follow_user(follower_id: str, following_id: str):
 async def unfollow_user(follower_id: str, following_id: str):
     """Unfollow a user"""
     try:
-        response = (
+        response = await run_query(
             supabase.table("user_connections")
             .delete()
             .eq("follower_id", follower_id)
             .eq("following_id", following_id)
-            .execute()
         )
-        return {"success": True}
+        return {"success": True, "removed": bool(response.data)}
     except Exception as e:
         print(f"Error unfollowing user: {e}")
         return {"success": False, "message": str(e)}
@@ -267,55 +537,48 @@ async def unfollow_user(follower_id: str, following_id: str):
 async def check_following_status(follower_id: str, following_id: str):
     """Check if user is following another user"""
     try:
-        response = (
+        response = await run_query(
             supabase.table("user_connections")
-            .select("*")
+            .select("id", count="exact", head=True)
             .eq("follower_id", follower_id)
             .eq("following_id", following_id)
-            .execute()
         )
-        return len(response.data) > 0
+        return (response.count or 0) > 0
     except Exception as e:
         print(f"Error checking following status: {e}")
         return False
 
+async def count_rows(table: str, column: str, value: str) -> int:
+    """Number of rows with column = value, counted by the database (no rows transferred)"""
+    response = await run_query(
+        supabase.table(table)
+        .select("id", count="exact", head=True)
+        .eq(column, value)
+    )
+    return response.count or 0
+
 async def get_user_stats(user_id: str):
-    """Get user statistics (followers, following, projects)"""
+    """Get user statistics (followers, following, projects) with count-only queries; None on error"""
     try:
-        # Get followers count
-        followers = (
-            supabase.table("user_connections")
-            .select("*")
-            .eq("following_id", user_id)
-            .execute()
+        followers, following, projects = await asyncio.gather(
+            count_rows("user_connections", "following_id", user_id),
+            count_rows("user_connections", "follower_id", user_id),
+            # Projects the user created in the app
+            count_rows("app_projects", "created_by", user_id),
         )
-        
-        # Get following count
-        following = (
-            supabase.table("user_connections")
-            .select("*")
-            .eq("follower_id", user_id)
-            .execute()
-        )
-        
-        # Get projects count
-        projects = (
-            supabase.table("projects")
-            .select("*")
-            .eq("profile_id", user_id)
-            .execute()
-        )
-        
         return {
-            "followers": followers.count or 0,
-            "following": following.count or 0,
-            "projects": projects.count or 0
+            "followers": followers,
+            "following": following,
+            "projects": projects
         }
     except Exception as e:
         print(f"Error fetching user stats: {e}")
-        return {"followers": 0, "following": 0, "projects": 0}
+        return None
     
 
+# Called with every message row written outside the journal (see last_messages)
+message_listeners: List[Callable[[Dict], None]] = []
+
 async def save_message(room_id: str, sender_id: str, content: str):
     """Save message to database"""
     try:
@@ -327,10 +590,12 @@ async def save_message(room_id: str, sender_id: str, content: str):
             "content": content
         }
         
-        result = supabase.table("messages").insert(message_data).execute()
+        result = await run_query(supabase.table("messages").insert(message_data))
         
         if result.data:
             print(f"✅ Message saved successfully: {result.data[0]}")
+            for listener in message_listeners:
+                listener(result.data[0])
             return result.data[0]
         else:
             print("❌ No data returned from message insert")
@@ -339,28 +604,41 @@ async def save_message(room_id: str, sender_id: str, content: str):
     except Exception as e:
         print(f"❌ Error saving message: {e}")
         return None
+
+async def save_messages_batch(messages: List[Dict]):
+    """
+    Insert many messages in one round trip.
+    Rows carry their own id, so re-sending a batch after a failure is a no-op for rows already stored.
+    """
+    try:
+        await run_query(supabase.table("messages").upsert(messages, on_conflict="id", ignore_duplicates=True))
+        print(f"✅ Flushed {len(messages)} messages")
+        return True
+    except Exception as e:
+        print(f"❌ Error flushing {len(messages)} messages: {e}")
+        return False
     
 # async def get_projects():
 
 # Insert a new project into app_projects
-def insert_app_project(project_data: dict):
+async def insert_app_project(project_data: dict):
     try:
-        response = supabase.table("app_projects").insert(project_data).execute()
+        response = await run_query(supabase.table("app_projects").insert(project_data))
         return response.data[0] if response.data else None
     except Exception as e:
         print(f"Error inserting project: {e}")
         return None
 
 # Insert a new member into app_project_members
-def insert_app_project_member(member_data: dict):
+async def insert_app_project_member(member_data: dict):
     try:
         # Insert the project member
-        response = supabase.table("app_project_members").insert(member_data).execute()
+        response = await run_query(supabase.table("app_project_members").insert(member_data))
         member_result = response.data[0] if response.data else None
         
         if member_result:
             # Get project information to find the owner
-            project_info = get_project_info(member_data['project_id'])
+            project_info = await get_project_info(member_data['project_id'])
             if project_info and project_info['created_by']:
                 # Create notification for project owner
                 notification_data = {
@@ -373,7 +651,7 @@ def insert_app_project_member(member_data: dict):
                 }
                 
                 # Insert the notification
-                insert_notification(notification_data)
+                await insert_notification(notification_data)
                 print(f"✅ Notification sent to project owner {project_info['created_by']}")
         
         return member_result
@@ -382,45 +660,64 @@ def insert_app_project_member(member_data: dict):
         return None
 
 # Get project information including owner
-def get_project_info(project_id: str):
+async def get_project_info(project_id: str):
     try:
-        response = supabase.table("app_projects").select("*").eq("id", project_id).execute()
+        response = await run_query(supabase.table("app_projects").select("*").eq("id", project_id))
         return response.data[0] if response.data else None
     except Exception as e:
         print(f"Error getting project info: {e}")
         return None
 
+# Called with every inserted notification row (see notification_push)
+notification_listeners: List[Callable[[Dict], None]] = []
+
 # Insert a new notification
-def insert_notification(notification_data: dict):
+async def insert_notification(notification_data: dict):
     try:
-        response = supabase.table("notifications").insert(notification_data).execute()
-        return response.data[0] if response.data else None
+        response = await run_query(supabase.table("notifications").insert(notification_data))
+        created = response.data[0] if response.data else None
     except Exception as e:
         print(f"Error inserting notification: {e}")
         return None
 
+    if created:
+        for listener in notification_listeners:
+            try:
+                listener(created)
+            except Exception as e:
+                print(f"Error publishing notification {created.get('id')}: {e}")
+    return created
+
+async def count_unread_notifications(user_id: str):
+    """Number of unread notifications, counted by the database without transferring rows"""
+    try:
+        res = await run_query(supabase.table("notifications")
+               .select("id", count="exact", head=True)
+               .eq("recipient_id", user_id)
+               .eq("is_read", False))
+        return res.count or 0
+    except Exception as e:
+        print(f"Error counting unread notifications: {e}")
+        return None
+
 async def get_notifications(user_id: str):
     try:
-        notif = (supabase.table("notification_with_sender")
+        notif = await run_query(supabase.table("notification_with_sender")
                .select("*")
                .eq("recipient_id", user_id)
                .order("created_at", desc=True)
-               .limit(20)
-               .execute())
+               .limit(20))
         
-        unread = (supabase.table("notifications")
-                .select("*")
-                .eq("recipient_id", user_id)
-                .eq("is_read", False)
-                .execute())
+        unread_count = await count_unread_notifications(user_id)
         
+        # None when the count failed, so callers don't take it for "all read"
         return {
             "notifications": notif.data,
-            "unread_count": len(unread.data) if unread.data else 0
+            "unread_count": unread_count
         }
     except Exception as e:
         print(f"Error fetching notifications: {e}")
-        return {"notifications": [], "unread_count": 0}
+        return {"notifications": [], "unread_count": None}
     
     
 async def get_unread_notifications(user_id: str):
@@ -429,26 +726,49 @@ async def get_unread_notifications(user_id: str):
     Returns: List of notification dictionaries or empty list on error
     """
     try:
-        res = (supabase.table("notifications")
+        res = await run_query(supabase.table("notifications")
                .select("*")
                .eq("recipient_id", user_id)
                .eq("is_read", False)
-               .execute()
               )
         return res.data
     except Exception as e:
         print(f"Error fetching unread notifications: {e}")
         return []
 
+async def mark_notifications_read(user_id: str, ids: Optional[List[str]] = None, until: Optional[str] = None):
+    """
+    Mark a user's unread notifications as read with one set-based update.
+    ids limits it to those notifications; until to ones created at or before that timestamp.
+    Returns how many were marked (no rows are sent back), or None on error.
+    """
+    try:
+        query = (supabase.table("notifications")
+                 .update({
+                     "is_read": True,
+                     "read_at": datetime.datetime.now().isoformat()
+                 }, count=CountMethod.exact, returning=ReturnMethod.minimal)
+                 .eq("recipient_id", user_id)
+                 .eq("is_read", False))
+        if ids is not None:
+            query = query.in_("id", ids)
+        if until is not None:
+            query = query.lte("created_at", until)
+
+        res = await run_query(query)
+        return res.count or 0
+    except Exception as e:
+        print(f"Error marking notifications as read: {e}")
+        return None
+
 async def Update_notif(notif_id:str):
     try:
-        res = (supabase.table("notifications")
+        res = await run_query(supabase.table("notifications")
                .update({
                    "is_read":True,
                    "read_at":datetime.datetime.now().isoformat()
                })
                .eq("id",notif_id)
-               .execute()
                )
         
         return res.data
@@ -462,11 +782,10 @@ async def get_communities(user_id: str):
     that the user hasn't created
     """
     try:
-        response = (supabase.table("rooms")
+        response = await run_query(supabase.table("rooms")
                     .select("*, room_members(count)", count="exact")
                     .or_("type.eq.group,type.eq.private_group")  # Include both types
                     .neq("created_by", user_id)
-                    .execute()
                     )
         
         communities = []
@@ -488,11 +807,10 @@ async def get_comminities_by_userid(userId: str):
     Get all communities (both types) created by the user
     """
     try:
-        response = (supabase.table("rooms")
+        response = await run_query(supabase.table("rooms")
                    .select("*, room_members(count)", count="exact")
                    .or_("type.eq.group,type.eq.private_group")  # Include both types
                    .eq("created_by", userId)
-                   .execute()
                    )
         
         communities = []
@@ -515,11 +833,10 @@ async def get_joined_communities(user_id: str):
     """
     try:
         # First get all room IDs the user is a member of
-        member_response = (
+        member_response = await run_query(
             supabase.table("room_members")
             .select("room_id")
             .eq("user_id", user_id)
-            .execute()
         )
         
         if not member_response.data:
@@ -528,12 +845,11 @@ async def get_joined_communities(user_id: str):
         room_ids = [member["room_id"] for member in member_response.data]
         
         # Then fetch full details of those rooms with member counts
-        rooms_response = (
+        rooms_response = await run_query(
             supabase.table("rooms")
             .select("*, room_members(count)", count="exact")
             .in_("id", room_ids)
             .or_("type.eq.group,type.eq.private_group")  # Include both types
-            .execute()
         )
         
         communities = []
@@ -552,14 +868,14 @@ async def get_joined_communities(user_id: str):
         return []
 async def add_community(room: dict):
     try:
-        response = supabase.table("rooms").insert({"name":room['name'] , "type": room['type'] , "description":room['description'] , "created_by":room['created_by']}).execute()
+        response = await run_query(supabase.table("rooms").insert({"name":room['name'] , "type": room['type'] , "description":room['description'] , "created_by":room['created_by']}))
         
         member_data = {
             "room_id":response.data[0]['id'],
             "user_id":room['created_by'],
             "role":"admin",
         }
-        supabase.table("room_members").insert(member_data).execute()
+        await run_query(supabase.table("room_members").insert(member_data))
         
         return response.data[0]
     except Exception as e:
@@ -571,10 +887,9 @@ async def Join_community(room_id: str, user_id: str):
         
         #checkl if room exists
         
-        room = (supabase.table("rooms")
+        room = await run_query(supabase.table("rooms")
                 .select("*")
                 .eq("id" , room_id)
-                .execute()
                 )
         
         if not room.data:
@@ -582,18 +897,17 @@ async def Join_community(room_id: str, user_id: str):
         
         #check if user is already a member of the room
         
-        member = (supabase.table("room_members")
+        member = await run_query(supabase.table("room_members")
                   .select("*")
                   .eq("room_id" , room_id)
                   .eq("user_id" , user_id)
-                  .execute()
                   )
         
         if member.data:
             return {"message":"User is already a member of the room"}
         
         #join the room
-        response = supabase.table("room_members").insert({"room_id":room_id , "user_id":user_id , "role":"member"}).execute()
+        response = await run_query(supabase.table("room_members").insert({"room_id":room_id , "user_id":user_id , "role":"member"}))
         if not response.data:
             return {"error":"Error joining room"}
         return response.data[0]
@@ -602,14 +916,13 @@ async def Join_community(room_id: str, user_id: str):
         return None
     
 # Get pending applications for a project
-def get_pending_applications_for_project(project_id: str):
+async def get_pending_applications_for_project(project_id: str):
     try:
-        response = (
+        response = await run_query(
             supabase.table("app_project_members")
             .select("*, profiles(*)")
             .eq("project_id", project_id)
             .eq("status", "pending")
-            .execute()
         )
         return response.data
     except Exception as e:
@@ -617,13 +930,12 @@ def get_pending_applications_for_project(project_id: str):
         return []
 
 # Update project member status
-def update_project_member_status(member_id: str, status: str):
+async def update_project_member_status(member_id: str, status: str):
     try:
-        response = (
+        response = await run_query(
             supabase.table("app_project_members")
             .update({"status": status})
             .eq("id", member_id)
-            .execute()
         )
         return response.data[0] if response.data else None
     except Exception as e:
@@ -631,14 +943,13 @@ def update_project_member_status(member_id: str, status: str):
         return None
 
 # Get project member by ID
-def get_project_member(member_id: str):
+async def get_project_member(member_id: str):
     try:
-        response = (
+        response = await run_query(
             supabase.table("app_project_members")
             .select("*, app_projects(*)")
             .eq("id", member_id)
             .single()
-            .execute()
         )
         return response.data
     except Exception as e:
@@ -646,12 +957,12 @@ def get_project_member(member_id: str):
         return None   
 
 # Create a room for a project
-def create_project_room(project_data: dict):
+async def create_project_room(project_data: dict):
     try:
         print(f"Creating room for project: {project_data['title']}")
         
         # Debug room_members table structure
-        debug_room_members_structure()
+        await debug_room_members_structure()
         
         # Create room for the project
         room_data = {
@@ -663,7 +974,7 @@ def create_project_room(project_data: dict):
         
         print(f"Room data: {room_data}")
         
-        response = supabase.table("rooms").insert(room_data).execute()
+        response = await run_query(supabase.table("rooms").insert(room_data))
         print(f"Room creation response: {response}")
         
         if response.data:
@@ -680,7 +991,7 @@ def create_project_room(project_data: dict):
             
             print(f"Adding member: {member_data}")
             try:
-                member_response = supabase.table("room_members").insert(member_data).execute()
+                member_response = await run_query(supabase.table("room_members").insert(member_data))
                 print(f"Member addition response: {member_response}")
             except Exception as member_error:
                 print(f"Error adding member to room: {member_error}")
@@ -698,13 +1009,12 @@ def create_project_room(project_data: dict):
         return None
 
 # Update project with room_id
-def update_project_room_id(project_id: str, room_id: str):
+async def update_project_room_id(project_id: str, room_id: str):
     try:
-        response = (
+        response = await run_query(
             supabase.table("app_projects")
             .update({"room_id": room_id})
             .eq("id", project_id)
-            .execute()
         )
         return response.data[0] if response.data else None
     except Exception as e:
@@ -712,14 +1022,13 @@ def update_project_room_id(project_id: str, room_id: str):
         return None
 
 # Add user to project room
-def add_user_to_project_room(room_id: str, user_id: str):
+async def add_user_to_project_room(room_id: str, user_id: str):
     try:
         # First check if user is already a member
-        existing_member = supabase.table("room_members") \
+        existing_member = await run_query(supabase.table("room_members") \
             .select("*") \
             .eq("room_id", room_id) \
-            .eq("user_id", user_id) \
-            .execute()
+            .eq("user_id", user_id))
         
         if existing_member.data:
             print(f"User {user_id} is already a member of room {room_id}")
@@ -731,21 +1040,20 @@ def add_user_to_project_room(room_id: str, user_id: str):
             "user_id": user_id,
             "role": "member"
         }
-        response = supabase.table("room_members").insert(member_data).execute()
+        response = await run_query(supabase.table("room_members").insert(member_data))
         return response.data[0] if response.data else None
     except Exception as e:
         print(f"Error adding user to project room: {e}")
         return None
 
 # Get project room info
-def get_project_room(project_id: str):
+async def get_project_room(project_id: str):
     try:
-        response = (
+        response = await run_query(
             supabase.table("app_projects")
             .select("room_id")
             .eq("id", project_id)
             .single()
-            .execute()
         )
         return response.data.get('room_id') if response.data else None
     except Exception as e:
@@ -753,17 +1061,16 @@ def get_project_room(project_id: str):
         return None
 
 # Check if room exists for a project
-def check_project_room_exists(project_id: str):
+async def check_project_room_exists(project_id: str):
     try:
-        room_id = get_project_room(project_id)
+        room_id = await get_project_room(project_id)
         if room_id:
             # Verify the room actually exists
-            room_response = (
+            room_response = await run_query(
                 supabase.table("rooms")
                 .select("id")
                 .eq("id", room_id)
                 .single()
-                .execute()
             )
             return room_response.data is not None
         return False
@@ -772,10 +1079,10 @@ def check_project_room_exists(project_id: str):
         return False
 
 # Debug function to check room_members table structure
-def debug_room_members_structure():
+async def debug_room_members_structure():
     try:
         # Try to get a sample record to see the structure
-        response = supabase.table("room_members").select("*").limit(1).execute()
+        response = await run_query(supabase.table("room_members").select("*").limit(1))
         print(f"Room members table structure: {response.data}")
         return True
     except Exception as e:
@@ -784,37 +1091,40 @@ def debug_room_members_structure():
 
 async def check_community_membership(community_id: str, user_id: str):
     # Check if user is member of community
-    result = supabase.table("room_members") \
+    result = await run_query(supabase.table("room_members") \
                    .select("*") \
                    .eq("room_id", community_id) \
-                   .eq("user_id", user_id) \
-                   .execute()
+                   .eq("user_id", user_id))
     return len(result.data) > 0
 
+async def get_room_member_ids(room_id: str):
+    """User ids of every member of a room, or None if the lookup failed"""
+    try:
+        result = await run_query(supabase.table("room_members") \
+                       .select("user_id") \
+                       .eq("room_id", room_id))
+        return [row["user_id"] for row in result.data]
+    except Exception as e:
+        print(f"❌ Error fetching members of room {room_id}: {e}")
+        return None
+
 async def check_community_ownership(community_id: str, user_id: str):
     # Check if user is owner of community
-    result = supabase.table("rooms") \
+    result = await run_query(supabase.table("rooms") \
                    .select("*") \
                    .eq("id", community_id) \
-                   .eq("created_by", user_id) \
-                   .execute()
+                   .eq("created_by", user_id))
     return len(result.data) > 0
 
-async def get_community_messages(community_id: str):
-    # Get chat messages for community
-    result = supabase.table("messages") \
-                   .select("*") \
-                   .eq("room_id", community_id) \
-                   .order("created_at") \
-                   .execute()
-    return result.data
+async def get_community_messages(community_id: str, limit: int = 50, before: Cursor = None, after: Cursor = None):
+    # Get one page of chat messages for community (see get_message_page)
+    return await get_message_page(community_id, limit, before, after)
 
 async def get_community_members(community_id: str):
     # Get all members of community
-    result = supabase.table("room_members") \
+    result = await run_query(supabase.table("room_members") \
                    .select("*, profiles(*)") \
-                   .eq("room_id", community_id) \
-                   .execute()
+                   .eq("room_id", community_id))
     return result.data
 
 
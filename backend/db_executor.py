@@ -0,0 +1,58 @@
+import asyncio
+import contextvars
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Blocking Supabase round trips run on at most this many threads; further calls queue.
+# Keep it at or below the HTTP client's keep-alive pool (20) so every thread reuses a connection.
+DB_THREADPOOL_SIZE = int(os.getenv("DB_THREADPOOL_SIZE", "16"))
+
+db_executor = ThreadPoolExecutor(max_workers=DB_THREADPOOL_SIZE, thread_name_prefix="supabase")
+
+# Process-wide counters; queue_wait is the time a call spent waiting for a free thread
+executor_stats = {
+    "calls": 0,
+    "errors": 0,
+    "in_flight": 0,
+    "max_in_flight": 0,
+    "queue_wait_ms_total": 0.0,
+    "queue_wait_ms_max": 0.0,
+}
+
+
+async def run_sync(fn, *args, **kwargs):
+    """
+    Run a blocking call on the database thread pool and await its result.
+    The caller's context variables are carried over to the worker thread.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    submitted = time.perf_counter()
+
+    def call():
+        waited_ms = (time.perf_counter() - submitted) * 1000
+        executor_stats["queue_wait_ms_total"] += waited_ms
+        executor_stats["queue_wait_ms_max"] = max(executor_stats["queue_wait_ms_max"], waited_ms)
+        return context.run(functools.partial(fn, *args, **kwargs))
+
+    executor_stats["calls"] += 1
+    executor_stats["in_flight"] += 1
+    executor_stats["max_in_flight"] = max(executor_stats["max_in_flight"], executor_stats["in_flight"])
+    try:
+        return await loop.run_in_executor(db_executor, call)
+    except Exception:
+        executor_stats["errors"] += 1
+        raise
+    finally:
+        executor_stats["in_flight"] -= 1
+
+
+async def run_query(query):
+    """Execute a Supabase query builder (table, rpc...) without blocking the event loop."""
+    return await run_sync(query.execute)
+
+
+def get_executor_stats() -> dict:
+    return {**executor_stats, "threads": DB_THREADPOOL_SIZE}
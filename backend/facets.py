@@ -0,0 +1,158 @@
+import bisect
+from typing import Dict, Iterable, List, Optional, Set
+
+from db import PROJECT_LIST_COLUMNS, get_search_documents
+from pagination import Cursor, encode_cursor
+from search_index import Loader, RowIndex
+
+# Facet columns of app_projects; the array ones match a project on any of their items
+FACETS = ("domain", "difficulty_level", "tech_stack", "programming_languages", "is_remote", "is_recruiting")
+ARRAY_FACETS = ("tech_stack", "programming_languages")
+
+popcount = int.bit_count if hasattr(int, "bit_count") else (lambda bits: bin(bits).count("1"))
+
+
+def facet_values(value) -> List[str]:
+    """A column value as facet keys: booleans as "true"/"false", arrays item by item."""
+    if value is None or value == "":
+        return []
+    if isinstance(value, bool):
+        return ["true" if value else "false"]
+    if isinstance(value, list):
+        return list(dict.fromkeys(str(item) for item in value if item not in (None, "")))
+    return [str(value)]
+
+
+class FacetIndex(RowIndex):
+    """
+    Project discovery filters answered from memory. Every project has a slot
+    number, and every facet value a bitmap (a Python int) with the bits of the
+    projects that have it set. Values of one facet are OR-ed, or AND-ed for an
+    array facet asked to match all; facets are AND-ed with each other.
+
+    Slots are handed out oldest first, so walking the matching bits from the top
+    lists projects newest first. Deleted projects leave their slot empty until
+    the next reload compacts them.
+    """
+
+    def __init__(self, loader: Loader = get_search_documents):
+        self.shown = tuple(column.strip() for column in PROJECT_LIST_COLUMNS.split(",") if column.strip() != "id")
+        super().__init__("app_projects", self.shown, loader)
+        self._slots: Dict[str, int] = {}
+        self._rows: List[Optional[Dict]] = []
+        # (created_at, id) per slot, ascending, to place cursors whose project is gone
+        self._keys: List[tuple] = []
+        self._all = 0
+        self._bitmaps: Dict[str, Dict[str, int]] = {facet: {} for facet in FACETS}
+
+    def __len__(self):
+        return len(self._slots)
+
+    def _ordered(self, rows: List[Dict]) -> List[Dict]:
+        return sorted(rows, key=lambda row: (row.get("created_at") or "", row["id"]))
+
+    def _mark(self, slot: int, row: Dict, present: bool):
+        bit = 1 << slot
+        for facet in FACETS:
+            bitmaps = self._bitmaps[facet]
+            for value in facet_values(row.get(facet)):
+                bits = bitmaps.get(value, 0)
+                bits = bits | bit if present else bits & ~bit
+                if bits:
+                    bitmaps[value] = bits
+                else:
+                    bitmaps.pop(value, None)
+
+    def _add(self, row_id: str, row: Dict):
+        slot = self._slots.get(row_id)
+        if slot is None:
+            # New projects are the newest, so they go on top
+            slot = len(self._rows)
+            self._slots[row_id] = slot
+            self._rows.append(None)
+            self._keys.append((row.get("created_at") or "", row_id))
+            current = {}
+        else:
+            current = self._rows[slot]
+            self._mark(slot, current, False)
+        merged = {"id": row_id, **{column: row.get(column, current.get(column)) for column in self.shown}}
+        self._rows[slot] = merged
+        self._mark(slot, merged, True)
+        self._all |= 1 << slot
+
+    def _remove(self, row_id: str) -> bool:
+        slot = self._slots.pop(row_id, None)
+        if slot is None:
+            return False
+        self._mark(slot, self._rows[slot], False)
+        self._rows[slot] = None
+        self._all &= ~(1 << slot)
+        return True
+
+    def _empty(self) -> "FacetIndex":
+        return FacetIndex(self.loader)
+
+    def _swap(self, fresh: "FacetIndex"):
+        self._slots, self._rows, self._keys, self._all, self._bitmaps = (
+            fresh._slots, fresh._rows, fresh._keys, fresh._all, fresh._bitmaps
+        )
+
+    def _mask(self, facet: str, values: List[str], match_all: bool) -> int:
+        bitmaps = [self._bitmaps[facet].get(value, 0) for value in values]
+        mask = bitmaps[0]
+        for bits in bitmaps[1:]:
+            mask = mask & bits if match_all else mask | bits
+        return mask
+
+    def _below(self, after: Cursor) -> int:
+        """Slots older than the cursor's project, as a mask."""
+        created_at, row_id = after
+        slot = self._slots.get(row_id)
+        if slot is None:
+            slot = bisect.bisect_left(self._keys, (created_at or "", row_id))
+        return (1 << slot) - 1
+
+    def query(self, selected: Dict[str, List[str]], match_all: Iterable[str] = (),
+              limit: int = 20, after: Optional[Cursor] = None) -> Dict:
+        """
+        Projects matching the selection, newest first, with a count for every facet
+        value. A facet's counts apply the other facets' selections but not its own,
+        so choosing one domain still shows how many projects each other domain has;
+        an array facet matched with all of its values narrows its own counts too.
+        """
+        self.stats["queries"] += 1
+        match_all: Set[str] = set(match_all) & set(ARRAY_FACETS)
+        masks = {
+            facet: self._mask(facet, values, facet in match_all)
+            for facet, values in selected.items() if facet in self._bitmaps and values
+        }
+
+        matching = self._all
+        for mask in masks.values():
+            matching &= mask
+
+        counts = {}
+        for facet, bitmaps in self._bitmaps.items():
+            scope = self._all
+            for other, mask in masks.items():
+                if other != facet or facet in match_all:
+                    scope &= mask
+            values = {value: popcount(bits & scope) for value, bits in bitmaps.items()}
+            counts[facet] = dict(sorted(((v, n) for v, n in values.items() if n), key=lambda item: (-item[1], item[0])))
+
+        remaining = matching & self._below(after) if after else matching
+        slots = []
+        while remaining and len(slots) <= limit:
+            slot = remaining.bit_length() - 1
+            slots.append(slot)
+            remaining ^= 1 << slot
+        projects = [dict(self._rows[slot]) for slot in slots[:limit]]
+        return {
+            "total": popcount(matching),
+            "facets": counts,
+            "projects": projects,
+            "next_cursor": encode_cursor(projects[-1]) if len(slots) > limit else None,
+        }
+
+
+project_facets = FacetIndex()
@@ -0,0 +1,981 @@
+"""
+In-process stand-in for the Supabase REST API, for benchmarks and offline runs.
+
+With SUPABASE_BACKEND=fake, create_supabase_client() returns a real supabase
+Client whose PostgREST session is served by FakeTransport instead of the network.
+Every builder the code uses (table/select/eq/neq/gt/lt/or_/in_/order/limit/offset/
+single/insert/upsert/update/delete, count/head, rpc) goes through the client's own
+request encoding and is answered here from in-memory tables, so the routers,
+db_executor and query_metrics run exactly as they do against Supabase.
+
+Tables come from the CREATE TABLE / ALTER TABLE / CREATE UNIQUE INDEX statements of
+the FAKE_SUPABASE_SCHEMA files; the views, RPCs and triggers the backend depends on
+are mirrored in Python below. FAKE_SUPABASE_SEED optionally names a JSON file of
+{table: [rows]} to load at start-up.
+"""
+import datetime
+import functools
+import heapq
+import json
+import math
+import os
+import re
+import threading
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from supabase import Client, create_client
+
+# "supabase" (the real project from SUPABASE_URL/SUPABASE_KEY) or "fake"
+SUPABASE_BACKEND = os.getenv("SUPABASE_BACKEND", "supabase")
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAKE_SUPABASE_SCHEMA = os.getenv("FAKE_SUPABASE_SCHEMA", "local_schema.sql,app_projects.sql,post_counters.sql")
+FAKE_SUPABASE_SEED = os.getenv("FAKE_SUPABASE_SEED")
+FAKE_SUPABASE_URL = "http://fake-supabase.local"
+
+REST_PREFIX = "/rest/v1/"
+OBJECT_MEDIA_TYPE = "application/vnd.pgrst.object+json"
+
+
+class PostgRESTError(Exception):
+    """Answered as a PostgREST error body with the given HTTP status."""
+
+    def __init__(self, status: int, code: str, message: str, details: str = None):
+        super().__init__(message)
+        self.status = status
+        self.body = {"code": code, "message": message, "details": details, "hint": None}
+
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+# --------------------
+# Schema
+# --------------------
+
+class Table:
+    def __init__(self, name: str):
+        self.name = name
+        self.types: Dict[str, str] = {}
+        self.defaults: Dict[str, Callable[[], Any]] = {}
+        self.references: Dict[str, str] = {}  # column -> referenced table
+        self.primary_key = "id"
+        self.unique: List[Tuple[str, ...]] = []
+        self.rows: List[Dict] = []
+        self.version = 0
+        self._indexes: Dict[str, Tuple[int, Dict[Any, List[Dict]]]] = {}
+
+    def index(self, column: str) -> Dict[Any, List[Dict]]:
+        """Rows by value of `column`; built on first use, kept current by add() and changed()."""
+        cached = self._indexes.get(column)
+        if cached and cached[0] == self.version:
+            return cached[1]
+        index: Dict[Any, List[Dict]] = {}
+        for row in self.rows:
+            value = row.get(column)
+            if isinstance(value, (str, int, float, bool)) or value is None:
+                index.setdefault(value, []).append(row)
+        self._indexes[column] = (self.version, index)
+        return index
+
+    def add(self, row: Dict):
+        self.rows.append(row)
+        for column, (version, index) in self._indexes.items():
+            value = row.get(column)
+            if version == self.version and (isinstance(value, (str, int, float, bool)) or value is None):
+                index.setdefault(value, []).append(row)
+
+    def changed(self, columns=None):
+        """Rows were updated or removed: drop the indexes on `columns` (all of them by default)."""
+        if columns is None:
+            self.version += 1
+        else:
+            for column in columns:
+                self._indexes.pop(column, None)
+
+
+def _split_statements(sql: str) -> List[str]:
+    """Split on top-level semicolons, skipping comments, quoted strings and $$ bodies."""
+    statements, current, i = [], [], 0
+    while i < len(sql):
+        if sql.startswith("--", i):
+            i = sql.find("\n", i)
+            i = len(sql) if i == -1 else i
+            continue
+        if sql.startswith("$$", i):
+            end = sql.find("$$", i + 2)
+            end = len(sql) if end == -1 else end + 2
+            current.append(sql[i:end])
+            i = end
+            continue
+        char = sql[i]
+        if char == "'":
+            end = i + 1
+            while end < len(sql):
+                if sql[end] == "'" and sql[end + 1:end + 2] == "'":
+                    end += 2
+                elif sql[end] == "'":
+                    break
+                else:
+                    end += 1
+            current.append(sql[i:end + 1])
+            i = end + 1
+            continue
+        if char == ";":
+            statements.append("".join(current).strip())
+            current = []
+        else:
+            current.append(char)
+        i += 1
+    statements.append("".join(current).strip())
+    return [s for s in statements if s]
+
+
+def _split_top_level(text: str, separator: str = ",") -> List[str]:
+    """Split on separators outside parentheses and quotes."""
+    parts, current, depth, quote = [], [], 0, None
+    escaped = False
+    for char in text:
+        if quote:
+            current.append(char)
+            if escaped:
+                escaped = False
+            elif char == "\\" and quote == '"':
+                escaped = True
+            elif char == quote:
+                quote = None
+            continue
+        if char in "'\"":
+            quote = char
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == separator and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+            continue
+        current.append(char)
+    if current or parts:
+        parts.append("".join(current).strip())
+    return parts
+
+
+_DEFAULT = re.compile(r"\bDEFAULT\s+('(?:[^']|'')*'(?:::[\w\[\]]+)?|[\w.]+\(\)|-?[\w.]+)", re.IGNORECASE)
+_REFERENCES = re.compile(r"\bREFERENCES\s+([\w.]+)", re.IGNORECASE)
+
+
+def _default_factory(expression: str) -> Callable[[], Any]:
+    lowered = expression.lower()
+    if lowered in ("gen_random_uuid()", "uuid_generate_v4()"):
+        return lambda: str(uuid.uuid4())
+    if lowered in ("now()", "current_timestamp"):
+        return _now
+    if lowered in ("true", "false"):
+        return lambda: lowered == "true"
+    if lowered == "null":
+        return lambda: None
+    if expression.startswith("'"):
+        literal = expression[1:expression.rindex("'")].replace("''", "'")
+        if literal.startswith("{") and literal.endswith("}"):
+            return lambda: _parse_pg_array(literal)
+        return lambda: literal
+    try:
+        number = int(expression)
+    except ValueError:
+        number = float(expression)
+    return lambda: number
+
+
+def _add_column(table: Table, definition: str):
+    name, _, rest = definition.partition(" ")
+    name = name.strip('"')
+    column_type = rest.strip().split(" ", 1)[0].lower() if rest.strip() else "text"
+    table.types[name] = column_type
+    default = _DEFAULT.search(rest)
+    if default:
+        table.defaults[name] = _default_factory(default.group(1))
+    reference = _REFERENCES.search(rest)
+    # auth.users and other schema-qualified targets aren't exposed through the API
+    if reference and "." not in reference.group(1):
+        table.references[name] = reference.group(1)
+    if re.search(r"\bPRIMARY\s+KEY\b", rest, re.IGNORECASE):
+        table.primary_key = name
+    elif re.search(r"\bUNIQUE\b", rest, re.IGNORECASE):
+        table.unique.append((name,))
+
+
+def _columns_in(text: str) -> Tuple[str, ...]:
+    return tuple(c.strip().strip('"') for c in text[text.index("(") + 1:text.rindex(")")].split(","))
+
+
+def load_schema(tables: Dict[str, Table], sql: str):
+    """Add the tables, columns and unique constraints declared in `sql` to `tables`."""
+    for statement in _split_statements(sql):
+        flat = " ".join(statement.split())
+
+        match = re.match(r"CREATE TABLE (?:IF NOT EXISTS )?([\w.]+) ?\((.*)\)$", flat, re.IGNORECASE)
+        if match:
+            table = tables.setdefault(match.group(1).split(".")[-1], Table(match.group(1).split(".")[-1]))
+            for item in _split_top_level(match.group(2)):
+                keyword = re.match(r"\w*", item).group(0).upper()
+                if item.upper().startswith("PRIMARY KEY"):
+                    table.primary_key = _columns_in(item)[0]
+                elif keyword == "UNIQUE":
+                    table.unique.append(_columns_in(item))
+                elif item.upper().startswith("FOREIGN KEY"):
+                    reference = _REFERENCES.search(item)
+                    if reference and "." not in reference.group(1):
+                        table.references[_columns_in(item)[0]] = reference.group(1)
+                elif keyword not in ("CONSTRAINT", "CHECK", "EXCLUDE"):
+                    _add_column(table, item)
+            continue
+
+        match = re.match(r"ALTER TABLE (?:IF EXISTS )?([\w.]+) (.*)$", flat, re.IGNORECASE)
+        if match and match.group(1).split(".")[-1] in tables:
+            table = tables[match.group(1).split(".")[-1]]
+            for action in _split_top_level(match.group(2)):
+                added = re.match(r"ADD COLUMN (?:IF NOT EXISTS )?(.*)$", action, re.IGNORECASE)
+                default = re.match(r"ALTER COLUMN (\w+) SET DEFAULT (.*)$", action, re.IGNORECASE)
+                if added:
+                    _add_column(table, added.group(1))
+                elif default:
+                    table.defaults[default.group(1)] = _default_factory(default.group(2).strip())
+            continue
+
+        match = re.match(r"CREATE UNIQUE INDEX (?:IF NOT EXISTS )?\w+ ON ([\w.]+) ?(\(.*\))$", flat, re.IGNORECASE)
+        if match and match.group(1).split(".")[-1] in tables:
+            tables[match.group(1).split(".")[-1]].unique.append(_columns_in(match.group(2)))
+
+
+# --------------------
+# Values and filters
+# --------------------
+
+def _parse_pg_array(literal: str) -> List[str]:
+    inner = literal.strip()[1:-1]
+    return [_unquote(item) for item in _split_top_level(inner)] if inner else []
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return re.sub(r"\\(.)", r"\1", value[1:-1])
+    return value
+
+
+def _parse_timestamp(value: str) -> Optional[datetime.datetime]:
+    try:
+        parsed = datetime.datetime.fromisoformat(value.replace("Z", "+00:00").replace(" ", "T", 1))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=datetime.timezone.utc)
+
+
+def _normalize(table: Optional[Table], column: str, value: Any) -> Any:
+    """Store values the way Postgres would hand them back (timestamps in ISO 8601, UTC)."""
+    if table and isinstance(value, str) and table.types.get(column, "").startswith("timestamp"):
+        parsed = _parse_timestamp(value)
+        return parsed.astimezone(datetime.timezone.utc).isoformat() if parsed else value
+    return value
+
+
+def _coerce(raw: str, sample: Any, column_type: str) -> Any:
+    """Filter value from the URL, typed like the row value it is compared to."""
+    if isinstance(sample, bool) or column_type == "boolean":
+        return raw.lower() == "true"
+    if isinstance(sample, (int, float)) and not isinstance(sample, bool):
+        return float(raw)
+    if isinstance(sample, list):
+        return _parse_pg_array(raw) if raw.startswith("{") else json.loads(raw)
+    if column_type.startswith("timestamp"):
+        return _parse_timestamp(raw) or raw
+    return raw
+
+
+def _comparable(value: Any, column_type: str) -> Any:
+    if isinstance(value, str) and column_type.startswith("timestamp"):
+        return _parse_timestamp(value) or value
+    return value
+
+
+def _like(pattern: str, case_insensitive: bool) -> re.Pattern:
+    regex = "".join(
+        ".*" if char in "%*" else "." if char == "_" else re.escape(char) for char in pattern
+    )
+    return re.compile(f"^{regex}$", re.IGNORECASE | re.DOTALL if case_insensitive else re.DOTALL)
+
+
+def _matches(value: Any, op: str, raw: str, column_type: str) -> bool:
+    if op == "is":
+        lowered = raw.lower()
+        if lowered == "null":
+            return value is None
+        if lowered in ("true", "false"):
+            return value is (lowered == "true")
+        raise PostgRESTError(400, "PGRST100", f'"failed to parse filter (is.{raw})"')
+    if value is None:
+        return False
+
+    if op == "in":
+        inner = raw.strip()
+        if not (inner.startswith("(") and inner.endswith(")")):
+            raise PostgRESTError(400, "PGRST100", f'"failed to parse filter (in.{raw})"')
+        items = [_unquote(item) for item in _split_top_level(inner[1:-1])] if inner[1:-1] else []
+        return any(_comparable(value, column_type) == _coerce(item, value, column_type) for item in items)
+    if op in ("like", "ilike"):
+        return bool(_like(raw, op == "ilike").match(str(value)))
+    if op in ("cs", "cd", "ov"):
+        wanted = set(_coerce(raw, value if isinstance(value, list) else [], column_type))
+        have = set(value if isinstance(value, list) else [value])
+        return {"cs": wanted <= have, "cd": have <= wanted, "ov": bool(wanted & have)}[op]
+
+    expected = _coerce(raw, value, column_type)
+    actual = _comparable(value, column_type)
+    try:
+        if op == "eq":
+            return actual == expected
+        if op == "neq":
+            return actual != expected
+        if op == "gt":
+            return actual > expected
+        if op == "gte":
+            return actual >= expected
+        if op == "lt":
+            return actual < expected
+        if op == "lte":
+            return actual <= expected
+    except TypeError:
+        return False
+    raise PostgRESTError(400, "PGRST100", f'"unsupported operator {op}"')
+
+
+def _parse_condition(text: str):
+    """`col.op.value`, `col.not.op.value`, `and(...)`, `or(...)`, `not.and(...)` -> filter tree."""
+    negate = text.startswith("not.")
+    body = text[4:] if negate else text
+    group = re.match(r"^(and|or)\((.*)\)$", body, re.DOTALL)
+    if group:
+        node = (group.group(1), [_parse_condition(item) for item in _split_top_level(group.group(2))])
+        return ("not", node) if negate else node
+
+    column, _, rest = body.partition(".")
+    node = _parse_operation(column, rest)
+    return ("not", node) if negate else node
+
+
+def _parse_operation(column: str, operation: str):
+    negate = operation.startswith("not.")
+    if negate:
+        operation = operation[4:]
+    op, dot, raw = operation.partition(".")
+    if not dot:
+        raise PostgRESTError(400, "PGRST100", f'"failed to parse filter ({operation})"')
+    node = ("cond", column, op, _unquote(raw))
+    return ("not", node) if negate else node
+
+
+def _evaluate(node, row: Dict, table: Optional[Table]) -> bool:
+    kind = node[0]
+    if kind == "and":
+        return all(_evaluate(child, row, table) for child in node[1])
+    if kind == "or":
+        return any(_evaluate(child, row, table) for child in node[1])
+    if kind == "not":
+        return not _evaluate(node[1], row, table)
+    _, column, op, raw = node
+    return _matches(row.get(column), op, raw, table.types.get(column, "") if table else "")
+
+
+def _parse_order(text: str) -> List[Tuple[str, bool, bool]]:
+    """`col.desc.nullslast,id` -> [(column, descending, nulls_first)], Postgres defaults for nulls."""
+    terms = []
+    for term in _split_top_level(text):
+        parts = term.split(".")
+        descending = "desc" in parts[1:]
+        nulls_first = "nullsfirst" in parts[1:] or (descending and "nullslast" not in parts[1:])
+        terms.append((parts[0], descending, nulls_first))
+    return terms
+
+
+def _sort(rows: List[Dict], order: List[Tuple[str, bool, bool]], table: Optional[Table], limit: int = None) -> List[Dict]:
+    """Rows in `order`; only the first `limit` of them when given."""
+    def compare(a: Dict, b: Dict) -> int:
+        for column, descending, nulls_first in order:
+            column_type = table.types.get(column, "") if table else ""
+            x, y = _comparable(a.get(column), column_type), _comparable(b.get(column), column_type)
+            if x == y:
+                continue
+            if x is None or y is None:
+                return (-1 if x is None else 1) * (1 if nulls_first else -1)
+            result = -1 if x < y else 1
+            return -result if descending else result
+        return 0
+
+    if limit is not None and limit < len(rows):
+        return heapq.nsmallest(limit, rows, key=functools.cmp_to_key(compare))
+    return sorted(rows, key=functools.cmp_to_key(compare))
+
+
+def _candidates(rows: List[Dict], filters: List, table: Optional[Table]) -> List[Dict]:
+    """
+    Rows that can match `filters`: looked up in a column index through the first
+    top-level eq/in filter on a text or uuid column, or every row otherwise.
+    The filters themselves are still applied to the result.
+    """
+    if table is None:
+        return rows
+    for node in filters:
+        found = _lookup(node, table)
+        if found is not None:
+            return found
+    return rows
+
+
+def _lookup(node, table: Table) -> Optional[List[Dict]]:
+    """Rows matching an eq/in filter through an index, an or() of them, or None if it can't."""
+    if node[0] == "or":
+        found, seen = [], set()
+        for child in node[1]:
+            rows = _lookup(child, table)
+            if rows is None:
+                return None
+            for row in rows:
+                if id(row) not in seen:
+                    seen.add(id(row))
+                    found.append(row)
+        return found
+    if node[0] != "cond" or node[2] not in ("eq", "in"):
+        return None
+    _, column, op, raw = node
+    if column != table.primary_key and table.types.get(column) not in ("uuid", "text"):
+        return None
+    index = table.index(column)
+    if op == "eq":
+        return index.get(raw, [])
+    inner = raw.strip()[1:-1]
+    values = dict.fromkeys(_unquote(item) for item in _split_top_level(inner)) if inner else {}
+    return [row for value in values for row in index.get(value, [])]
+
+
+# --------------------
+# Select trees and embedding
+# --------------------
+
+class Embed:
+    def __init__(self, name: str, alias: Optional[str], hint: Optional[str], inner: bool, fields: List):
+        self.name = name
+        self.alias = alias
+        self.hint = hint
+        self.inner = inner
+        self.fields = fields
+        self.filters: List = []
+        self.order: List[Tuple[str, bool, bool]] = []
+        self.limit: Optional[int] = None
+        self.offset = 0
+
+    @property
+    def key(self) -> str:
+        return self.alias or self.name
+
+
+def _parse_select(text: str) -> List:
+    """select=... -> list of ("*",), (column, alias) or Embed."""
+    fields = []
+    for item in _split_top_level(re.sub(r"\s+", "", text or "*")):
+        alias = None
+        if ":" in item.split("(", 1)[0]:
+            alias, item = item.split(":", 1)
+        if "(" in item:
+            head, inner = item[:item.index("(")], item[item.index("(") + 1:item.rindex(")")]
+            name, _, hint = head.partition("!")
+            fields.append(Embed(name, alias, hint if hint not in ("", "inner", "left") else None,
+                                "inner" in head.split("!")[1:], _parse_select(inner)))
+        elif item == "*":
+            fields.append(("*",))
+        else:
+            fields.append((item.split("::", 1)[0], alias))
+    return fields
+
+
+def _find_embed(fields: List, path: List[str]) -> Optional[Embed]:
+    for field in fields:
+        if isinstance(field, Embed) and field.key == path[0]:
+            return field if len(path) == 1 else _find_embed(field.fields, path[1:])
+    return None
+
+
+# --------------------
+# The in-memory database
+# --------------------
+
+class View:
+    """A view over one base table: each row of it mapped by `project(database, row)`."""
+
+    def __init__(self, base: str, project: Callable[["FakeDatabase", Dict], Dict]):
+        self.base = base
+        self.project = project
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.tables: Dict[str, Table] = {}
+        self.views: Dict[str, View] = {}
+        self.rpcs: Dict[str, Callable[..., Any]] = {}
+        # table -> callables run with each inserted / deleted row, like AFTER ... FOR EACH ROW triggers
+        self.after_insert: Dict[str, List[Callable[["FakeDatabase", Dict], None]]] = {}
+        self.after_delete: Dict[str, List[Callable[["FakeDatabase", Dict], None]]] = {}
+        self.lock = threading.RLock()
+        self.stats = {"requests": 0, "errors": 0}
+
+    def load_schema_files(self, paths: List[str]):
+        for path in paths:
+            full = path if os.path.isabs(path) else os.path.join(REPO_ROOT, path)
+            with open(full) as f:
+                load_schema(self.tables, f.read())
+
+    def reset(self):
+        """Drop every row, keeping the schema."""
+        with self.lock:
+            for table in self.tables.values():
+                table.rows = []
+                table.changed()
+
+    def seed(self, table_name: str, rows: List[Dict]) -> List[Dict]:
+        """Insert rows directly (defaults applied, no triggers); returns them."""
+        with self.lock:
+            table = self._table(table_name)
+            created = [self._new_row(table, row, None, False) for row in rows]
+            table.rows.extend(created)
+            table.changed()
+            return created
+
+    def rows(self, name: str) -> List[Dict]:
+        """Rows of a table or view."""
+        if name in self.views:
+            view = self.views[name]
+            return [view.project(self, row) for row in self._table(view.base).rows]
+        return self._table(name).rows
+
+    def get(self, table_name: str, value: Any, column: str = "id") -> Optional[Dict]:
+        matches = self._table(table_name).index(column).get(value)
+        return matches[0] if matches else None
+
+    def _table(self, name: str) -> Table:
+        if name not in self.tables:
+            raise PostgRESTError(404, "42P01", f'relation "public.{name}" does not exist')
+        return self.tables[name]
+
+    def _new_row(self, table: Table, data: Dict, columns: Optional[List[str]], missing_default: bool) -> Dict:
+        row = {}
+        for column in table.types:
+            if column in data:
+                row[column] = _normalize(table, column, data[column])
+            elif columns and column in columns and not missing_default:
+                row[column] = None
+            elif column in table.defaults:
+                row[column] = table.defaults[column]()
+            else:
+                row[column] = None
+        # Columns the schema file doesn't know about are kept rather than rejected
+        for column, value in data.items():
+            row.setdefault(column, value)
+        return row
+
+    # ---- reads ----
+
+    def _select(self, source: str, fields: List, filters: List, order, limit, offset) -> Tuple[List[Dict], int]:
+        table = self.tables.get(source)
+        view = self.views.get(source)
+        if view:
+            # Narrow down on the base table, whose columns the view passes through
+            base = self._table(view.base)
+            rows = [view.project(self, row) for row in _candidates(base.rows, filters, base)]
+        else:
+            rows = _candidates(self.rows(source), filters, table)
+        condition = ("and", filters)
+        matched = [row for row in rows if _evaluate(condition, row, table)] if filters else list(rows)
+        inner = [f for f in fields if isinstance(f, Embed) and f.inner]
+        projected_all = None
+        if inner:
+            projected_all = [(row, self._project(source, row, fields)) for row in matched]
+            projected_all = [(row, out) for row, out in projected_all
+                             if all(out.get(embed.key) not in (None, []) for embed in inner)]
+            matched = [row for row, _ in projected_all]
+        total = len(matched)
+        if order:
+            matched = _sort(matched, order, table, offset + limit if limit is not None else None)
+        page = matched[offset:offset + limit if limit is not None else None]
+        if projected_all is not None:
+            by_identity = {id(row): out for row, out in projected_all}
+            return [by_identity[id(row)] for row in page], total
+        return [self._project(source, row, fields) for row in page], total
+
+    def _relationship(self, source: str, embed: Embed) -> Tuple[str, str, str, bool]:
+        """(target, local column, target column, to_many) for embedding `embed` in rows of `source`."""
+        table = self.tables.get(source)
+        references = table.references if table else {}
+        if embed.name in references:
+            return references[embed.name], embed.name, "id", False
+        if embed.name in self.tables or embed.name in self.views:
+            local = [c for c, target in references.items() if target == embed.name]
+            if embed.hint in local:
+                local = [embed.hint]
+            if local:
+                return embed.name, local[0], "id", False
+            target = self.tables.get(embed.name)
+            remote = [c for c, ref in (target.references.items() if target else []) if ref == source]
+            if embed.hint in remote:
+                remote = [embed.hint]
+            if remote:
+                return embed.name, "id", remote[0], True
+        raise PostgRESTError(
+            400, "PGRST200", f"Could not find a relationship between '{source}' and '{embed.name}' in the schema cache"
+        )
+
+    def _project(self, source: str, row: Dict, fields: List) -> Dict:
+        out: Dict[str, Any] = {}
+        for field in fields:
+            if isinstance(field, Embed):
+                out[field.key] = self._embed(source, row, field)
+            elif field[0] == "*":
+                out.update({k: v for k, v in row.items()})
+            else:
+                out[field[1] or field[0]] = row.get(field[0])
+        return out
+
+    def _embed(self, source: str, row: Dict, embed: Embed):
+        target, local, remote, to_many = self._relationship(source, embed)
+        value = row.get(local)
+        if target in self.views:
+            candidates = [r for r in self.rows(target) if r.get(remote) == value]
+        else:
+            candidates = self.tables[target].index(remote).get(value, []) if value is not None else []
+        table = self.tables.get(target)
+        if embed.filters:
+            candidates = [r for r in candidates if _evaluate(("and", embed.filters), r, table)]
+
+        if embed.fields == [("count", None)]:
+            return [{"count": len(candidates)}]
+        if not to_many:
+            return self._project(target, candidates[0], embed.fields) if candidates else None
+        if embed.order:
+            candidates = _sort(candidates, embed.order, table, embed.offset + embed.limit if embed.limit is not None else None)
+        end = embed.offset + embed.limit if embed.limit is not None else None
+        return [self._project(target, r, embed.fields) for r in candidates[embed.offset:end]]
+
+    # ---- writes ----
+
+    def _conflicts(self, table: Table, row: Dict, columns: List[Tuple[str, ...]]) -> Optional[Dict]:
+        for key in columns:
+            values = tuple(row.get(c) for c in key)
+            if any(v is None for v in values):
+                continue
+            for existing in table.index(key[0]).get(values[0], []):
+                if tuple(existing.get(c) for c in key) == values:
+                    return existing
+        return None
+
+    def _insert(self, table: Table, payload, params, prefer: Dict[str, str]) -> List[Dict]:
+        records = payload if isinstance(payload, list) else [payload or {}]
+        columns = params.get("columns", "").split(",") if params.get("columns") else None
+        missing_default = prefer.get("missing") == "default"
+        resolution = prefer.get("resolution")
+        constraints = [(table.primary_key,)] + table.unique
+        on_conflict = tuple(params["on_conflict"].split(",")) if params.get("on_conflict") else (table.primary_key,)
+
+        written = []
+        for record in records:
+            row = self._new_row(table, record, columns, missing_default)
+            existing = self._conflicts(table, row, [on_conflict]) if resolution else None
+            if existing is not None:
+                if resolution == "merge-duplicates":
+                    existing.update({k: _normalize(table, k, v) for k, v in record.items()})
+                    table.changed(record)
+                    written.append(existing)
+                continue
+            clash = self._conflicts(table, row, constraints)
+            if clash is not None:
+                raise PostgRESTError(
+                    409, "23505", f'duplicate key value violates unique constraint on "{table.name}"'
+                )
+            table.add(row)
+            written.append(row)
+            for trigger in self.after_insert.get(table.name, []):
+                trigger(self, row)
+        return written
+
+    def _update(self, table: Table, payload: Dict, filters: List) -> List[Dict]:
+        condition = ("and", filters)
+        updated = [row for row in _candidates(table.rows, filters, table) if _evaluate(condition, row, table)]
+        for row in updated:
+            row.update({k: _normalize(table, k, v) for k, v in payload.items()})
+        if updated:
+            table.changed(payload)
+        return updated
+
+    def _delete(self, table: Table, filters: List) -> List[Dict]:
+        condition = ("and", filters)
+        deleted = [row for row in _candidates(table.rows, filters, table) if _evaluate(condition, row, table)]
+        if deleted:
+            gone = {id(row) for row in deleted}
+            table.rows = [row for row in table.rows if id(row) not in gone]
+            table.changed()
+            for row in deleted:
+                for trigger in self.after_delete.get(table.name, []):
+                    trigger(self, row)
+        return deleted
+
+    # ---- HTTP ----
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.stats["requests"] += 1
+        try:
+            with self.lock:
+                status, body, headers = self._handle(request)
+        except PostgRESTError as e:
+            self.stats["errors"] += 1
+            status, body, headers = e.status, e.body, {}
+        content = b"" if body is None or request.method == "HEAD" else json.dumps(body, default=str).encode()
+        headers = {"Content-Type": "application/json", **headers}
+        return httpx.Response(status, headers=headers, content=content, request=request)
+
+    def _handle(self, request: httpx.Request):
+        path = request.url.path
+        if REST_PREFIX not in path:
+            raise PostgRESTError(501, "FAKE", f"{path} is not served by the fake backend")
+        name = path.split(REST_PREFIX, 1)[1].strip("/")
+        prefer = dict(
+            item.strip().split("=", 1) for item in request.headers.get("Prefer", "").split(",") if "=" in item
+        )
+        payload = json.loads(request.content) if request.content else None
+
+        fields = _parse_select(request.url.params.get("select", "*"))
+        filters, order, limit, offset = [], [], None, 0
+        params: Dict[str, str] = {}
+        for key, value in request.url.params.multi_items():
+            if key in ("select", "columns", "on_conflict"):
+                params[key] = value
+                continue
+            path_parts = key.split(".")
+            target: Optional[Embed] = None
+            if len(path_parts) > 1 and path_parts[0] not in ("not", "or", "and"):
+                target = _find_embed(fields, path_parts[:-1])
+                if target is None:
+                    raise PostgRESTError(400, "PGRST108", f"'{'.'.join(path_parts[:-1])}' is not an embedded resource")
+                key = path_parts[-1]
+            if key == "order":
+                parsed = _parse_order(value)
+                if target:
+                    target.order = parsed
+                else:
+                    order = parsed
+            elif key == "limit":
+                if target:
+                    target.limit = int(value)
+                else:
+                    limit = int(value)
+            elif key == "offset":
+                if target:
+                    target.offset = int(value)
+                else:
+                    offset = int(value)
+            else:
+                if key in ("or", "and", "not.or", "not.and"):
+                    node = _parse_condition(f"{key}{value}")
+                else:
+                    node = _parse_operation(key, value)
+                (target.filters if target else filters).append(node)
+
+        if name.startswith("rpc/"):
+            return self._rpc(name[4:], payload or {}, fields, filters, order, limit, offset, request, prefer)
+
+        if request.method in ("GET", "HEAD"):
+            rows, total = self._select(name, fields, filters, order, limit, offset)
+            return self._respond(request, prefer, rows, total, offset)
+
+        table = self._table(name)
+        if request.method == "POST":
+            written = self._insert(table, payload, params, prefer)
+            return self._write_response(request, prefer, table, written, fields, 201)
+        if request.method == "PATCH":
+            return self._write_response(request, prefer, table, self._update(table, payload or {}, filters), fields, 200)
+        if request.method == "DELETE":
+            return self._write_response(request, prefer, table, self._delete(table, filters), fields, 200)
+        raise PostgRESTError(405, "PGRST117", f"Unsupported HTTP method: {request.method}")
+
+    def _respond(self, request: httpx.Request, prefer: Dict[str, str], rows: List[Dict], total: int, offset: int):
+        counted = str(total) if prefer.get("count") in ("exact", "planned", "estimated") else "*"
+        content_range = f"{offset}-{offset + len(rows) - 1}/{counted}" if rows else f"*/{counted}"
+        if OBJECT_MEDIA_TYPE in request.headers.get("Accept", ""):
+            if len(rows) != 1:
+                raise PostgRESTError(
+                    406, "PGRST116", "JSON object requested, multiple (or no) rows returned",
+                    f"The result contains {len(rows)} rows",
+                )
+            return 200, rows[0], {"Content-Range": content_range}
+        return 200, rows, {"Content-Range": content_range}
+
+    def _write_response(self, request, prefer, table: Table, written: List[Dict], fields, status: int):
+        total = str(len(written)) if prefer.get("count") else "*"
+        content_range = f"0-{len(written) - 1}/{total}" if written else f"*/{total}"
+        if request.method == "POST":
+            content_range = f"*/{total}"
+        if prefer.get("return") != "representation":
+            return (201 if status == 201 else 204), None, {"Content-Range": content_range}
+        rows = [self._project(table.name, row, fields) for row in written]
+        if OBJECT_MEDIA_TYPE in request.headers.get("Accept", ""):
+            return status, rows[0] if rows else None, {"Content-Range": content_range}
+        return status, rows, {"Content-Range": content_range}
+
+    def _rpc(self, name, params, fields, filters, order, limit, offset, request, prefer):
+        if name not in self.rpcs:
+            raise PostgRESTError(404, "PGRST202", f"Could not find the function public.{name} in the schema cache")
+        result = self.rpcs[name](self, **params)
+        if not isinstance(result, list):
+            return 200, result, {}
+        rows = [row for row in result if _evaluate(("and", filters), row, None)] if filters else result
+        if order:
+            rows = _sort(rows, order, None)
+        total = len(rows)
+        rows = rows[offset:offset + limit if limit is not None else None]
+        if fields != [("*",)]:
+            rows = [self._project(name, row, fields) for row in rows]
+        return self._respond(request, prefer, rows, total, offset)
+
+
+# --------------------
+# What the schema files can't express: views, functions, triggers
+# --------------------
+
+def _private_room_details(database: FakeDatabase, private: Dict) -> Dict:
+    room = database.get("rooms", private.get("room_id")) or {}
+    user1 = database.get("profiles", private.get("user1_id")) or {}
+    user2 = database.get("profiles", private.get("user2_id")) or {}
+    return {
+        "room_id": private.get("room_id"),
+        "name": room.get("name"),
+        "type": room.get("type"),
+        "description": room.get("description"),
+        "created_at": room.get("created_at"),
+        "user1_id": private.get("user1_id"),
+        "user1_name": user1.get("full_name"),
+        "user1_username": user1.get("username"),
+        "user1_avatar_url": user1.get("avatar_url"),
+        "user2_id": private.get("user2_id"),
+        "user2_name": user2.get("full_name"),
+        "user2_username": user2.get("username"),
+        "user2_avatar_url": user2.get("avatar_url"),
+    }
+
+
+def _notification_with_sender(database: FakeDatabase, notification: Dict) -> Dict:
+    sender = database.get("profiles", notification.get("sender_id"))
+    return {
+        **notification,
+        "sender": {key: sender.get(key) for key in ("id", "username", "full_name", "avatar_url")} if sender else None,
+    }
+
+
+def _get_last_messages(database: FakeDatabase, room_ids: List[str]) -> List[Dict]:
+    by_room = database.tables["messages"].index("room_id")
+    latest = []
+    for room_id in dict.fromkeys(room_ids):
+        messages = by_room.get(room_id)
+        if messages:
+            latest.append(max(messages, key=lambda m: (_parse_timestamp(m["created_at"]), m["id"])))
+    return latest
+
+
+def _match_by_embedding(table: str):
+    def match(database: FakeDatabase, query_embedding: List[float], match_count: int = 10, **_) -> List[Dict]:
+        norm = math.sqrt(sum(x * x for x in query_embedding)) or 1.0
+        scored = []
+        for row in database.rows(table):
+            embedding = row.get("embedding")
+            if isinstance(embedding, str):
+                embedding = json.loads(embedding)
+            if not embedding:
+                continue
+            dot = sum(a * b for a, b in zip(query_embedding, embedding))
+            scored.append({**row, "score": dot / (norm * (math.sqrt(sum(x * x for x in embedding)) or 1.0))})
+        scored.sort(key=lambda r: r["score"], reverse=True)
+        return scored[:match_count]
+    return match
+
+
+def _counter_trigger(parent: str, column: str, delta: int):
+    """post_counters.sql: bump posts.like_count / comment_count as rows come and go."""
+    def trigger(database: FakeDatabase, row: Dict):
+        post = database.get(parent, row.get("post_id"))
+        if post is not None and column in post:
+            post[column] = max((post[column] or 0) + delta, 0)
+            database.tables[parent].changed([column])
+    return trigger
+
+
+def create_fake_database() -> FakeDatabase:
+    database = FakeDatabase()
+    database.load_schema_files([p.strip() for p in FAKE_SUPABASE_SCHEMA.split(",") if p.strip()])
+    database.views["private_room_details"] = View("private_rooms", _private_room_details)
+    database.views["notification_with_sender"] = View("notifications", _notification_with_sender)
+    database.rpcs["get_last_messages"] = _get_last_messages
+    database.rpcs["match_profiles_by_embedding"] = _match_by_embedding("profiles")
+    database.rpcs["match_projects_by_embedding"] = _match_by_embedding("app_projects")
+    database.after_insert["post_likes"] = [_counter_trigger("posts", "like_count", 1)]
+    database.after_delete["post_likes"] = [_counter_trigger("posts", "like_count", -1)]
+    database.after_insert["post_comments"] = [_counter_trigger("posts", "comment_count", 1)]
+    database.after_delete["post_comments"] = [_counter_trigger("posts", "comment_count", -1)]
+
+    if FAKE_SUPABASE_SEED:
+        with open(FAKE_SUPABASE_SEED) as f:
+            for table, rows in json.load(f).items():
+                database.seed(table, rows)
+    return database
+
+
+# Shared by every client in the process, so writes through one are read through the others
+fake_database: Optional[FakeDatabase] = None
+
+
+def get_fake_database() -> FakeDatabase:
+    global fake_database
+    if fake_database is None:
+        fake_database = create_fake_database()
+    return fake_database
+
+
+class FakeTransport(httpx.BaseTransport):
+    """Answers PostgREST requests from a FakeDatabase instead of the network."""
+
+    def __init__(self, database: FakeDatabase):
+        self.database = database
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.read()
+        return self.database.handle(request)
+
+
+def use_fake_backend(client: Client, database: FakeDatabase = None) -> Client:
+    """Serve a client's PostgREST queries from `database` (the shared fake by default)."""
+    database = database or get_fake_database()
+    init_postgrest = client._init_postgrest_client
+
+    def init_fake(*args, **kwargs):
+        postgrest = init_postgrest(*args, **kwargs)
+        postgrest.session._transport = FakeTransport(database)
+        return postgrest
+
+    client._init_postgrest_client = init_fake
+    client._postgrest = None
+    return client
+
+
+def create_supabase_client(url: Optional[str], key: Optional[str]) -> Client:
+    """create_client(), or a client on the in-process fake when SUPABASE_BACKEND=fake."""
+    if SUPABASE_BACKEND != "fake":
+        return create_client(url, key)
+    print("🧪 Using the in-process fake Supabase backend")
+    return use_fake_backend(create_client(url or FAKE_SUPABASE_URL, key or "fake-key"))
@@ -0,0 +1,104 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from db import get_last_message, get_last_messages, message_listeners
+
+# Entries are kept current by the write paths; the TTL only bounds drift from writes made elsewhere
+LAST_MESSAGE_TTL_SECONDS = float(os.getenv("LAST_MESSAGE_TTL_SECONDS", "600"))
+LAST_MESSAGE_MAX_ROOMS = int(os.getenv("LAST_MESSAGE_MAX_ROOMS", "20000"))
+
+# What get_last_message has always returned for a room without messages
+NO_MESSAGES = {"message": "No messages found or error occurred."}
+
+BatchLoader = Callable[[List[str]], Awaitable[Optional[Dict[str, Dict]]]]
+
+
+class LastMessageCache:
+    """
+    Latest message per room, for the conversation list.
+    The journal, save_message and broker deliveries record new messages as they
+    happen; rooms not cached are loaded together with one batched query.
+    """
+
+    def __init__(self, loader: BatchLoader = get_last_messages):
+        self.loader = loader
+        # room_id -> (latest message or None, cached_at)
+        self._rooms: "OrderedDict[str, Tuple[Optional[Dict], float]]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "batch_loads": 0, "writes": 0}
+
+    def record(self, message: Dict):
+        """A message was just written; it is now the latest of its room. Recording it again is a no-op."""
+        entry = self._rooms.get(message["room_id"])
+        if entry and entry[0] and entry[0].get("id") == message["id"]:
+            return
+        self._put(message["room_id"], message)
+        self.stats["writes"] += 1
+
+    def record_frame(self, frame: Dict):
+        """Record a broadcast message frame (from any worker)."""
+        self.record({
+            "id": frame["message_id"],
+            "room_id": frame["room_id"],
+            "sender_id": frame["sender_id"],
+            "content": frame["content"],
+            "created_at": frame["created_at"],
+        })
+
+    async def get_many(self, room_ids: Iterable[str]) -> List[Dict]:
+        """Latest message of each room, in the order given, in at most one round trip."""
+        room_ids = list(room_ids)
+        now = time.monotonic()
+        found: Dict[str, Optional[Dict]] = {}
+        missing = []
+
+        for room_id in room_ids:
+            entry = self._rooms.get(room_id)
+            if entry and now - entry[1] < LAST_MESSAGE_TTL_SECONDS:
+                found[room_id] = entry[0]
+                self._rooms.move_to_end(room_id)
+            else:
+                missing.append(room_id)
+
+        self.stats["hits"] += len(room_ids) - len(missing)
+        self.stats["misses"] += len(missing)
+        if missing:
+            found.update(await self._load(missing))
+
+        return [found.get(room_id) or NO_MESSAGES for room_id in room_ids]
+
+    async def _load(self, room_ids: List[str]) -> Dict[str, Optional[Dict]]:
+        started = time.monotonic()
+        self.stats["batch_loads"] += 1
+        rows = await self.loader(room_ids)
+
+        if rows is None:
+            # Batched lookup unavailable: one concurrent query per room, not cached
+            results = await asyncio.gather(*(get_last_message(room_id) for room_id in room_ids))
+            return dict(zip(room_ids, results))
+
+        loaded = {}
+        for room_id in room_ids:
+            entry = self._rooms.get(room_id)
+            if entry and entry[1] >= started:
+                # A message was recorded while the query was in flight; it is newer
+                loaded[room_id] = entry[0]
+                continue
+            loaded[room_id] = rows.get(room_id)
+            self._put(room_id, loaded[room_id])
+        return loaded
+
+    def _put(self, room_id: str, message: Optional[Dict]):
+        self._rooms[room_id] = (message, time.monotonic())
+        self._rooms.move_to_end(room_id)
+        while len(self._rooms) > LAST_MESSAGE_MAX_ROOMS:
+            self._rooms.popitem(last=False)
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "rooms": len(self._rooms)}
+
+
+last_messages = LastMessageCache()
+message_listeners.append(last_messages.record)
@@ -3,12 +3,11 @@ os.environ.pop("SSL_CERT_FILE", None)
 from fastapi import FastAPI, HTTPException, Body, Depends, Form , APIRouter
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
-from supabase import create_client
 from dotenv import load_dotenv
 from typing import Optional, List, Dict, Any
 import os
 import httpx
-from fastapi import FastAPI, HTTPException, Path
+from fastapi import FastAPI, HTTPException, Path, Query
 from fastapi import FastAPI, Request, Response
 # Import your own modules
 from email_utils import send_otp_email
@@ -17,13 +16,25 @@ from chat.chat_routes import chat_app
 from search.searchRoute import search_app
 from chat_ws import ws_router
 from db import get_projects_with_members, insert_app_project, insert_app_project_member
+from db import get_projects_page, PROJECT_SORTS
+from db import get_feed_page, get_post_comments_page, insert_post_like, insert_post_comment
 from db import get_pending_applications_for_project, update_project_member_status, get_project_member, insert_notification, get_project_info
 from db import create_project_room, update_project_room_id, add_user_to_project_room, get_project_room, check_project_room_exists
 from notification import notifrouter
 from community.community_routes import community_app
+from room_roster import room_roster
+from db_executor import run_query, run_sync
+from fake_supabase import create_supabase_client
+from query_metrics import instrument, metrics_router, track_request_queries
+from batch_loader import Loaders, get_loaders
+from user_stats import user_stats
+from search_index import dev_index, project_search
+from suggestions import suggestions
+from facets import project_facets, ARRAY_FACETS
+from pagination import page_params
 from extractintent import extract_intent  # Your async function to extract intent/domain
 from recom import find_people, find_projects  # Your async search functions
-from supabase import create_client, Client
+from supabase import Client
 from fastapi.middleware.httpsredirect import HTTPSRedirectMiddleware
 load_dotenv()
 
@@ -70,6 +81,9 @@ async def log_requests(request: Request, call_next):
     response = await call_next(request)
     return response
 
+# Query count and DB time per request (X-DB-Query-Count / X-DB-Time-Ms headers, /metrics/queries)
+app.middleware("http")(track_request_queries)
+
 # Explicit OPTIONS handler
 @app.options("/{path:path}")
 async def preflight_handler(request: Request, path: str):
@@ -96,20 +110,21 @@ async def preflight_handler(request: Request, path: str):
 supabase_url = os.getenv("SUPABASE_URL")
 supabase_key = os.getenv("SUPABASE_KEY")
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-supabase: Client = create_client(supabase_url, supabase_key)
+supabase: Client = instrument(create_supabase_client(supabase_url, supabase_key))
 if not supabase_url or not supabase_key:
     raise RuntimeError("SUPABASE_URL and SUPABASE_KEY environment variables must be set")
 
 if not OPENROUTER_API_KEY:
     raise RuntimeError("OPENROUTER_API_KEY environment variable must be set")
 
-supabase = create_client(supabase_url, supabase_key)
+supabase = instrument(create_supabase_client(supabase_url, supabase_key))
 
 app.mount("/chat", chat_app)
 app.mount("/search", search_app)
 app.mount("/communities", community_app)
 app.include_router(ws_router)
 app.include_router(notifrouter)
+app.include_router(metrics_router)
 
 # Temporary OTP storage
 otp_storage = {}
@@ -155,7 +170,7 @@ async def register(
     username: Optional[str] = Form(None),
 ):
     try:
-        auth_response = supabase.auth.sign_up({
+        auth_response = await run_sync(supabase.auth.sign_up, {
             "email": email,
             "password": password,
             "options": {
@@ -169,7 +184,9 @@ async def register(
                 "username": auth_response.user.user_metadata.get("username", username),
                 "full_name": auth_response.user.user_metadata.get("username", username),
             }
-            supabase.table("profiles").insert(user_data).execute()
+            await run_query(supabase.table("profiles").insert(user_data))
+            dev_index.add(user_data)
+            suggestions.profile_changed(user_data)
 
             if hasattr(auth_response, 'session') and auth_response.session is not None:
                 return {
@@ -196,7 +213,7 @@ async def register(
 @app.post("/login")
 async def login(request: UserRegister):
     try:
-        auth_response = supabase.auth.sign_in_with_password({
+        auth_response = await run_sync(supabase.auth.sign_in_with_password, {
             "email": request.email,
             "password": request.password
         })
@@ -228,7 +245,7 @@ async def login(request: UserRegister):
 @app.post("/logout")
 async def logout():
     try:
-        supabase.auth.sign_out()
+        await run_sync(supabase.auth.sign_out)
         return {"status": "success", "message": "User logged out successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e) or "Logout failed")
@@ -244,6 +261,79 @@ async def api_get_projects_with_members(payload: dict = Depends(verify_token)):
         raise HTTPException(status_code=500, detail="Failed to fetch projects with members")
     return {"projects": data}
 
+PROJECT_PAGE_MAX = int(os.getenv("PROJECT_PAGE_MAX", "50"))
+
+@app.get("/api/app_projects")
+async def list_app_projects(
+    status: Optional[str] = None,
+    domain: Optional[str] = None,
+    difficulty_level: Optional[str] = None,
+    is_recruiting: Optional[bool] = None,
+    sort: str = "created_at",
+    order: str = "desc",
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    include_members: bool = False,
+    payload: dict = Depends(verify_token)
+):
+    """
+    Paginated project listing with filters. Pass next_cursor back as `cursor` for the next page.
+    Cards carry applications_count but not detailed_description; active members only with include_members.
+    """
+    if sort not in PROJECT_SORTS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(PROJECT_SORTS)}")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be asc or desc")
+    limit, _, after = page_params(limit, None, cursor, maximum=PROJECT_PAGE_MAX)
+
+    filters = {
+        column: value
+        for column, value in (("status", status), ("domain", domain), ("difficulty_level", difficulty_level), ("is_recruiting", is_recruiting))
+        if value is not None
+    }
+    try:
+        page = await get_projects_page(filters, sort, order == "desc", limit, after, include_members)
+    except Exception as e:
+        print(f"Error listing projects: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch projects")
+    return {"status": "success", **page}
+
+@app.get("/api/app_projects/facets")
+async def project_facet_search(
+    domain: Optional[List[str]] = Query(None),
+    difficulty_level: Optional[List[str]] = Query(None),
+    tech_stack: Optional[List[str]] = Query(None),
+    programming_languages: Optional[List[str]] = Query(None),
+    is_remote: Optional[bool] = None,
+    is_recruiting: Optional[bool] = None,
+    match_all: Optional[List[str]] = Query(None),
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    payload: dict = Depends(verify_token)
+):
+    """
+    Faceted project discovery from the in-memory facet index. Repeat a parameter to
+    OR its values (domain=web&domain=ai); different facets are AND-ed, and
+    match_all=tech_stack (or programming_languages) requires every listed value.
+    Returns the matching total, live counts for every facet value, and a page of
+    project cards, newest first; pass next_cursor back as `cursor`.
+    """
+    if any(facet not in ARRAY_FACETS for facet in match_all or []):
+        raise HTTPException(status_code=400, detail=f"match_all takes {', '.join(ARRAY_FACETS)}")
+    limit, _, after = page_params(limit, None, cursor, maximum=PROJECT_PAGE_MAX)
+    if not await project_facets.ready():
+        raise HTTPException(status_code=503, detail="Project facets are not available yet")
+
+    selected = {
+        "domain": domain,
+        "difficulty_level": difficulty_level,
+        "tech_stack": tech_stack,
+        "programming_languages": programming_languages,
+        "is_remote": None if is_remote is None else ["true" if is_remote else "false"],
+        "is_recruiting": None if is_recruiting is None else ["true" if is_recruiting else "false"],
+    }
+    return {"status": "success", **project_facets.query(selected, match_all or [], limit, after)}
+
 class AppProjectCreate(BaseModel):
     title: str
     description: str
@@ -290,8 +380,12 @@ async def create_app_project(project: AppProjectCreate, payload: dict = Depends(
     if project_data.get('image_url') == '' or project_data.get('image_url') is None:
         project_data['image_url'] = 'https://images.unsplash.com/photo-1461749280684-dccba630e2f6?w=500&h=300&fit=crop'
     
-    created = insert_app_project(project_data)
+    created = await insert_app_project(project_data)
     if created:
+        user_stats.project_created(payload["sub"])
+        project_search.add(created)
+        project_facets.add(created)
+        suggestions.project_changed(created)
         # Add the creator as an admin member
         member_data = {
             "project_id": created["id"],
@@ -299,7 +393,8 @@ async def create_app_project(project: AppProjectCreate, payload: dict = Depends(
             "role": "admin",
             "status": "active"
         }
-        insert_app_project_member(member_data)
+        if await insert_app_project_member(member_data):
+            suggestions.member_joined(created["id"])
         return {"status": "success", "project": created}
     else:
         raise HTTPException(status_code=500, detail="Failed to create project")
@@ -309,7 +404,7 @@ async def create_app_project_member(member: AppProjectMemberCreate, payload: dic
     member_data = member.dict()
     member_data['status'] = 'pending'
     member_data['user_id'] = payload["sub"]
-    created = insert_app_project_member(member_data)
+    created = await insert_app_project_member(member_data)
     if created:
         return {"status": "success", "member": created}
     else:
@@ -320,33 +415,38 @@ async def create_app_project_member(member: AppProjectMemberCreate, payload: dic
 async def get_project_applications(project_id: str, payload: dict = Depends(verify_token)):
     try:
         # Verify the user is the project owner
-        project_info = get_project_info(project_id)
+        project_info = await get_project_info(project_id)
         if not project_info or project_info['created_by'] != payload["sub"]:
             raise HTTPException(status_code=403, detail="Only project owner can view applications")
         
-        applications = get_pending_applications_for_project(project_id)
+        applications = await get_pending_applications_for_project(project_id)
         return {"status": "success", "applications": applications}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Accept a project application
 @app.patch("/api/app_project_members/{member_id}/accept")
-async def accept_project_application(member_id: str, payload: dict = Depends(verify_token)):
+async def accept_project_application(member_id: str, payload: dict = Depends(verify_token), loaders: Loaders = Depends(get_loaders)):
     try:
         # Get the project member details
-        member_info = get_project_member(member_id)
+        member_info = await get_project_member(member_id)
         if not member_info:
             raise HTTPException(status_code=404, detail="Application not found")
         
+        # The member row already embeds its project; no second round trip
+        if member_info.get('app_projects'):
+            loaders.projects.prime(member_info['project_id'], member_info['app_projects'])
+
         # Verify the user is the project owner
-        project_info = get_project_info(member_info['project_id'])
+        project_info = await loaders.projects.load(member_info['project_id'])
         if not project_info or project_info['created_by'] != payload["sub"]:
             raise HTTPException(status_code=403, detail="Only project owner can accept applications")
         
         # Update the status to active
-        updated = update_project_member_status(member_id, "active")
+        updated = await update_project_member_status(member_id, "active")
         if not updated:
             raise HTTPException(status_code=500, detail="Failed to update application status")
+        suggestions.member_joined(member_info['project_id'])
         
         # Send notification to the applicant
         notification_data = {
@@ -357,7 +457,7 @@ async def accept_project_application(member_id: str, payload: dict = Depends(ver
             "recipient_id": member_info['user_id'],
             "sender_id": payload["sub"]
         }
-        insert_notification(notification_data)
+        await insert_notification(notification_data)
         
         return {"status": "success", "message": "Application accepted successfully"}
     except Exception as e:
@@ -365,20 +465,24 @@ async def accept_project_application(member_id: str, payload: dict = Depends(ver
 
 # Deny a project application
 @app.patch("/api/app_project_members/{member_id}/deny")
-async def deny_project_application(member_id: str, payload: dict = Depends(verify_token)):
+async def deny_project_application(member_id: str, payload: dict = Depends(verify_token), loaders: Loaders = Depends(get_loaders)):
     try:
         # Get the project member details
-        member_info = get_project_member(member_id)
+        member_info = await get_project_member(member_id)
         if not member_info:
             raise HTTPException(status_code=404, detail="Application not found")
         
+        # The member row already embeds its project; no second round trip
+        if member_info.get('app_projects'):
+            loaders.projects.prime(member_info['project_id'], member_info['app_projects'])
+
         # Verify the user is the project owner
-        project_info = get_project_info(member_info['project_id'])
+        project_info = await loaders.projects.load(member_info['project_id'])
         if not project_info or project_info['created_by'] != payload["sub"]:
             raise HTTPException(status_code=403, detail="Only project owner can deny applications")
         
         # Update the status to rejected
-        updated = update_project_member_status(member_id, "rejected")
+        updated = await update_project_member_status(member_id, "rejected")
         if not updated:
             raise HTTPException(status_code=500, detail="Failed to update application status")
         
@@ -391,7 +495,7 @@ async def deny_project_application(member_id: str, payload: dict = Depends(verif
             "recipient_id": member_info['user_id'],
             "sender_id": payload["sub"]
         }
-        insert_notification(notification_data)
+        await insert_notification(notification_data)
         
         return {"status": "success", "message": "Application denied successfully"}
     except Exception as e:
@@ -404,7 +508,7 @@ async def create_project_room_endpoint(project_id: str, payload: dict = Depends(
         print(f"Creating room for project: {project_id}")
         
         # Get project info
-        project_info = get_project_info(project_id)
+        project_info = await get_project_info(project_id)
         if not project_info:
             print(f"Project not found: {project_id}")
             raise HTTPException(status_code=404, detail="Project not found")
@@ -417,13 +521,13 @@ async def create_project_room_endpoint(project_id: str, payload: dict = Depends(
             raise HTTPException(status_code=403, detail="Only project owner can create room")
         
         # Check if room already exists
-        if check_project_room_exists(project_id):
+        if await check_project_room_exists(project_id):
             print(f"Room already exists for project: {project_id}")
-            existing_room_id = get_project_room(project_id)
+            existing_room_id = await get_project_room(project_id)
             return {"status": "success", "room_id": existing_room_id, "message": "Room already exists"}
         
         # Create room for the project
-        room_id = create_project_room(project_info)
+        room_id = await create_project_room(project_info)
         if not room_id:
             print("Failed to create room")
             raise HTTPException(status_code=500, detail="Failed to create project room")
@@ -431,7 +535,7 @@ async def create_project_room_endpoint(project_id: str, payload: dict = Depends(
         print(f"Created room: {room_id}")
         
         # Update project with room_id
-        update_result = update_project_room_id(project_id, room_id)
+        update_result = await update_project_room_id(project_id, room_id)
         if not update_result:
             print("Failed to update project with room_id")
             # Don't fail the request, just log the issue
@@ -450,15 +554,17 @@ async def create_project_room_endpoint(project_id: str, payload: dict = Depends(
 async def add_user_to_project_room_endpoint(project_id: str, payload: dict = Depends(verify_token)):
     try:
         # Get project room
-        room_id = get_project_room(project_id)
+        room_id = await get_project_room(project_id)
         if not room_id:
             raise HTTPException(status_code=404, detail="Project room not found")
         
         # Add user to room
-        result = add_user_to_project_room(room_id, payload["sub"])
+        result = await add_user_to_project_room(room_id, payload["sub"])
         if not result:
             raise HTTPException(status_code=500, detail="Failed to add user to project room")
         
+        room_roster.add_member(room_id, payload["sub"])
+
         # Check if user was already a member
         if "already" in str(result):
             return {"status": "success", "message": "User is already a member of this room"}
@@ -473,16 +579,15 @@ async def add_user_to_project_room_endpoint(project_id: str, payload: dict = Dep
 async def join_project_community(project_id: str, payload: dict = Depends(verify_token)):
     try:
         # Get project room
-        room_id = get_project_room(project_id)
+        room_id = await get_project_room(project_id)
         if not room_id:
             raise HTTPException(status_code=404, detail="Project room not found")
         
         # Check if user is already a member of the room
-        existing_member = supabase.table("room_members") \
+        existing_member = await run_query(supabase.table("room_members") \
             .select("*") \
             .eq("room_id", room_id) \
-            .eq("user_id", payload["sub"]) \
-            .execute()
+            .eq("user_id", payload["sub"]))
         
         if existing_member.data:
             return {"status": "success", "message": "Already a member of this community"}
@@ -494,9 +599,10 @@ async def join_project_community(project_id: str, payload: dict = Depends(verify
             "role": "member"
         }
         
-        result = supabase.table("room_members").insert(member_data).execute()
+        result = await run_query(supabase.table("room_members").insert(member_data))
         if not result.data:
             raise HTTPException(status_code=500, detail="Failed to join community")
+        room_roster.add_member(room_id, payload["sub"])
         
         return {"status": "success", "message": "Successfully joined community"}
     except Exception as e:
@@ -507,16 +613,15 @@ async def join_project_community(project_id: str, payload: dict = Depends(verify
 async def check_project_community_membership(project_id: str, payload: dict = Depends(verify_token)):
     try:
         # Get project room
-        room_id = get_project_room(project_id)
+        room_id = await get_project_room(project_id)
         if not room_id:
             return {"is_member": False}
         
         # Check if user is a member of the room
-        existing_member = supabase.table("room_members") \
+        existing_member = await run_query(supabase.table("room_members") \
             .select("*") \
             .eq("room_id", room_id) \
-            .eq("user_id", payload["sub"]) \
-            .execute()
+            .eq("user_id", payload["sub"]))
         
         return {"is_member": len(existing_member.data) > 0}
     except Exception as e:
@@ -630,22 +735,6 @@ def to_pg_array(arr):
     quoted = [f'"{item}"' for item in escaped]
     return "{" + ",".join(quoted) + "}"
 
-@app.get("/feed/{user_id}")
-def personalized_feed(user_id: str = Path(..., title="User ID")):
-    profile_response = supabase.table("profiles").select("skills, projects").eq("id", user_id).single().execute()
-    if not profile_response.data:
-        raise HTTPException(404, detail="User not found")
-
-
-    posts_response = (
-        supabase
-        .table("posts")
-        .select("*,profiles(username , full_name)")
-        .execute()
-    )
-
-    return posts_response.data
-
 class ProfileUpdate(BaseModel):
     id: str
     email: str
@@ -668,7 +757,7 @@ async def update_profile(profile: ProfileUpdate):
                 raise HTTPException(status_code=400, detail="All fields are required")
                 
         # Update profile in Supabase
-        response = supabase.table("profiles").update({
+        response = await run_query(supabase.table("profiles").update({
             "full_name": profile.full_name,
             "username": profile.username,
             "bio": profile.bio,
@@ -679,11 +768,13 @@ async def update_profile(profile: ProfileUpdate):
             "linkedin_url": profile.linkedin_url,
             "stackoverflow_url": profile.stackoverflow_url,
             "website_url": profile.website_url,
-        }).eq("id", profile.id).execute()
+        }).eq("id", profile.id))
 
         if len(response.data) == 0:
             raise HTTPException(status_code=404, detail="Profile not found" )
 
+        dev_index.add(response.data[0])
+        suggestions.profile_changed(response.data[0])
         return {"message": "Profile updated successfully", "data": response.data[0]}
 
     except Exception as e:
@@ -710,35 +801,30 @@ class CommentPayload(BaseModel):
 # Endpoints
 # --------------------
 
+FEED_PAGE_MAX = int(os.getenv("FEED_PAGE_MAX", "50"))
+
 @app.get("/feed/{user_id}")
-def get_feed(user_id: str):
-    posts_response = (
-        supabase.table("posts")
-        .select(
-            "id, content, tags, created_at, "
-            "author:author_id(name), "
-            "post_likes(user_id), "
-            "post_comments(id, user_id, text, created_at, user:user_id(name))"
-        )
-        .order("created_at", desc=True)
-        .execute()
-    )
-
-    posts = posts_response.data
-
-    for post in posts:
-        post["likes"] = len(post.get("post_likes", []))
-        post["liked_by_user"] = any(like["user_id"] == user_id for like in post.get("post_likes", []))
-        post["comments"] = [
-            {
-                "text": comment["text"],
-                "author": comment.get("user"),
-                "created_at": comment["created_at"],
-            }
-            for comment in post.get("post_comments", [])
-        ]
+async def get_feed(user_id: str, limit: int = 20, cursor: Optional[str] = None):
+    """
+    A page of the feed for user_id, newest first. Pass next_cursor back as `cursor`
+    for the next page; older comments on a post come from /feed/{post_id}/comments.
+    """
+    limit, _, after = page_params(limit, None, cursor, maximum=FEED_PAGE_MAX)
+    try:
+        return await get_feed_page(user_id, limit, after)
+    except Exception as e:
+        print(f"Error fetching feed: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch feed")
+
 
-    return posts
+@app.get("/feed/{post_id}/comments")
+async def get_post_comments(post_id: str, limit: int = 20, before: Optional[str] = None):
+    limit, before_cursor, _ = page_params(limit, before, None, maximum=FEED_PAGE_MAX)
+    try:
+        return await get_post_comments_page(post_id, limit, before_cursor)
+    except Exception as e:
+        print(f"Error fetching comments: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch comments")
 
 
 @app.post("/feed/create")
@@ -754,30 +840,16 @@ def create_post(payload: PostCreate):
 
 
 @app.post("/feed/{post_id}/like")
-def like_post(post_id: str, payload: LikePayload):
-    existing = (
-        supabase.table("post_likes")
-        .select("*")
-        .eq("post_id", post_id)
-        .eq("user_id", payload.user_id)
-        .execute()
-    )
-
-    if not existing.data:
-        supabase.table("post_likes").insert({
-            "post_id": post_id,
-            "user_id": payload.user_id,
-        }).execute()
+async def like_post(post_id: str, payload: LikePayload):
+    like_count = await insert_post_like(post_id, payload.user_id)
+    if like_count is None:
+        raise HTTPException(status_code=404, detail="Post not found")
 
-    return {"message": "Liked"}
+    return {"message": "Liked", "liked": True, "like_count": like_count}
 
 
 @app.post("/feed/{post_id}/comment")
-def add_comment(post_id: str, payload: CommentPayload):
-    supabase.table("post_comments").insert({
-        "post_id": post_id,
-        "user_id": payload.user_id,
-        "text": payload.comment,
-    }).execute()
+async def add_comment(post_id: str, payload: CommentPayload):
+    comment = await insert_post_comment(post_id, payload.user_id, payload.comment)
 
-    return {"message": "Comment added"}
\ No newline at end of file
+    return {"message": "Comment added", "comment": comment}
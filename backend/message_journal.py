@@ -0,0 +1,278 @@
+import asyncio
+import datetime
+import glob
+import json
+import os
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List
+
+from db import save_messages_batch
+from last_messages import last_messages
+
+# Flush when this many messages are pending, or every JOURNAL_FLUSH_MS, whichever comes first
+JOURNAL_BATCH_SIZE = int(os.getenv("JOURNAL_BATCH_SIZE", "100"))
+JOURNAL_FLUSH_MS = float(os.getenv("JOURNAL_FLUSH_MS", "200"))
+
+# Batches that fail to insert are spooled here and retried with backoff. Point it at
+# a persistent disk in production (render.yaml mounts one): a spool under /tmp is
+# gone after a redeploy, and the messages in it with it
+JOURNAL_SPOOL_DIR = os.getenv("JOURNAL_SPOOL_DIR", "/tmp/devconnect-journal")
+JOURNAL_MAX_BACKOFF_SECONDS = float(os.getenv("JOURNAL_MAX_BACKOFF_SECONDS", "30"))
+# A failed batch is retried row by row; this many failures in a row with none
+# succeeding means the database is down rather than a row being bad
+JOURNAL_PROBE_ROWS = int(os.getenv("JOURNAL_PROBE_ROWS", "3"))
+# Retries a spooled row gets before it is moved to the dead-letter file
+JOURNAL_MAX_ATTEMPTS = int(os.getenv("JOURNAL_MAX_ATTEMPTS", "50"))
+
+BatchWriter = Callable[[List[Dict]], Awaitable[bool]]
+
+
+class MessageJournal:
+    """
+    Write-behind journal for chat messages.
+    append() assigns the id and timestamp locally so the message can be broadcast
+    immediately; a background task writes pending rows to `messages` in batches.
+    """
+
+    def __init__(self, writer: BatchWriter = save_messages_batch, spool_dir: str = None):
+        self.writer = writer
+        self.spool_dir = spool_dir or JOURNAL_SPOOL_DIR
+        self.spool_path = os.path.join(self.spool_dir, f"messages-{os.getpid()}.jsonl")
+        # Rows the database keeps rejecting; kept for inspection, never retried
+        self.dead_letter_path = os.path.join(self.spool_dir, f"dead-messages-{os.getpid()}.jsonl")
+
+        self._pending: List[Dict] = []
+        self._retry: List[Dict] = []
+        self._retry_at = 0.0
+        self._backoff = 1.0
+        # message id -> failed retries, for rows that fail alongside an outage
+        self._attempts: Dict[str, int] = {}
+        self._wakeup = None
+        self._task = None
+        self._stopping = False
+
+        self.stats = {"appended": 0, "flushed": 0, "batches": 0, "failed_batches": 0, "dead_lettered": 0}
+
+    def append(self, room_id: str, sender_id: str, content: str) -> Dict:
+        """Record a message and return the row as it will be stored."""
+        if not isinstance(content, str) or not content.strip():
+            raise ValueError("Message content must be a non-empty string")
+        message = {
+            "id": str(uuid.uuid4()),
+            "room_id": room_id,
+            "sender_id": sender_id,
+            "content": content,
+            "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        }
+        self._pending.append(message)
+        self.stats["appended"] += 1
+        last_messages.record(message)
+
+        if len(self._pending) >= JOURNAL_BATCH_SIZE and self._wakeup:
+            self._wakeup.set()
+        return message
+
+    def unflushed(self, room_id: str) -> List[Dict]:
+        """The room's rows still waiting to be written, oldest first."""
+        rows = [message for message in self._retry + self._pending if message["room_id"] == room_id]
+        return sorted(rows, key=lambda message: (message["created_at"], message["id"]))
+
+    @property
+    def backlog(self) -> int:
+        return len(self._pending) + len(self._retry)
+
+    async def start(self):
+        self._wakeup = asyncio.Event()
+        self._recover_spools()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush everything still pending. Rows that still fail stay spooled for the next start."""
+        self._stopping = True
+        if self._task:
+            # Let an in-flight batch finish rather than cancelling it mid-write
+            self._wakeup.set()
+            await self._task
+        self._retry_at = 0.0
+        await self.flush()
+        if self._retry:
+            print(f"⚠️ {len(self._retry)} messages left in {self.spool_path}")
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=JOURNAL_FLUSH_MS / 1000)
+            except asyncio.TimeoutError:
+                pass
+            except asyncio.CancelledError:
+                return
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                return
+            except Exception as e:
+                print(f"❌ Journal flush error: {e}")
+
+    async def flush(self):
+        """Write pending rows in batches of JOURNAL_BATCH_SIZE, retrying spooled rows when their backoff expires."""
+        if self._retry and time.monotonic() >= self._retry_at:
+            while self._retry:
+                rows = self._retry[:JOURNAL_BATCH_SIZE]
+                self._retry = self._retry[JOURNAL_BATCH_SIZE:]
+                failed, isolated = await self._write(rows)
+                if isolated:
+                    # The rest of the batch went in, so these rows are the problem
+                    self._dead_letter(failed)
+                elif failed:
+                    self._retry = failed + self._retry
+                    self._give_up_on(failed)
+                    self._backoff = min(self._backoff * 2, JOURNAL_MAX_BACKOFF_SECONDS)
+                    self._retry_at = time.monotonic() + self._backoff
+                    break
+            else:
+                self._backoff = 1.0
+            self._rewrite_spool()
+
+        while self._pending:
+            rows = self._pending[:JOURNAL_BATCH_SIZE]
+            self._pending = self._pending[JOURNAL_BATCH_SIZE:]
+            failed, isolated = await self._write(rows)
+            if isolated:
+                self._dead_letter(failed)
+            elif failed:
+                self._spool(failed)
+
+    async def _write(self, rows: List[Dict]):
+        """
+        Write a batch, or failing that its rows one at a time, so one bad row
+        doesn't hold back the others. Returns the rows that weren't written and
+        whether any row of the batch was (True means the failures are the rows'
+        own fault; False means the database looks unavailable).
+        """
+        if await self.writer(rows):
+            self._record(rows)
+            return [], False
+        self.stats["failed_batches"] += 1
+        if len(rows) == 1:
+            return rows, False
+
+        failed = []
+        written = 0
+        for i, row in enumerate(rows):
+            if await self.writer([row]):
+                self._record([row])
+                written += 1
+                continue
+            failed.append(row)
+            if not written and len(failed) >= JOURNAL_PROBE_ROWS:
+                return failed + rows[i + 1:], False
+        return failed, written > 0
+
+    def _record(self, rows: List[Dict]):
+        self.stats["flushed"] += len(rows)
+        self.stats["batches"] += 1
+        for row in rows:
+            self._attempts.pop(row["id"], None)
+
+    def _give_up_on(self, rows: List[Dict]):
+        """Count a failed retry; rows out of attempts leave the retry queue for the dead-letter file."""
+        expired = []
+        for row in rows:
+            self._attempts[row["id"]] = self._attempts.get(row["id"], 0) + 1
+            if self._attempts[row["id"]] >= JOURNAL_MAX_ATTEMPTS:
+                expired.append(row)
+        if expired:
+            expired_ids = {row["id"] for row in expired}
+            self._retry = [row for row in self._retry if row["id"] not in expired_ids]
+            self._dead_letter(expired)
+
+    # ---------------- spool ----------------
+
+    def _spool(self, rows: List[Dict]):
+        if not rows:
+            return
+        if not self._retry:
+            self._retry_at = time.monotonic() + self._backoff
+        self._retry.extend(rows)
+        os.makedirs(self.spool_dir, exist_ok=True)
+        with open(self.spool_path, "a") as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _dead_letter(self, rows: List[Dict]):
+        if not rows:
+            return
+        for row in rows:
+            self._attempts.pop(row["id"], None)
+        self.stats["dead_lettered"] += len(rows)
+        os.makedirs(self.spool_dir, exist_ok=True)
+        with open(self.dead_letter_path, "a") as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        print(f"☠️ Moved {len(rows)} messages the database keeps rejecting to {self.dead_letter_path}")
+
+    def _rewrite_spool(self):
+        """Shrink the spool file to the rows still waiting for a retry (removing it when there are none)."""
+        if not self._retry:
+            if os.path.exists(self.spool_path):
+                os.remove(self.spool_path)
+            return
+        rewritten = f"{self.spool_path}.tmp"
+        with open(rewritten, "w") as f:
+            for row in self._retry:
+                f.write(json.dumps(row) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(rewritten, self.spool_path)
+
+    def _recover_spools(self):
+        """
+        Claim spool files left behind by worker processes that have exited, this
+        worker's own included: a restarted worker can get its old pid back.
+        """
+        paths = glob.glob(os.path.join(self.spool_dir, "messages-*.jsonl"))
+        # Files a worker claimed but died before reloading
+        paths += glob.glob(os.path.join(self.spool_dir, "messages-*.jsonl.claimed-*"))
+        for path in sorted(paths):
+            if path != self.spool_path and _pid_alive(path):
+                continue
+            claimed = f"{path.split('.claimed-')[0]}.claimed-{os.getpid()}"
+            try:
+                # Only one worker wins the rename
+                os.rename(path, claimed)
+            except OSError:
+                continue
+
+            with open(claimed) as f:
+                rows = [json.loads(line) for line in f if line.strip()]
+            self._spool(rows)
+            self._retry_at = 0.0
+            os.remove(claimed)
+            print(f"♻️ Recovered {len(rows)} unsaved messages from {path}")
+
+
+def _pid_alive(spool_path: str) -> bool:
+    """Whether the worker owning a spool file (or, for a claimed one, the claimer) still runs."""
+    name = os.path.basename(spool_path)
+    if ".claimed-" in name:
+        pid = int(name.rsplit(".claimed-", 1)[1])
+    else:
+        pid = int(name[len("messages-"):-len(".jsonl")])
+    if pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+message_journal = MessageJournal()
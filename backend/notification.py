@@ -1,9 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
-from typing import List
+import asyncio
+from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel
 from auth.dependencies import get_current_user_id
-from db import get_unread_notifications, get_notifications, Update_notif, supabase
+from db import get_notifications, mark_notifications_read, Update_notif, supabase
+from db_executor import run_query
+from notification_push import notification_pusher
 
 notifrouter = APIRouter()
 
@@ -18,17 +21,25 @@ class NotificationResponse(BaseModel):
 class NotificationsResponse(BaseModel):
     status: str
     notifications: List[NotificationResponse]
-    unread_count: int
+    # null when the count failed and none is cached; clients keep the badge they have
+    unread_count: Optional[int]
 
 @notifrouter.get("/notifications", response_model=NotificationsResponse)
 async def notifications(current_user_id: str = Depends(get_current_user_id)):
     try:
         result = await get_notifications(current_user_id)
         print("✅ result from notifications extracted:", result)
+        unread_count = result["unread_count"]
+        if isinstance(unread_count, int):
+            # Seed the pushed unread counter so live updates start from the right number
+            notification_pusher.set_unread(current_user_id, unread_count)
+        else:
+            # The count failed; fall back to what the pusher knows rather than caching a guess
+            unread_count = notification_pusher.cached_unread(current_user_id)
         return {
             "status": "success",
             "notifications": result["notifications"],
-            "unread_count": result["unread_count"]
+            "unread_count": unread_count
         }
     except Exception as e:
         raise HTTPException(
@@ -38,24 +49,56 @@ async def notifications(current_user_id: str = Depends(get_current_user_id)):
 
 @notifrouter.patch("/notifications/mark-all-read")
 async def mark_all_notifications_as_read(
+    until: Optional[datetime] = None,
     current_user_id: str = Depends(get_current_user_id)
 ):
-    try:
-        # Get all unread notifications for the user
-        unread_notifications = await get_unread_notifications(current_user_id)
-        
-        # Mark all as read
-        for notification in unread_notifications:
-            await Update_notif(notification['id'])
-        
-            print("✅ All notifications marked as read")
-            
-        return {"status": "success", "message": "All notifications marked as read"}
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=str(e)
-        )
+    """
+    Mark every unread notification as read in one update.
+    `until` (ISO timestamp) only marks those created at or before it, so
+    notifications that arrived after the client rendered its list stay unread.
+    """
+    updated = await mark_notifications_read(current_user_id, until=until.isoformat() if until else None)
+    if updated is None:
+        raise HTTPException(status_code=500, detail="Failed to mark notifications as read")
+
+    print(f"✅ {updated} notifications marked as read")
+    if until is None:
+        notification_pusher.all_read(current_user_id)
+    else:
+        notification_pusher.marked_read(current_user_id, updated)
+
+    return {"status": "success", "message": "All notifications marked as read", "updated": updated}
+
+class MarkReadRequest(BaseModel):
+    ids: List[str]
+
+# Ids per update, keeping the in.() filter well inside URL length limits
+MARK_READ_CHUNK = 200
+MARK_READ_MAX_IDS = 1000
+
+@notifrouter.patch("/notifications/mark-read")
+async def mark_notifications_as_read(
+    request: MarkReadRequest,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """Mark the given notifications of the current user as read; chunks are updated concurrently."""
+    ids = list(dict.fromkeys(request.ids))
+    if len(ids) > MARK_READ_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MARK_READ_MAX_IDS} ids per request")
+    if not ids:
+        return {"status": "success", "updated": 0}
+
+    results = await asyncio.gather(*(
+        mark_notifications_read(current_user_id, ids=ids[start:start + MARK_READ_CHUNK])
+        for start in range(0, len(ids), MARK_READ_CHUNK)
+    ))
+    updated = sum(count for count in results if count)
+    if updated:
+        notification_pusher.marked_read(current_user_id, updated)
+    if None in results:
+        raise HTTPException(status_code=500, detail=f"Failed to mark some notifications as read ({updated} marked)")
+
+    return {"status": "success", "updated": updated}
 
 @notifrouter.patch("/notifications/{notification_id}/read")
 async def mark_notification_as_read(
@@ -64,7 +107,7 @@ async def mark_notification_as_read(
 ):
     try:
         # Verify the notification belongs to the current user
-        notification = supabase.table("notifications").select("*").eq("id", notification_id).eq("recipient_id", current_user_id).single().execute()
+        notification = await run_query(supabase.table("notifications").select("*").eq("id", notification_id).eq("recipient_id", current_user_id).single())
         
         if not notification.data:
             raise HTTPException(status_code=404, detail="Notification not found")
@@ -73,6 +116,8 @@ async def mark_notification_as_read(
         result = await Update_notif(notification_id)
         
         if result:
+            if not notification.data.get("is_read"):
+                notification_pusher.marked_read(current_user_id)
             return {"status": "success", "message": "Notification marked as read"}
         else:
             raise HTTPException(status_code=500, detail="Failed to mark notification as read")
@@ -0,0 +1,113 @@
+import asyncio
+import os
+import json
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from db import count_unread_notifications, notification_listeners
+
+# Cached unread counts are trusted this long before being recounted
+NOTIFICATION_COUNT_TTL_SECONDS = float(os.getenv("NOTIFICATION_COUNT_TTL_SECONDS", "120"))
+
+USER_TOPIC_PREFIX = "user:"
+
+
+def user_topic(user_id: str) -> str:
+    """Broker topic every multiplexed socket of a user is subscribed to."""
+    return f"{USER_TOPIC_PREFIX}{user_id}"
+
+
+class NotificationPusher:
+    """
+    Pushes new notifications to the recipient's live sockets, carrying the unread
+    count along so clients never have to poll /notifications for it.
+    Unread counts are cached per user and adjusted incrementally on insert and read.
+    """
+
+    def __init__(self):
+        self.publish: Optional[Callable[[str, str], None]] = None
+        # user_id -> (unread count, cached_at)
+        self._unread: Dict[str, Tuple[int, float]] = {}
+        self._loop = None
+        self.stats = {"pushed": 0, "count_queries": 0}
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+
+    # ---------------- unread counts ----------------
+
+    def cached_unread(self, user_id: str) -> Optional[int]:
+        entry = self._unread.get(user_id)
+        if entry and time.monotonic() - entry[1] < NOTIFICATION_COUNT_TTL_SECONDS:
+            return entry[0]
+        return None
+
+    def set_unread(self, user_id: str, count: int):
+        self._unread[user_id] = (max(count, 0), time.monotonic())
+
+    async def unread_count(self, user_id: str) -> Optional[int]:
+        cached = self.cached_unread(user_id)
+        if cached is not None:
+            return cached
+        self.stats["count_queries"] += 1
+        count = await count_unread_notifications(user_id)
+        if count is not None:
+            self.set_unread(user_id, count)
+        return count
+
+    # ---------------- events ----------------
+
+    def on_insert(self, notification: dict):
+        """db.insert_notification listener; may be called from any thread."""
+        self._schedule(self._push_new(notification))
+
+    async def _push_new(self, notification: dict):
+        user_id = notification["recipient_id"]
+        cached = self.cached_unread(user_id)
+        if cached is None:
+            # The new row is already stored, so a fresh count includes it
+            count = await self.unread_count(user_id)
+        else:
+            count = cached + (0 if notification.get("is_read") else 1)
+            self.set_unread(user_id, count)
+
+        self._push(user_id, {"type": "notification", "notification": notification, "unread_count": count})
+
+    def marked_read(self, user_id: str, count: int = 1):
+        """Some notifications were marked read; update the count and tell the user's other sockets."""
+        cached = self.cached_unread(user_id)
+        if cached is None:
+            self._unread.pop(user_id, None)
+            return
+        self.set_unread(user_id, cached - count)
+        self._push(user_id, {"type": "notifications_read", "unread_count": cached - count})
+
+    def all_read(self, user_id: str):
+        self.set_unread(user_id, 0)
+        self._push(user_id, {"type": "notifications_read", "unread_count": 0})
+
+    def observe(self, user_id: str, frame: dict):
+        """Adopt the unread count carried by a frame published on any worker."""
+        if frame.get("unread_count") is not None:
+            self.set_unread(user_id, frame["unread_count"])
+
+    # ---------------- plumbing ----------------
+
+    def _push(self, user_id: str, frame: dict):
+        if self.publish:
+            self.stats["pushed"] += 1
+            self.publish(user_topic(user_id), json.dumps(frame, default=str))
+
+    def _schedule(self, coro):
+        try:
+            asyncio.get_running_loop().create_task(coro)
+        except RuntimeError:
+            # Called off the event loop thread
+            if self._loop is None:
+                coro.close()
+                return
+            self._loop.call_soon_threadsafe(self._loop.create_task, coro)
+
+
+notification_pusher = NotificationPusher()
+notification_listeners.append(notification_pusher.on_insert)
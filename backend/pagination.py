@@ -0,0 +1,70 @@
+import base64
+import json
+import os
+from typing import Any, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+# Hard cap on rows per page, whatever the client asks for
+MESSAGE_PAGE_MAX = int(os.getenv("MESSAGE_PAGE_MAX", "100"))
+MESSAGE_PAGE_DEFAULT = 50
+
+# (sort column value, id) of the last row a page ended on
+Cursor = Tuple[Any, str]
+
+
+def encode_cursor(row: dict, column: str = "created_at") -> str:
+    """Opaque token for a row's position in (column, id) order."""
+    raw = json.dumps([row.get(column), row["id"]], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Cursor:
+    """(value, id) from a token made by encode_cursor. Raises ValueError if it is not one."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        value, row_id = json.loads(raw)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {token!r}")
+    if not isinstance(row_id, str) or not (value is None or isinstance(value, (str, bool, int, float))):
+        raise ValueError(f"Invalid cursor: {token!r}")
+    return value, row_id
+
+
+def _quote(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    escaped = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+def keyset_filter(cursor: Cursor, op: str, column: str = "created_at", nulls_last: bool = False) -> str:
+    """
+    PostgREST or_() filter selecting rows strictly before ("lt") or after ("gt")
+    the cursor in (column, id) order.
+    nulls_last: the column is nullable and ordered NULLS LAST, so null rows follow every value.
+    """
+    value, row_id = cursor
+    if value is None:
+        return f"and({column}.is.null,id.{op}.{_quote(row_id)})"
+
+    condition = f"{column}.{op}.{_quote(value)},and({column}.eq.{_quote(value)},id.{op}.{_quote(row_id)})"
+    if nulls_last:
+        condition += f",{column}.is.null"
+    return condition
+
+
+def page_params(
+    limit: int, before: Optional[str], after: Optional[str], maximum: int = None
+) -> Tuple[int, Optional[Cursor], Optional[Cursor]]:
+    """Validate a route's paging query parameters; bad input is a 400."""
+    if before and after:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Pass either before or after, not both")
+    try:
+        return (
+            max(1, min(limit, maximum or MESSAGE_PAGE_MAX)),
+            decode_cursor(before) if before else None,
+            decode_cursor(after) if after else None,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -0,0 +1,181 @@
+import asyncio
+import json
+import os
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+# A connected user with no activity for this long is reported as away
+PRESENCE_AWAY_SECONDS = float(os.getenv("PRESENCE_AWAY_SECONDS", "300"))
+# Workers re-announce their online users this often; entries not refreshed within the TTL expire
+PRESENCE_REFRESH_SECONDS = float(os.getenv("PRESENCE_REFRESH_SECONDS", "20"))
+PRESENCE_TTL_SECONDS = float(os.getenv("PRESENCE_TTL_SECONDS", "60"))
+# At most one typing event per user per room in this window
+TYPING_MIN_INTERVAL = float(os.getenv("TYPING_MIN_INTERVAL", "2"))
+
+# Broker topic carrying presence changes between workers
+PRESENCE_TOPIC = "__presence__"
+
+STATUS_RANK = {"offline": 0, "away": 1, "online": 2}
+
+
+class PresenceTracker:
+    """
+    Online/away/offline state per user.
+    Users connected to this worker are tracked from the WebSocket registry; users on
+    other workers are learned from presence frames on the broker and expire unless
+    refreshed. Every lookup is a dict access.
+    """
+
+    def __init__(self):
+        self.worker = str(os.getpid())
+        self.publish: Optional[Callable[[str, str], None]] = None
+
+        # user_id -> {"connections": int, "last_active": float, "away": bool, "announced": str}
+        self.local: Dict[str, dict] = {}
+        # user_id -> worker -> (status, expires_at)
+        self.remote: Dict[str, Dict[str, Tuple[str, float]]] = {}
+        # (room_id, user_id) -> last typing event forwarded
+        self._typing: Dict[Tuple[str, str], float] = {}
+        self._task = None
+
+    # ---------------- local connections ----------------
+
+    def connected(self, user_id: str):
+        entry = self.local.setdefault(user_id, {"connections": 0, "away": False, "announced": "offline"})
+        entry["connections"] += 1
+        entry["last_active"] = time.monotonic()
+        self._announce_if_changed(user_id)
+
+    def disconnected(self, user_id: str):
+        entry = self.local.get(user_id)
+        if entry is None:
+            return
+        entry["connections"] -= 1
+        if entry["connections"] <= 0:
+            del self.local[user_id]
+            self._announce(user_id, "offline")
+
+    def activity(self, user_id: str):
+        """Record user activity (a message, typing, an explicit status change)."""
+        entry = self.local.get(user_id)
+        if entry is None:
+            return
+        entry["last_active"] = time.monotonic()
+        entry["away"] = False
+        self._announce_if_changed(user_id)
+
+    def set_away(self, user_id: str, away: bool):
+        entry = self.local.get(user_id)
+        if entry is None:
+            return
+        entry["away"] = away
+        if not away:
+            entry["last_active"] = time.monotonic()
+        self._announce_if_changed(user_id)
+
+    def local_status(self, user_id: str) -> Optional[str]:
+        entry = self.local.get(user_id)
+        if entry is None:
+            return None
+        if entry["away"] or time.monotonic() - entry["last_active"] > PRESENCE_AWAY_SECONDS:
+            return "away"
+        return "online"
+
+    # ---------------- lookups ----------------
+
+    def status(self, user_id: str) -> str:
+        best = self.local_status(user_id) or "offline"
+        workers = self.remote.get(user_id)
+        if workers:
+            now = time.monotonic()
+            for status, expires_at in workers.values():
+                if expires_at > now and STATUS_RANK[status] > STATUS_RANK[best]:
+                    best = status
+        return best
+
+    def bulk(self, user_ids: Iterable[str]) -> Dict[str, str]:
+        return {user_id: self.status(user_id) for user_id in user_ids}
+
+    # ---------------- typing ----------------
+
+    def should_send_typing(self, room_id: str, user_id: str) -> bool:
+        """True if a typing event for this user and room may go out now; repeats inside the window are coalesced."""
+        now = time.monotonic()
+        key = (room_id, user_id)
+        if now - self._typing.get(key, 0) < TYPING_MIN_INTERVAL:
+            return False
+        self._typing[key] = now
+        return True
+
+    # ---------------- cross-worker ----------------
+
+    def _announce_if_changed(self, user_id: str):
+        status = self.local_status(user_id)
+        entry = self.local[user_id]
+        if status != entry["announced"]:
+            self._announce(user_id, status)
+
+    def _announce(self, user_id: str, status: str):
+        if user_id in self.local:
+            self.local[user_id]["announced"] = status
+        self._publish({user_id: status})
+
+    def _publish(self, users: Dict[str, str]):
+        if self.publish and users:
+            self.publish(PRESENCE_TOPIC, json.dumps({"type": "presence", "worker": self.worker, "users": users}))
+
+    def receive(self, frame: dict):
+        """Apply a presence frame published by another worker."""
+        worker = frame["worker"]
+        if worker == self.worker:
+            return
+        expires_at = time.monotonic() + PRESENCE_TTL_SECONDS
+        for user_id, status in frame["users"].items():
+            if status == "offline":
+                workers = self.remote.get(user_id)
+                if workers:
+                    workers.pop(worker, None)
+                    if not workers:
+                        del self.remote[user_id]
+            else:
+                self.remote.setdefault(user_id, {})[worker] = (status, expires_at)
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        # Tell the other workers everyone here is gone
+        self._publish({user_id: "offline" for user_id in self.local})
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(PRESENCE_REFRESH_SECONDS)
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"❌ Presence sweep failed: {e}")
+
+    def sweep(self):
+        """Refresh this worker's users on the other workers and drop expired state."""
+        snapshot = {}
+        for user_id in self.local:
+            status = self.local_status(user_id)
+            self.local[user_id]["announced"] = status
+            snapshot[user_id] = status
+        self._publish(snapshot)
+
+        now = time.monotonic()
+        for user_id in list(self.remote):
+            workers = self.remote[user_id]
+            for worker in [w for w, (_, expires_at) in workers.items() if expires_at <= now]:
+                del workers[worker]
+            if not workers:
+                del self.remote[user_id]
+
+        self._typing = {key: at for key, at in self._typing.items() if now - at < TYPING_MIN_INTERVAL}
+
+
+presence_tracker = PresenceTracker()
@@ -0,0 +1,238 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+import httpx
+from fastapi import APIRouter, Depends, Request
+from supabase import Client
+
+from auth.dependencies import get_ops_user_id
+
+# Queries slower than this are printed and kept in the slow-query log
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "500"))
+SLOW_QUERY_LOG_SIZE = int(os.getenv("SLOW_QUERY_LOG_SIZE", "100"))
+
+REST_PREFIX = "/rest/v1/"
+
+OPERATIONS = {"GET": "select", "HEAD": "count", "POST": "insert", "PATCH": "update", "DELETE": "delete"}
+
+
+class RequestQueries:
+    """Database work done on behalf of one HTTP request, across every thread it used."""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.count = 0
+        self.db_ms = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, duration_ms: float):
+        with self._lock:
+            self.count += 1
+            self.db_ms += duration_ms
+
+
+# Set by the middleware; run_sync copies the context into the worker threads,
+# so every query of the request adds to the same object
+current_request: contextvars.ContextVar[Optional[RequestQueries]] = contextvars.ContextVar(
+    "current_request", default=None
+)
+
+
+class QueryMetrics:
+    """
+    Process-wide totals per (operation, table) and per endpoint, plus the most
+    recent slow queries. Recorded from the database threads, hence the lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queries: Dict[Tuple[str, str], Dict] = {}
+        self.endpoints: Dict[str, Dict] = {}
+        self.slow = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+
+    def record(self, table: str, operation: str, duration_ms: float, rows: int, nbytes: int, ok: bool):
+        request = current_request.get()
+        if request is not None:
+            request.add(duration_ms)
+
+        with self._lock:
+            entry = self.queries.setdefault((operation, table), {
+                "calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0, "bytes": 0,
+            })
+            entry["calls"] += 1
+            entry["errors"] += not ok
+            entry["total_ms"] += duration_ms
+            entry["max_ms"] = max(entry["max_ms"], duration_ms)
+            entry["rows"] += rows
+            entry["bytes"] += nbytes
+
+            if duration_ms >= SLOW_QUERY_MS:
+                self.slow.append({
+                    "at": time.time(),
+                    "table": table,
+                    "operation": operation,
+                    "duration_ms": round(duration_ms, 1),
+                    "rows": rows,
+                    "bytes": nbytes,
+                    "endpoint": request.endpoint if request else None,
+                })
+
+        if duration_ms >= SLOW_QUERY_MS:
+            print(f"🐢 Slow query {duration_ms:.0f}ms: {operation} {table} ({rows} rows, {nbytes} B)"
+                  f"{f' in {request.endpoint}' if request else ''}")
+
+    def request_done(self, request: RequestQueries):
+        with self._lock:
+            entry = self.endpoints.setdefault(request.endpoint, {
+                "requests": 0, "queries": 0, "max_queries": 0, "db_ms": 0.0, "max_db_ms": 0.0,
+            })
+            entry["requests"] += 1
+            entry["queries"] += request.count
+            entry["max_queries"] = max(entry["max_queries"], request.count)
+            entry["db_ms"] += request.db_ms
+            entry["max_db_ms"] = max(entry["max_db_ms"], request.db_ms)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            queries = [
+                {"operation": op, "table": table, **entry,
+                 "total_ms": round(entry["total_ms"], 1), "max_ms": round(entry["max_ms"], 1),
+                 "avg_ms": round(entry["total_ms"] / entry["calls"], 2)}
+                for (op, table), entry in self.queries.items()
+            ]
+            endpoints = {
+                name: {**entry, "db_ms": round(entry["db_ms"], 1), "max_db_ms": round(entry["max_db_ms"], 1),
+                       "avg_queries": round(entry["queries"] / entry["requests"], 2),
+                       "avg_db_ms": round(entry["db_ms"] / entry["requests"], 2)}
+                for name, entry in self.endpoints.items()
+            }
+            slow = list(self.slow)
+        queries.sort(key=lambda q: q["total_ms"], reverse=True)
+        return {"slow_query_ms": SLOW_QUERY_MS, "queries": queries, "endpoints": endpoints, "slow_queries": slow}
+
+
+query_metrics = QueryMetrics()
+
+
+def _describe(request: httpx.Request) -> Tuple[str, str]:
+    """(table or function, operation) of a PostgREST request."""
+    path = request.url.path
+    name = path.split(REST_PREFIX, 1)[-1] if REST_PREFIX in path else path
+    if name.startswith("rpc/"):
+        return name[4:], "rpc"
+    operation = OPERATIONS.get(request.method, request.method.lower())
+    if operation == "insert" and "resolution=" in request.headers.get("Prefer", ""):
+        operation = "upsert"
+    return name, operation
+
+
+def _row_count(response: httpx.Response) -> int:
+    # Content-Range is "first-last/total", or "*/total" when no rows came back
+    content_range = response.headers.get("Content-Range", "")
+    first_last = content_range.split("/", 1)[0]
+    if "-" in first_last:
+        first, last = first_last.split("-", 1)
+        return int(last) - int(first) + 1
+    body = response.content
+    if not body or (content_range.startswith("*/") and content_range != "*/*"):
+        return 0
+    # Writes returning their rows don't always say how many
+    if body[:1] == b"[":
+        return len(json.loads(body))
+    return 1
+
+
+class InstrumentedTransport(httpx.BaseTransport):
+    """Times every PostgREST round trip, body included, and records it in query_metrics."""
+
+    def __init__(self, transport: httpx.BaseTransport):
+        self.transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        table, operation = _describe(request)
+        started = time.perf_counter()
+        try:
+            response = self.transport.handle_request(request)
+            response.read()
+        except Exception:
+            query_metrics.record(table, operation, (time.perf_counter() - started) * 1000, 0, 0, False)
+            raise
+
+        duration_ms = (time.perf_counter() - started) * 1000
+        try:
+            rows = _row_count(response) if response.is_success else 0
+        except ValueError:
+            rows = 0
+        query_metrics.record(table, operation, duration_ms, rows, len(response.content), response.is_success)
+        return response
+
+    def close(self):
+        self.transport.close()
+
+
+def instrument(client: Client) -> Client:
+    """
+    Record every query made through a Supabase client. The PostgREST client is
+    rebuilt on auth events, so the hook goes on its factory rather than the instance.
+    These are client internals, which is why requirements.txt pins supabase,
+    postgrest and httpx; on versions without them the client is left as it is.
+    """
+    init_postgrest = getattr(client, "_init_postgrest_client", None)
+    if init_postgrest is None:
+        print("⚠️ Query metrics disabled: this supabase version has no _init_postgrest_client")
+        return client
+
+    def init_instrumented(*args, **kwargs):
+        postgrest = init_postgrest(*args, **kwargs)
+        session = postgrest.session
+        if not hasattr(session, "_transport"):
+            print("⚠️ Query metrics disabled: this httpx version has no Client._transport")
+        elif not isinstance(session._transport, InstrumentedTransport):
+            session._transport = InstrumentedTransport(session._transport)
+        return postgrest
+
+    client._init_postgrest_client = init_instrumented
+    client._postgrest = None
+    return client
+
+
+def _endpoint(request: Request) -> str:
+    # Route templates rather than raw paths, so IDs don't make every request its own endpoint
+    route = request.scope.get("route")
+    if route is None:
+        return f"{request.method} (unmatched)"
+    return f"{request.method} {request.scope.get('root_path', '')}{route.path}"
+
+
+async def track_request_queries(request: Request, call_next):
+    """HTTP middleware: per-request query count and DB time, as headers and endpoint totals."""
+    queries = RequestQueries(f"{request.method} {request.url.path}")
+    token = current_request.set(queries)
+    try:
+        response = await call_next(request)
+    finally:
+        current_request.reset(token)
+
+    queries.endpoint = _endpoint(request)
+    query_metrics.request_done(queries)
+    response.headers["X-DB-Query-Count"] = str(queries.count)
+    response.headers["X-DB-Time-Ms"] = f"{queries.db_ms:.1f}"
+    response.headers["Server-Timing"] = f"db;dur={queries.db_ms:.1f};desc=\"{queries.count} queries\""
+    return response
+
+
+metrics_router = APIRouter()
+
+
+@metrics_router.get("/metrics/queries")
+async def get_query_metrics(current_user_id: str = Depends(get_ops_user_id)):
+    """
+    Supabase round trips per (operation, table) and per endpoint since start-up,
+    and the most recent queries slower than SLOW_QUERY_MS
+    """
+    return query_metrics.snapshot()
@@ -1,7 +1,10 @@
 import os
 import json
 import httpx
-from supabase import create_client, Client
+from supabase import Client
+from db_executor import run_query
+from fake_supabase import create_supabase_client
+from query_metrics import instrument
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -11,7 +14,7 @@ SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
 NVIDIA_API_KEY = os.getenv("NVIDIA_API_KEY")
 NVIDIA_EMBEDDING_ENDPOINT = "https://integrate.api.nvidia.com/v1/embeddings"
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+supabase: Client = instrument(create_supabase_client(SUPABASE_URL, SUPABASE_SERVICE_KEY))
 
 
 async def generate_embedding(text: str) -> list[float]:
@@ -40,7 +43,7 @@ async def find_people(query: str) -> list[dict]:
     embedding = await generate_embedding(query)
 
     # Supabase RPC expects a vector param, pass as a list (depends on the supabase client)
-    response = supabase.rpc("match_profiles_by_embedding", {"query_embedding": embedding}).execute()
+    response = await run_query(supabase.rpc("match_profiles_by_embedding", {"query_embedding": embedding}))
 
     
 
@@ -57,7 +60,7 @@ async def find_people(query: str) -> list[dict]:
 async def find_projects(query: str) -> list[dict]:
     embedding = await generate_embedding(query)
 
-    response = supabase.rpc("match_projects_by_embedding", {"query_embedding": embedding}).execute()
+    response = await run_query(supabase.rpc("match_projects_by_embedding", {"query_embedding": embedding}))
 
    
 
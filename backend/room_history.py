@@ -0,0 +1,73 @@
+import os
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Tuple
+
+# Recent broadcasts kept per room for reconnect replay
+ROOM_HISTORY_SIZE = int(os.getenv("ROOM_HISTORY_SIZE", "200"))
+# Rooms with history kept in memory; least recently active rooms are dropped first
+ROOM_HISTORY_MAX_ROOMS = int(os.getenv("ROOM_HISTORY_MAX_ROOMS", "5000"))
+
+
+class RoomRingBuffer:
+    """Bounded buffer of a room's most recent message frames, addressable by message_id."""
+
+    def __init__(self, size: int = None):
+        self.frames = deque(maxlen=size or ROOM_HISTORY_SIZE)
+        self.seq_by_id: Dict[str, int] = {}
+        self.next_seq = 0
+
+    def append(self, message_id: str, data: str):
+        if len(self.frames) == self.frames.maxlen:
+            _, evicted_id, _ = self.frames[0]
+            self.seq_by_id.pop(evicted_id, None)
+
+        self.frames.append((self.next_seq, message_id, data))
+        self.seq_by_id[message_id] = self.next_seq
+        self.next_seq += 1
+
+    def since(self, message_id: str) -> Optional[List[str]]:
+        """Frames broadcast after message_id, or None if it is no longer (or never was) in the buffer."""
+        seq = self.seq_by_id.get(message_id)
+        if seq is None:
+            return None
+
+        start = seq - self.frames[0][0] + 1
+        return [data for _, _, data in list(self.frames)[start:]]
+
+    def recent(self) -> List[Tuple[str, str]]:
+        """Every buffered (message_id, frame), oldest first."""
+        return [(message_id, data) for _, message_id, data in self.frames]
+
+
+room_history: "OrderedDict[str, RoomRingBuffer]" = OrderedDict()
+
+
+def record_frame(room_id: str, frame: dict, data: str):
+    """Remember a broadcast frame if it is a chat message."""
+    message_id = frame.get("message_id")
+    if frame.get("type") != "message" or not message_id:
+        return
+
+    buffer = room_history.get(room_id)
+    if buffer is None:
+        buffer = room_history[room_id] = RoomRingBuffer()
+        if len(room_history) > ROOM_HISTORY_MAX_ROOMS:
+            room_history.popitem(last=False)
+    else:
+        room_history.move_to_end(room_id)
+
+    buffer.append(message_id, data)
+
+
+def frames_since(room_id: str, message_id: str) -> Optional[List[str]]:
+    """Missed frames for a reconnecting client, or None when the buffer cannot cover the gap."""
+    buffer = room_history.get(room_id)
+    if buffer is None:
+        return None
+    return buffer.since(message_id)
+
+
+def recent_frames(room_id: str) -> List[Tuple[str, str]]:
+    """The room's buffered (message_id, frame) pairs, oldest first."""
+    buffer = room_history.get(room_id)
+    return buffer.recent() if buffer is not None else []
@@ -0,0 +1,104 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from db import get_room_member_ids
+
+# How long a loaded roster is trusted before it is fetched again
+ROSTER_TTL_SECONDS = float(os.getenv("ROSTER_TTL_SECONDS", "300"))
+# A user missing from a roster older than this triggers one reload, so joins
+# handled by another worker are picked up without waiting for the full TTL
+ROSTER_MISS_RECHECK_SECONDS = float(os.getenv("ROSTER_MISS_RECHECK_SECONDS", "5"))
+ROSTER_MAX_ROOMS = int(os.getenv("ROSTER_MAX_ROOMS", "10000"))
+
+Loader = Callable[[str], Awaitable[Optional[List[str]]]]
+
+
+class RoomRosterCache:
+    """
+    In-memory room membership, loaded lazily per room.
+    Membership checks are a set lookup once a room is loaded; join and leave
+    paths keep loaded rosters current through add_member/remove_member/invalidate.
+    """
+
+    def __init__(self, loader: Loader = get_room_member_ids):
+        self.loader = loader
+        # room_id -> (member ids, loaded_at)
+        self._rosters: "OrderedDict[str, Tuple[Set[str], float]]" = OrderedDict()
+        self._loading: Dict[str, asyncio.Future] = {}
+        # Rooms changed while a load was in flight; that load must not be cached
+        self._dirty: Set[str] = set()
+        self.stats = {"hits": 0, "loads": 0, "rechecks": 0, "invalidations": 0}
+
+    async def is_member(self, room_id: str, user_id: str) -> bool:
+        entry = self._rosters.get(room_id)
+        now = time.monotonic()
+
+        if entry and now - entry[1] < ROSTER_TTL_SECONDS:
+            members, loaded_at = entry
+            if user_id in members:
+                self.stats["hits"] += 1
+                return True
+            if now - loaded_at < ROSTER_MISS_RECHECK_SECONDS:
+                self.stats["hits"] += 1
+                return False
+            self.stats["rechecks"] += 1
+
+        members = await self._load(room_id)
+        return members is not None and user_id in members
+
+    async def _load(self, room_id: str) -> Optional[Set[str]]:
+        # Concurrent checks for the same room share a single query
+        pending = self._loading.get(room_id)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[room_id] = future
+        self._dirty.discard(room_id)
+        try:
+            self.stats["loads"] += 1
+            ids = await self.loader(room_id)
+            members = set(ids) if ids is not None else None
+
+            if members is not None and room_id not in self._dirty:
+                self._rosters[room_id] = (members, time.monotonic())
+                self._rosters.move_to_end(room_id)
+                if len(self._rosters) > ROSTER_MAX_ROOMS:
+                    self._rosters.popitem(last=False)
+
+            future.set_result(members)
+            return members
+        except Exception as e:
+            print(f"❌ Error loading roster for room {room_id}: {e}")
+            future.set_result(None)
+            return None
+        finally:
+            del self._loading[room_id]
+            self._dirty.discard(room_id)
+
+    def add_member(self, room_id: str, user_id: str):
+        if room_id in self._rosters:
+            self._rosters[room_id][0].add(user_id)
+        if room_id in self._loading:
+            self._dirty.add(room_id)
+
+    def remove_member(self, room_id: str, user_id: str):
+        if room_id in self._rosters:
+            self._rosters[room_id][0].discard(user_id)
+        if room_id in self._loading:
+            self._dirty.add(room_id)
+
+    def invalidate(self, room_id: str):
+        self.stats["invalidations"] += 1
+        self._rosters.pop(room_id, None)
+        if room_id in self._loading:
+            self._dirty.add(room_id)
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "rooms": len(self._rosters)}
+
+
+room_roster = RoomRosterCache()
@@ -1,24 +1,54 @@
+import os
+from typing import Iterable, Optional
+
 from db import get_devs, get_projects
 from fastapi import FastAPI , Depends , Query,status , HTTPException
 from fastapi.responses import JSONResponse
 from auth.dependencies import get_current_user_id
+from pagination import page_params
+from search_index import dev_index, project_search, RowIndex
+from suggestions import suggestions, SUGGEST_TOP_K
+
+SEARCH_PAGE_MAX = int(os.getenv("SEARCH_PAGE_MAX", "50"))
 
 
 search_app = FastAPI()
 
+
+async def search_page(index: RowIndex, fallback, shown: Iterable[str], q: str, limit: int, cursor: Optional[str]):
+    """
+    A ranked page from the in-memory index, or one unranked page from the database
+    until it has loaded. Either way results carry id, the `shown` columns and score.
+    """
+    limit, _, after = page_params(limit, None, cursor, maximum=SEARCH_PAGE_MAX)
+    if await index.ready():
+        return index.search(q, limit, after)
+    shown = tuple(shown)
+    rows = await fallback(q, ", ".join(["id", *shown]))
+    if rows is None:
+        raise RuntimeError(f"{index.table} search failed")
+    results = [{"id": row["id"], **{column: row.get(column) for column in shown}, "score": None} for row in rows[:limit]]
+    return {"results": results, "next_cursor": None}
+
+
 @search_app.get("/devs")
 async def search_devs(
     q: str = Query(..., min_length=1),
+    limit: int = 20,
+    cursor: Optional[str] = None,
     user_id: str = Depends(get_current_user_id)
 ):
     """
-    Search developer profiles by name or username.
+    Search developer profiles by name or username, best matches first.
+    Pass next_cursor back as `cursor` for the next page.
     Protected route — requires valid access token.
     """
     try:
-        filtered_devs = await get_devs(q)
-        return JSONResponse(status_code=200, content=filtered_devs or [])
+        page = await search_page(dev_index, get_devs, dev_index.fields, q, limit, cursor)
+        return JSONResponse(status_code=200, content={"devs": page["results"], "next_cursor": page["next_cursor"]})
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Error during /search/devs for user {user_id}: {e}")
         raise HTTPException(
@@ -28,19 +58,43 @@ async def search_devs(
 @search_app.get("/projects")
 async def search_projects(
     q: str = Query(..., min_length=1),
+    limit: int = 20,
+    cursor: Optional[str] = None,
     user_id: str = Depends(get_current_user_id)
 ):
     """
-    Search projects by name.
+    Search projects by title, description, tags and stack, most relevant (BM25) first.
+    Pass next_cursor back as `cursor` for the next page; results stop at SEARCH_RESULT_CAP.
     Protected route — requires valid access token.
     """
     try:
-        filtered_projects = await get_projects(q)
-        return JSONResponse(status_code=200, content=filtered_projects or [])
+        page = await search_page(project_search, get_projects, project_search.shown, q, limit, cursor)
+        return JSONResponse(status_code=200, content={"projects": page["results"], "next_cursor": page["next_cursor"]})
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Error during /search/projects for user {user_id}: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error while searching projects"
-        )
\ No newline at end of file
+        )
+
+
+@search_app.get("/suggest")
+async def suggest(
+    q: str = Query(..., min_length=1),
+    limit: int = 8,
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Typeahead: developers, projects, skills and tech-stack tags whose words start
+    with q, most followed / most joined / most used first.
+    Protected route — requires valid access token.
+    """
+    if not await suggestions.ready():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Suggestions are not available yet"
+        )
+    return JSONResponse(status_code=200, content={"suggestions": suggestions.suggest(q, max(1, min(limit, SUGGEST_TOP_K)))})
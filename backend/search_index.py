@@ -0,0 +1,398 @@
+import abc
+import asyncio
+import bisect
+import heapq
+import math
+import os
+import re
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from db import get_search_documents
+from pagination import Cursor, encode_cursor
+
+# Writes made through this worker are applied as they happen; a full reload
+# after this long picks up the rest (sign-ups, other workers, direct edits)
+SEARCH_INDEX_TTL_SECONDS = float(os.getenv("SEARCH_INDEX_TTL_SECONDS", "600"))
+# Ranked project search never goes deeper than this many results, however it is paged
+SEARCH_RESULT_CAP = int(os.getenv("SEARCH_RESULT_CAP", "200"))
+
+# BM25 term-frequency saturation and per-field length normalization
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# The last query word also matches this many of the most common terms it
+# starts, so "reac" finds "react" while it is being typed
+BM25_PREFIX_TERMS = int(os.getenv("BM25_PREFIX_TERMS", "20"))
+
+Loader = Callable[[str, str], Awaitable[Optional[List[Dict]]]]
+
+# How well the query matches a field, before the field's weight
+EXACT, PREFIX, WORD_START, INSIDE = 1.0, 0.75, 0.5, 0.25
+
+TOKEN = re.compile(r"[a-z0-9]+[+#]*")
+
+
+def ngrams(text: str) -> Set[str]:
+    """Trigrams of lowercased text; shorter text is its own single gram."""
+    text = text.lower()
+    if len(text) < 3:
+        return {text} if text else set()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def tokenize(value) -> List[str]:
+    """Lowercased words of a text column, or of every item of an array column ("c++" and "c#" kept whole)."""
+    if not value:
+        return []
+    if isinstance(value, list):
+        return [token for item in value for token in tokenize(item)]
+    return TOKEN.findall(str(value).lower())
+
+
+def _match_quality(query: str, text: str) -> float:
+    position = text.find(query)
+    if position < 0:
+        return 0.0
+    if position == 0:
+        return EXACT if len(text) == len(query) else PREFIX
+    if not text[position - 1].isalnum():
+        return WORD_START
+    return INSIDE
+
+
+def _page(scored: List[Tuple[float, str]], rows: Dict[str, Dict], limit: int, after: Optional[Cursor]) -> Dict:
+    """One page of (-score, id) keys in ascending order, starting after the cursor."""
+    if after is not None:
+        last_score, last_id = after
+        scored = [key for key in scored if key > (-last_score, last_id)]
+    page = scored[:limit]
+    results = [{**rows[row_id], "score": -score} for score, row_id in page]
+    next_cursor = None
+    if len(scored) > limit:
+        score, row_id = page[-1]
+        next_cursor = encode_cursor({"score": -score, "id": row_id}, "score")
+    return {"results": results, "next_cursor": next_cursor}
+
+
+class RowIndex(abc.ABC):
+    """
+    An in-memory index over some columns of one table. Loaded on first use,
+    kept current through add/remove by the write paths, and rebuilt in the
+    background every SEARCH_INDEX_TTL_SECONDS.
+    """
+
+    def __init__(self, table: str, columns: Iterable[str], loader: Loader = get_search_documents):
+        self.table = table
+        self.columns = ", ".join(["id", *columns])
+        self.loader = loader
+        self._loaded_at: Optional[float] = None
+        self._loading: Optional[asyncio.Task] = None
+        # Rows written while a reload is in flight (None: removed), replayed onto its result
+        self._pending: Dict[str, Optional[Dict]] = {}
+        self.stats = {"queries": 0, "loads": 0, "updates": 0, "removals": 0}
+
+    def add(self, row: Dict):
+        """Index a new row or re-index a changed one; columns not in the row keep their old value."""
+        row_id = row.get("id")
+        if not row_id:
+            return
+        if self._loading is not None:
+            self._pending[row_id] = row
+        self._add(row_id, row)
+        self.stats["updates"] += 1
+
+    def remove(self, row_id: str):
+        if self._loading is not None:
+            self._pending[row_id] = None
+        if self._remove(row_id):
+            self.stats["removals"] += 1
+
+    @abc.abstractmethod
+    def _add(self, row_id: str, row: Dict):
+        """Index one row, replacing what was indexed for it before."""
+
+    @abc.abstractmethod
+    def _remove(self, row_id: str) -> bool:
+        """Drop a row; False if it wasn't indexed."""
+
+    @abc.abstractmethod
+    def _empty(self) -> "RowIndex":
+        """A new, empty index configured like this one, for a reload to fill."""
+
+    @abc.abstractmethod
+    def _swap(self, fresh: "RowIndex"):
+        """Take over the contents of a freshly built index."""
+
+    def _ordered(self, rows: List[Dict]) -> List[Dict]:
+        """The order a full load adds rows in."""
+        return rows
+
+    @property
+    def stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= SEARCH_INDEX_TTL_SECONDS
+
+    async def ready(self) -> bool:
+        """
+        Load the index on first use. Once loaded it keeps serving while a
+        reload runs in the background; False if it has never loaded.
+        """
+        if self.stale and self._loading is None:
+            self._loading = asyncio.create_task(self._load())
+        if self._loaded_at is None:
+            await asyncio.shield(self._loading)
+        return self._loaded_at is not None
+
+    async def _load(self):
+        try:
+            self.stats["loads"] += 1
+            started = time.perf_counter()
+            rows = await self.loader(self.table, self.columns)
+            if rows is None:
+                return
+            # Build aside, then swap in, so searches during a reload see a whole index
+            fresh = self._empty()
+            for row in fresh._ordered(rows):
+                fresh.add(row)
+            for row_id, row in self._pending.items():
+                if row is None:
+                    fresh.remove(row_id)
+                else:
+                    fresh.add(row)
+            self._swap(fresh)
+            self._loaded_at = time.monotonic()
+            print(f"🔎 Indexed {len(rows)} {self.table} rows for search in {(time.perf_counter() - started) * 1000:.0f}ms")
+        except Exception as e:
+            print(f"❌ Error building the {self.table} search index: {e}")
+        finally:
+            self._loading = None
+            self._pending = {}
+
+
+class TrigramIndex(RowIndex):
+    """
+    Inverted trigram index over a few text columns of one table, answering the
+    case-insensitive substring queries an `ilike '%q%'` OR filter would.
+    Every trigram of the query must occur in a row for it to match, so candidates
+    come from intersecting posting sets and only those are checked against the text.
+    """
+
+    def __init__(self, table: str, fields: Dict[str, float], loader: Loader = get_search_documents):
+        super().__init__(table, fields, loader)
+        # field -> weight; the row's score is its best weighted match
+        self.fields = fields
+        self._rows: Dict[str, Dict] = {}
+        # lowercased field values per row, and the grams they were indexed under
+        self._texts: Dict[str, Tuple[str, ...]] = {}
+        self._grams: Dict[str, Set[str]] = {}
+        self._postings: Dict[str, Set[str]] = {}
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _add(self, row_id: str, row: Dict):
+        current = self._rows.get(row_id, {})
+        merged = {"id": row_id, **{field: row.get(field, current.get(field)) for field in self.fields}}
+        self._remove(row_id)
+
+        texts = tuple((merged[field] or "").lower() for field in self.fields)
+        grams = set().union(*(ngrams(text) for text in texts))
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(row_id)
+        self._rows[row_id] = merged
+        self._texts[row_id] = texts
+        self._grams[row_id] = grams
+
+    def _remove(self, row_id: str) -> bool:
+        if row_id not in self._rows:
+            return False
+        for gram in self._grams.pop(row_id):
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(row_id)
+                if not ids:
+                    del self._postings[gram]
+        del self._rows[row_id]
+        del self._texts[row_id]
+        return True
+
+    def _empty(self) -> "TrigramIndex":
+        return TrigramIndex(self.table, self.fields, self.loader)
+
+    def _swap(self, fresh: "TrigramIndex"):
+        self._rows, self._texts, self._grams, self._postings = (
+            fresh._rows, fresh._texts, fresh._grams, fresh._postings
+        )
+
+    def _candidates(self, query: str) -> Iterable[str]:
+        if len(query) >= 3:
+            postings = sorted((self._postings.get(gram, set()) for gram in ngrams(query)), key=len)
+            return set.intersection(*postings) if postings[0] else set()
+        # One or two characters: every gram containing them, still far fewer than the rows
+        found = set()
+        for gram, ids in self._postings.items():
+            if query in gram:
+                found |= ids
+        return found
+
+    def _score(self, query: str, row_id: str) -> float:
+        best = 0.0
+        for text, weight in zip(self._texts[row_id], self.fields.values()):
+            quality = _match_quality(query, text)
+            if quality:
+                # Among equal matches, shorter fields are the closer ones
+                best = max(best, weight * (quality + len(query) / len(text) / 10))
+        return round(best, 6)
+
+    def search(self, query: str, limit: int, after: Optional[Cursor] = None) -> Dict:
+        """
+        Rows matching `query`, best first (ties by id), `limit` at a time.
+        Returns {"results": [...], "next_cursor": token or None}; pass the token back as `after`.
+        """
+        self.stats["queries"] += 1
+        query = query.lower()
+        scored = []
+        for row_id in self._candidates(query):
+            score = self._score(query, row_id)
+            if score:
+                scored.append((-score, row_id))
+        scored.sort()
+        return _page(scored, self._rows, limit, after)
+
+
+class Bm25Index(RowIndex):
+    """
+    Full-text relevance ranking (BM25F) over text and array columns of one table.
+    A term's frequency is summed over the fields, each scaled by the field's weight
+    and normalized by its length against that field's average, then saturated
+    once with k1 and multiplied by the term's idf. Query terms are OR-ed; the last
+    one is also read as a prefix, its completions scoring at PREFIX of a whole word.
+    """
+
+    def __init__(self, table: str, fields: Dict[str, float], shown: Iterable[str],
+                 loader: Loader = get_search_documents):
+        super().__init__(table, dict.fromkeys([*fields, *shown]), loader)
+        # field -> weight
+        self.fields = fields
+        # Columns returned with each result
+        self.shown = tuple(shown)
+        self._rows: Dict[str, Dict] = {}
+        # term -> {row id: frequency in each field}
+        self._postings: Dict[str, Dict[str, Tuple[int, ...]]] = {}
+        self._lengths: Dict[str, Tuple[int, ...]] = {}
+        self._total_lengths = [0] * len(fields)
+        # The terms in order, for prefix lookups; rebuilt after terms come or go
+        self._vocabulary: Optional[List[str]] = None
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _add(self, row_id: str, row: Dict):
+        current = self._rows.get(row_id, {})
+        merged = {column: row.get(column, current.get(column)) for column in (*self.fields, *self.shown)}
+        self._remove(row_id)
+
+        counts = [Counter(tokenize(merged[field])) for field in self.fields]
+        for term in set().union(*counts):
+            if term not in self._postings:
+                self._postings[term] = {}
+                self._vocabulary = None
+            self._postings[term][row_id] = tuple(count[term] for count in counts)
+        lengths = tuple(sum(count.values()) for count in counts)
+        for i, length in enumerate(lengths):
+            self._total_lengths[i] += length
+        self._rows[row_id] = merged
+        self._lengths[row_id] = lengths
+
+    def _remove(self, row_id: str) -> bool:
+        row = self._rows.pop(row_id, None)
+        if row is None:
+            return False
+        for term in set(token for field in self.fields for token in tokenize(row[field])):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(row_id, None)
+                if not postings:
+                    del self._postings[term]
+                    self._vocabulary = None
+        for i, length in enumerate(self._lengths.pop(row_id)):
+            self._total_lengths[i] -= length
+        return True
+
+    def _empty(self) -> "Bm25Index":
+        return Bm25Index(self.table, self.fields, self.shown, self.loader)
+
+    def _swap(self, fresh: "Bm25Index"):
+        self._rows, self._postings, self._lengths, self._total_lengths = (
+            fresh._rows, fresh._postings, fresh._lengths, fresh._total_lengths
+        )
+        self._vocabulary = None
+
+    def _completions(self, prefix: str) -> List[str]:
+        """The BM25_PREFIX_TERMS terms starting with `prefix` (but longer) found in the most rows."""
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self._postings)
+        terms = []
+        for term in self._vocabulary[bisect.bisect_right(self._vocabulary, prefix):]:
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        return heapq.nlargest(BM25_PREFIX_TERMS, terms, key=lambda term: len(self._postings[term]))
+
+    def search(self, query: str, limit: int, after: Optional[Cursor] = None) -> Dict:
+        """
+        The SEARCH_RESULT_CAP best matches for `query`, `limit` at a time (ties by id).
+        Returns {"results": [...], "next_cursor": token or None}; pass the token back as `after`.
+        """
+        self.stats["queries"] += 1
+        documents = len(self._rows)
+        if not documents:
+            return {"results": [], "next_cursor": None}
+        weights = tuple(self.fields.values())
+        averages = [max(total / documents, 1e-9) for total in self._total_lengths]
+
+        def term_scores(term: str, factor: float = 1.0) -> Dict[str, float]:
+            postings = self._postings.get(term)
+            if not postings:
+                return {}
+            idf = math.log(1 + (documents - len(postings) + 0.5) / (len(postings) + 0.5))
+            found = {}
+            for row_id, frequencies in postings.items():
+                lengths = self._lengths[row_id]
+                tf = sum(
+                    weight * frequency / (1 - BM25_B + BM25_B * length / average)
+                    for weight, frequency, length, average in zip(weights, frequencies, lengths, averages)
+                    if frequency
+                )
+                found[row_id] = factor * idf * tf / (BM25_K1 + tf)
+            return found
+
+        terms = tokenize(query)
+        if not terms:
+            return {"results": [], "next_cursor": None}
+        scores: Dict[str, float] = {}
+        for term in set(terms[:-1]) - {terms[-1]}:
+            for row_id, score in term_scores(term).items():
+                scores[row_id] = scores.get(row_id, 0.0) + score
+
+        # The last word counts once per row: its best reading, whole or completed
+        last: Dict[str, float] = term_scores(terms[-1])
+        for completion in self._completions(terms[-1]):
+            for row_id, score in term_scores(completion, PREFIX).items():
+                last[row_id] = max(last.get(row_id, 0.0), score)
+        for row_id, score in last.items():
+            scores[row_id] = scores.get(row_id, 0.0) + score
+
+        scored = heapq.nsmallest(SEARCH_RESULT_CAP, ((-round(score, 6), row_id) for row_id, score in scores.items()))
+        shown = {row_id: {"id": row_id, **{column: self._rows[row_id][column] for column in self.shown}}
+                 for _, row_id in scored}
+        return _page(scored, shown, limit, after)
+
+
+dev_index = TrigramIndex("profiles", {"full_name": 1.0, "username": 1.0})
+project_search = Bm25Index(
+    "app_projects",
+    {"title": 3.0, "tags": 2.0, "tech_stack": 2.0, "required_skills": 1.5,
+     "description": 1.0, "detailed_description": 0.5},
+    shown=("title", "description", "domain", "difficulty_level", "tech_stack"),
+)
@@ -0,0 +1,320 @@
+import asyncio
+import os
+import time
+from array import array
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from db import get_search_documents
+
+# Suggestions each trie node keeps ready; the most a /search/suggest call can return
+SUGGEST_TOP_K = int(os.getenv("SUGGEST_TOP_K", "10"))
+# Trie paths stop after this many characters; longer prefixes are checked against the keys
+SUGGEST_MAX_KEY = int(os.getenv("SUGGEST_MAX_KEY", "24"))
+# Follows, joins and edits through this worker apply immediately; a full reload
+# after this long picks up the rest
+SUGGEST_TTL_SECONDS = float(os.getenv("SUGGEST_TTL_SECONDS", "600"))
+
+# Entry kinds, and what their weight counts
+DEV, PROJECT, SKILL, TECH = "dev", "project", "skill", "tech"   # followers, active members, profiles, projects
+
+EntryKey = Tuple[str, str]
+
+
+def normalize(text: str) -> str:
+    return " ".join((text or "").lower().split())
+
+
+def word_keys(text: str) -> List[str]:
+    """The text from each word on, so "ada lovelace" is found by "ada" and by "love"."""
+    text = normalize(text)
+    starts = [0] + [i + 1 for i, char in enumerate(text) if char == " "]
+    return [text[start:] for start in starts if text[start:]]
+
+
+class SuggestionTrie:
+    """
+    Prefix trie for typeahead over names, titles and tags. Nodes live in parallel
+    lists indexed by node number: each holds its child labels as a string, the
+    child node numbers and the ids of the best SUGGEST_TOP_K entries of its subtree
+    as arrays. A lookup walks the prefix and returns that node's list; writes
+    repair the lists along the paths they touch.
+    """
+
+    def __init__(self):
+        self._labels: List[str] = [""]
+        self._children: List[array] = [array("I")]
+        self._top: List[array] = [array("I")]
+        # node -> entries whose key ends exactly there
+        self._ends: Dict[int, array] = {}
+
+        self._texts: List[str] = []
+        self._kinds: List[str] = []
+        self._ids: List[Optional[str]] = []
+        self._weights: List[float] = []
+        self._keys: List[Tuple[str, ...]] = []
+        self._alive: List[bool] = []
+        self._entries: Dict[EntryKey, int] = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nodes(self) -> int:
+        return len(self._labels)
+
+    def _rank(self, entry: int):
+        return (-self._weights[entry], len(self._texts[entry]), self._texts[entry])
+
+    def _child(self, node: int, char: str, create: bool) -> Optional[int]:
+        position = self._labels[node].find(char)
+        if position >= 0:
+            return self._children[node][position]
+        if not create:
+            return None
+        child = len(self._labels)
+        self._labels.append("")
+        self._children.append(array("I"))
+        self._top.append(array("I"))
+        self._labels[node] += char
+        self._children[node].append(child)
+        return child
+
+    def _path(self, key: str, create: bool = False) -> List[int]:
+        path = [0]
+        for char in key[:SUGGEST_MAX_KEY]:
+            node = self._child(path[-1], char, create)
+            if node is None:
+                break
+            path.append(node)
+        return path
+
+    def _promote(self, node: int, entry: int):
+        """The entry got heavier (or is new): move it up or into the node's list."""
+        top = list(self._top[node])
+        if entry in top:
+            top.remove(entry)
+        elif len(top) >= SUGGEST_TOP_K and self._rank(entry) >= self._rank(top[-1]):
+            return
+        top.append(entry)
+        top.sort(key=self._rank)
+        self._top[node] = array("I", top[:SUGGEST_TOP_K])
+
+    def _recompute(self, node: int):
+        """Rebuild a node's list from its own entries and its children's lists."""
+        candidates = set(self._ends.get(node, ()))
+        for child in self._children[node]:
+            candidates.update(self._top[child])
+        best = sorted((entry for entry in candidates if self._alive[entry]), key=self._rank)
+        self._top[node] = array("I", best[:SUGGEST_TOP_K])
+
+    def upsert(self, kind: str, key_id: str, text: str, weight: float, extra_keys: Iterable[str] = ()):
+        """Add an entry, or update one; a changed text moves it to its new keys."""
+        if not normalize(text):
+            return
+        keys = tuple(dict.fromkeys([*word_keys(text), *(k for extra in extra_keys for k in word_keys(extra))]))
+        entry = self._entries.get((kind, key_id))
+        if entry is not None and self._keys[entry] == keys and self._texts[entry] == text:
+            self.set_weight(kind, key_id, weight)
+            return
+        if entry is not None:
+            self.remove(kind, key_id)
+
+        entry = len(self._texts)
+        self._texts.append(text)
+        self._kinds.append(kind)
+        self._ids.append(key_id if kind in (DEV, PROJECT) else None)
+        self._weights.append(weight)
+        self._keys.append(keys)
+        self._alive.append(True)
+        self._entries[(kind, key_id)] = entry
+        for key in keys:
+            path = self._path(key, create=True)
+            ends = self._ends.setdefault(path[-1], array("I"))
+            if entry not in ends:
+                ends.append(entry)
+            for node in path:
+                self._promote(node, entry)
+
+    def set_weight(self, kind: str, key_id: str, weight: float):
+        entry = self._entries.get((kind, key_id))
+        if entry is None or weight == self._weights[entry]:
+            return
+        lighter = weight < self._weights[entry]
+        self._weights[entry] = weight
+        for key in self._keys[entry]:
+            path = self._path(key)
+            if lighter:
+                for node in reversed(path):
+                    if entry in self._top[node]:
+                        self._recompute(node)
+            else:
+                for node in path:
+                    self._promote(node, entry)
+
+    def weight(self, kind: str, key_id: str) -> Optional[float]:
+        entry = self._entries.get((kind, key_id))
+        return None if entry is None else self._weights[entry]
+
+    def remove(self, kind: str, key_id: str):
+        entry = self._entries.pop((kind, key_id), None)
+        if entry is None:
+            return
+        # The slot stays (ids are array positions); a reload compacts everything
+        self._alive[entry] = False
+        for key in self._keys[entry]:
+            path = self._path(key)
+            ends = self._ends.get(path[-1])
+            if ends is not None and entry in ends:
+                ends.remove(entry)
+            for node in reversed(path):
+                if entry in self._top[node]:
+                    self._recompute(node)
+
+    def suggest(self, prefix: str, limit: int) -> List[Dict]:
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        path = self._path(prefix)
+        if len(path) - 1 < min(len(prefix), SUGGEST_MAX_KEY):
+            return []
+        top = self._top[path[-1]]
+        if len(prefix) > SUGGEST_MAX_KEY:
+            # Past the key length the trie can't tell entries apart; check the keys themselves
+            top = [entry for entry in top if any(key.startswith(prefix) for key in self._keys[entry])]
+        return [
+            {"text": self._texts[entry], "type": self._kinds[entry], "id": self._ids[entry]}
+            for entry in top[:limit]
+        ]
+
+
+class Suggestions:
+    """
+    The /search/suggest trie, with the popularity it is weighted by: follower
+    counts for developers, active member counts for projects, and how many
+    profiles or projects list each skill or tech-stack tag.
+    """
+
+    def __init__(self, loader=get_search_documents):
+        self.loader = loader
+        self.trie = SuggestionTrie()
+        self._profiles: Dict[str, Dict] = {}
+        self._projects: Dict[str, Dict] = {}
+        self._loaded_at: Optional[float] = None
+        self._loading: Optional[asyncio.Task] = None
+        # Changes made while a reload is in flight, replayed onto its result
+        self._pending: List[Callable[["Suggestions"], None]] = []
+        self.stats = {"queries": 0, "loads": 0, "updates": 0}
+
+    def _record(self, change: Callable[["Suggestions"], None]):
+        if self._loading is not None:
+            self._pending.append(change)
+        change(self)
+        self.stats["updates"] += 1
+
+    def _tags(self, kind: str, old: Iterable[str], new: Iterable[str]):
+        old_counts, new_counts = Counter(map(normalize, old or ())), Counter(map(normalize, new or ()))
+        for tag in set(old_counts) | set(new_counts):
+            if not tag or old_counts[tag] == new_counts[tag]:
+                continue
+            count = (self.trie.weight(kind, tag) or 0) + new_counts[tag] - old_counts[tag]
+            if count > 0:
+                self.trie.upsert(kind, tag, tag, count)
+            else:
+                self.trie.remove(kind, tag)
+
+    def _set_profile(self, row: Dict):
+        current = self._profiles.get(row["id"], {"followers": 0})
+        profile = {**current, **{k: row[k] for k in ("full_name", "username", "skills") if k in row}}
+        self._profiles[row["id"]] = profile
+        self._tags(SKILL, current.get("skills"), profile.get("skills"))
+        name = profile.get("full_name") or profile.get("username")
+        if name:
+            self.trie.upsert(DEV, row["id"], name, profile["followers"], [profile.get("username") or ""])
+
+    def _set_project(self, row: Dict):
+        current = self._projects.get(row["id"], {"members": 0})
+        project = {**current, **{k: row[k] for k in ("title", "tech_stack") if k in row}}
+        self._projects[row["id"]] = project
+        self._tags(TECH, current.get("tech_stack"), project.get("tech_stack"))
+        if project.get("title"):
+            self.trie.upsert(PROJECT, row["id"], project["title"], project["members"])
+
+    def _count(self, records: Dict[str, Dict], kind: str, key_id: str, field: str, delta: int):
+        record = records.get(key_id)
+        if record is not None:
+            record[field] = max(record[field] + delta, 0)
+            self.trie.set_weight(kind, key_id, record[field])
+
+    def profile_changed(self, row: Dict):
+        """A profile was created or updated (any subset of its columns)."""
+        if row.get("id"):
+            self._record(lambda s: s._set_profile(row))
+
+    def project_changed(self, row: Dict):
+        if row.get("id"):
+            self._record(lambda s: s._set_project(row))
+
+    def followed(self, following_id: str):
+        self._record(lambda s: s._count(s._profiles, DEV, following_id, "followers", 1))
+
+    def unfollowed(self, following_id: str):
+        self._record(lambda s: s._count(s._profiles, DEV, following_id, "followers", -1))
+
+    def member_joined(self, project_id: str):
+        """A member became active on a project."""
+        self._record(lambda s: s._count(s._projects, PROJECT, project_id, "members", 1))
+
+    def suggest(self, prefix: str, limit: int) -> List[Dict]:
+        self.stats["queries"] += 1
+        return self.trie.suggest(prefix, limit)
+
+    @property
+    def stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= SUGGEST_TTL_SECONDS
+
+    async def ready(self) -> bool:
+        """Load on first use, then reload in the background when stale; False if never loaded."""
+        if self.stale and self._loading is None:
+            self._loading = asyncio.create_task(self._load())
+        if self._loaded_at is None:
+            await asyncio.shield(self._loading)
+        return self._loaded_at is not None
+
+    async def _load(self):
+        try:
+            self.stats["loads"] += 1
+            started = time.perf_counter()
+            profiles, projects, follows, members = await asyncio.gather(
+                self.loader("profiles", "id, full_name, username, skills"),
+                self.loader("app_projects", "id, title, tech_stack"),
+                self.loader("user_connections", "id, following_id"),
+                self.loader("app_project_members", "id, project_id, status"),
+            )
+            if profiles is None or projects is None or follows is None or members is None:
+                return
+
+            followers = Counter(row["following_id"] for row in follows)
+            active = Counter(row["project_id"] for row in members if row.get("status") == "active")
+            # Build aside, then swap in, so lookups during a reload see a whole trie
+            fresh = Suggestions(self.loader)
+            for row in profiles:
+                fresh._profiles[row["id"]] = {"followers": followers.get(row["id"], 0)}
+                fresh._set_profile(row)
+            for row in projects:
+                fresh._projects[row["id"]] = {"members": active.get(row["id"], 0)}
+                fresh._set_project(row)
+            for change in self._pending:
+                change(fresh)
+            self.trie, self._profiles, self._projects = fresh.trie, fresh._profiles, fresh._projects
+            self._loaded_at = time.monotonic()
+            print(f"🔤 Built the suggestion trie ({len(self.trie)} entries, {self.trie.nodes} nodes) "
+                  f"in {(time.perf_counter() - started) * 1000:.0f}ms")
+        except Exception as e:
+            print(f"❌ Error building the suggestion trie: {e}")
+        finally:
+            self._loading = None
+            self._pending = []
+
+
+suggestions = Suggestions()
@@ -0,0 +1,69 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from db import get_user_stats
+
+# Counters are adjusted in place by the write paths; the TTL bounds drift from
+# writes made on other workers or outside the API
+USER_STATS_TTL_SECONDS = float(os.getenv("USER_STATS_TTL_SECONDS", "300"))
+USER_STATS_MAX_USERS = int(os.getenv("USER_STATS_MAX_USERS", "20000"))
+
+EMPTY_STATS = {"followers": 0, "following": 0, "projects": 0}
+
+Loader = Callable[[str], Awaitable[Optional[Dict[str, int]]]]
+
+
+class UserStatsCache:
+    """
+    Follower, following and project counts per user.
+    Loaded once with count-only queries, then kept current by follow, unfollow
+    and project creation instead of being recounted.
+    """
+
+    def __init__(self, loader: Loader = get_user_stats):
+        self.loader = loader
+        # user_id -> (counts, loaded_at)
+        self._users: "OrderedDict[str, Tuple[Dict[str, int], float]]" = OrderedDict()
+        self.stats = {"hits": 0, "loads": 0, "adjustments": 0}
+
+    async def get(self, user_id: str) -> Dict[str, int]:
+        entry = self._users.get(user_id)
+        if entry and time.monotonic() - entry[1] < USER_STATS_TTL_SECONDS:
+            self.stats["hits"] += 1
+            self._users.move_to_end(user_id)
+            return dict(entry[0])
+
+        self.stats["loads"] += 1
+        counts = await self.loader(user_id)
+        if counts is None:
+            return dict(EMPTY_STATS)
+
+        self._users[user_id] = (counts, time.monotonic())
+        self._users.move_to_end(user_id)
+        while len(self._users) > USER_STATS_MAX_USERS:
+            self._users.popitem(last=False)
+        return dict(counts)
+
+    def adjust(self, user_id: str, field: str, delta: int):
+        """Apply a change to a cached counter; users not cached are counted fresh on their next read."""
+        entry = self._users.get(user_id)
+        if entry is None:
+            return
+        entry[0][field] = max(entry[0][field] + delta, 0)
+        self.stats["adjustments"] += 1
+
+    def followed(self, follower_id: str, following_id: str):
+        self.adjust(follower_id, "following", 1)
+        self.adjust(following_id, "followers", 1)
+
+    def unfollowed(self, follower_id: str, following_id: str):
+        self.adjust(follower_id, "following", -1)
+        self.adjust(following_id, "followers", -1)
+
+    def project_created(self, user_id: str):
+        self.adjust(user_id, "projects", 1)
+
+
+user_stats = UserStatsCache()
@@ -0,0 +1,282 @@
+import abc
+import asyncio
+import fcntl
+import json
+import os
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+# "inprocess" for a single worker, "unix" to share fan-out between uvicorn workers
+WS_BROKER = os.getenv("WS_BROKER", "inprocess")
+WS_BROKER_SOCKET = os.getenv("WS_BROKER_SOCKET", "/tmp/devconnect-ws-broker.sock")
+
+# Publishes are coalesced into one IPC write per batch
+WS_BROKER_BATCH_SIZE = int(os.getenv("WS_BROKER_BATCH_SIZE", "64"))
+WS_BROKER_BATCH_MS = float(os.getenv("WS_BROKER_BATCH_MS", "2"))
+
+# Bytes a broker connection may have waiting to be written before the slow-peer
+# policy kicks in: "drop" skips batches until it drains, "disconnect" closes it
+# (a client worker then reconnects to the hub)
+WS_BROKER_MAX_BUFFER = int(os.getenv("WS_BROKER_MAX_BUFFER", str(8 * 1024 * 1024)))
+WS_BROKER_SLOW_PEER_POLICY = os.getenv("WS_BROKER_SLOW_PEER_POLICY", "drop")
+
+WS_BROKER_RECONNECT_SECONDS = 1.0
+WS_BROKER_MAX_LINE = 16 * 1024 * 1024
+LATENCY_WINDOW = 1024
+
+Deliver = Callable[[str, str], None]
+
+
+class LatencyStats:
+    """Delivery latency per origin worker, over a sliding window of recent batches."""
+
+    def __init__(self):
+        self.samples: Dict[str, deque] = {}
+        self.counts: Dict[str, int] = {}
+
+    def record(self, origin: str, seconds: float, frames: int):
+        window = self.samples.setdefault(origin, deque(maxlen=LATENCY_WINDOW))
+        window.append(seconds * 1000)
+        self.counts[origin] = self.counts.get(origin, 0) + frames
+
+    def summary(self) -> dict:
+        report = {}
+        for origin, window in self.samples.items():
+            ordered = sorted(window)
+            report[origin] = {
+                "frames": self.counts[origin],
+                "avg_ms": round(sum(ordered) / len(ordered), 3),
+                "p50_ms": round(ordered[len(ordered) // 2], 3),
+                "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 3),
+                "max_ms": round(ordered[-1], 3),
+            }
+        return report
+
+
+class RoomBroker(abc.ABC):
+    """
+    Pub/sub layer for room broadcasts. publish() never blocks; every worker
+    subscribed to the broker gets the frame through its deliver callback.
+    """
+
+    name = "base"
+
+    def __init__(self, deliver: Deliver):
+        self.deliver = deliver
+        self.latency = LatencyStats()
+        self.published = 0
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    @abc.abstractmethod
+    def publish(self, room_id: str, data: str):
+        """Deliver a frame to the room on every worker."""
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.name,
+            "worker": str(os.getpid()),
+            "published": self.published,
+            "delivery_latency": self.latency.summary(),
+        }
+
+
+class InProcessBroker(RoomBroker):
+    """Single-worker broker: publishing is local fan-out."""
+
+    name = "inprocess"
+
+    def publish(self, room_id: str, data: str):
+        self.published += 1
+        self.deliver(room_id, data)
+
+
+class UnixSocketBroker(RoomBroker):
+    """
+    Shares room broadcasts between workers over a unix socket hub.
+    The worker holding the lock file runs the hub; the others connect to it
+    and take over if it goes away. Frames are delivered locally right away and
+    sent to the other workers in batches.
+    """
+
+    name = "unix"
+
+    def __init__(self, deliver: Deliver, path: str = None):
+        super().__init__(deliver)
+        self.path = path or WS_BROKER_SOCKET
+        self.origin = str(os.getpid())
+        self.is_hub = False
+        self.peers: List[asyncio.StreamWriter] = []
+        self.upstream: Optional[asyncio.StreamWriter] = None
+        self.batches_sent = 0
+        self.frames_lost = 0
+        self.slow_peer_disconnects = 0
+
+        self._pending: List[Tuple[str, str]] = []
+        self._flush_handle = None
+        self._server = None
+        self._lock_fd = None
+        self._runner = None
+        self._stopping = False
+
+    async def start(self):
+        self._runner = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._stopping = True
+        self._flush()
+        await asyncio.sleep(0)
+        if self._runner:
+            self._runner.cancel()
+        for writer in self.peers + ([self.upstream] if self.upstream else []):
+            writer.close()
+        if self._server:
+            self._server.close()
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def publish(self, room_id: str, data: str):
+        self.published += 1
+        self.deliver(room_id, data)
+
+        self._pending.append((room_id, data))
+        if len(self._pending) >= WS_BROKER_BATCH_SIZE:
+            self._flush()
+        elif self._flush_handle is None:
+            loop = asyncio.get_running_loop()
+            self._flush_handle = loop.call_later(WS_BROKER_BATCH_MS / 1000, self._flush)
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "role": "hub" if self.is_hub else "client",
+            "peers": len(self.peers),
+            "connected": self.is_hub or self.upstream is not None,
+            "batches_sent": self.batches_sent,
+            "frames_lost": self.frames_lost,
+            "slow_peer_disconnects": self.slow_peer_disconnects,
+        }
+
+    # ---------------- batching ----------------
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return
+
+        frames, self._pending = self._pending, []
+        line = json.dumps({"origin": self.origin, "sent_at": time.time(), "frames": frames}).encode() + b"\n"
+
+        targets = self.peers if self.is_hub else ([self.upstream] if self.upstream else [])
+        if not self.is_hub and not targets:
+            self.frames_lost += len(frames)
+            return
+
+        self.batches_sent += 1
+        for writer in list(targets):
+            self._write(writer, line, len(frames))
+
+    def _write(self, writer: asyncio.StreamWriter, line: bytes, frames: int):
+        # Nothing awaits the drain, so a worker that stops reading would grow its buffer without bound
+        if writer.transport.get_write_buffer_size() > WS_BROKER_MAX_BUFFER:
+            self.frames_lost += frames
+            if WS_BROKER_SLOW_PEER_POLICY == "disconnect" and not writer.transport.is_closing():
+                self.slow_peer_disconnects += 1
+                print(f"🐢 Broker connection over {WS_BROKER_MAX_BUFFER} buffered bytes, disconnecting it")
+                # abort() discards the buffer; close() would wait to flush it
+                writer.transport.abort()
+            return
+        try:
+            writer.write(line)
+        except Exception as e:
+            print(f"❌ Broker write failed: {e}")
+
+    def _receive(self, line: bytes) -> int:
+        """Deliver a batch locally; returns how many frames it held."""
+        batch = json.loads(line)
+        self.latency.record(batch["origin"], time.time() - batch["sent_at"], len(batch["frames"]))
+        for room_id, data in batch["frames"]:
+            self.deliver(room_id, data)
+        return len(batch["frames"])
+
+    # ---------------- hub election ----------------
+
+    def _try_lock(self) -> bool:
+        fd = os.open(self.path + ".lock", os.O_CREAT | os.O_RDWR, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                if self._try_lock():
+                    await self._serve()
+                    return
+                await self._connect()
+            except asyncio.CancelledError:
+                return
+            except Exception as e:
+                print(f"❌ Broker connection error: {e}")
+            await asyncio.sleep(WS_BROKER_RECONNECT_SECONDS)
+
+    async def _serve(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._handle_peer, path=self.path, limit=WS_BROKER_MAX_LINE)
+        self.is_hub = True
+        print(f"📡 Broker hub listening on {self.path} (worker {self.origin})")
+
+    async def _handle_peer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.peers.append(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                frames = self._receive(line)
+                # Relay to every other worker
+                for peer in list(self.peers):
+                    if peer is not writer:
+                        self._write(peer, line, frames)
+        except Exception as e:
+            print(f"❌ Broker peer error: {e}")
+        finally:
+            self.peers.remove(writer)
+            writer.close()
+
+    async def _connect(self):
+        reader, writer = await asyncio.open_unix_connection(path=self.path, limit=WS_BROKER_MAX_LINE)
+        self.upstream = writer
+        print(f"📡 Worker {self.origin} connected to broker hub")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self._receive(line)
+        finally:
+            self.upstream = None
+            writer.close()
+            print(f"❌ Worker {self.origin} lost broker hub, re-electing")
+
+
+def create_broker(deliver: Deliver, backend: str = None) -> RoomBroker:
+    backend = backend or WS_BROKER
+    if backend == "inprocess":
+        return InProcessBroker(deliver)
+    if backend == "unix":
+        return UnixSocketBroker(deliver)
+    raise ValueError(f"Unknown WS_BROKER backend: {backend}")
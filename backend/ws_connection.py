@@ -0,0 +1,139 @@
+import asyncio
+import os
+import time
+from typing import Callable, Iterable, Optional, Set
+from fastapi import WebSocket
+
+# Outbound frames buffered per socket before the slow-consumer policy kicks in
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+
+# "drop_oldest" keeps the socket and discards its stalest frame,
+# "disconnect" closes the socket so the client reconnects and catches up
+WS_SLOW_CONSUMER_POLICY = os.getenv("WS_SLOW_CONSUMER_POLICY", "drop_oldest")
+
+SLOW_CONSUMER_POLICIES = ("drop_oldest", "disconnect")
+
+# Process-wide counters, exported through /ws/stats
+send_stats = {
+    "frames_enqueued": 0,
+    "frames_sent": 0,
+    "dropped_frames": 0,
+    "slow_consumer_disconnects": 0,
+}
+
+
+class ClientConnection:
+    """
+    A connected WebSocket with its own bounded outbound queue and writer task.
+    Broadcasting only enqueues, so one slow client never blocks the others.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        user_id: str,
+        max_queue: int = None,
+        policy: str = None,
+        heartbeat: bool = True,
+        typed_frames: bool = True,
+        on_failure: Optional[Callable[["ClientConnection"], None]] = None,
+    ):
+        self.websocket = websocket
+        self.user_id = user_id
+        # Heartbeat sockets get ping frames and are reaped when they stop answering
+        self.heartbeat = heartbeat
+        # Whether the client understands frames other than chat messages (typing, presence...)
+        self.typed_frames = typed_frames
+        self.last_seen = time.monotonic()
+        self.on_failure = on_failure
+        self.max_queue = max_queue or WS_SEND_QUEUE_SIZE
+        self.policy = policy or WS_SLOW_CONSUMER_POLICY
+        if self.policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unknown slow consumer policy: {self.policy}")
+
+        # Rooms this socket receives broadcasts for
+        self.rooms: Set[str] = set()
+
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_queue)
+        self.dropped_frames = 0
+        self.closed = False
+        self._writer_task = None
+
+    def start(self):
+        """Start the writer task; call once the socket has been accepted."""
+        self._writer_task = asyncio.create_task(self._writer())
+
+    def touch(self):
+        """Mark the socket alive; call on every frame received from the client."""
+        self.last_seen = time.monotonic()
+
+    def send(self, data: str) -> bool:
+        """Enqueue a frame without waiting on the socket. Returns False if the frame was not queued."""
+        if self.closed:
+            return False
+
+        try:
+            self.queue.put_nowait(data)
+        except asyncio.QueueFull:
+            self.dropped_frames += 1
+            send_stats["dropped_frames"] += 1
+
+            if self.policy == "disconnect":
+                send_stats["slow_consumer_disconnects"] += 1
+                print(f"🐢 Disconnecting slow client [{self.user_id}] ({self.queue.qsize()} frames queued)")
+                asyncio.create_task(self.close(code=1013))
+                return False
+
+            # drop_oldest: make room for the newest frame
+            self.queue.get_nowait()
+            self.queue.put_nowait(data)
+
+        send_stats["frames_enqueued"] += 1
+        return True
+
+    async def _writer(self):
+        try:
+            while True:
+                data = await self.queue.get()
+                await self.websocket.send_text(data)
+                send_stats["frames_sent"] += 1
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"❌ Send failed for client [{self.user_id}]: {e}")
+            self.closed = True
+            if self.on_failure:
+                self.on_failure(self)
+
+    async def close(self, code: int = 1000):
+        """Stop the writer task and close the underlying socket."""
+        if self.closed and self._writer_task is None:
+            return
+        self.closed = True
+
+        task, self._writer_task = self._writer_task, None
+        if task and task is not asyncio.current_task():
+            task.cancel()
+
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            # Socket already gone
+            pass
+
+    @property
+    def queue_depth(self) -> int:
+        return self.queue.qsize()
+
+
+def get_send_stats(connections: Iterable[ClientConnection]) -> dict:
+    """Aggregate queue depth and drop counters for the given connections."""
+    depths = [conn.queue_depth for conn in connections]
+    return {
+        **send_stats,
+        "connections": len(depths),
+        "queue_depth_total": sum(depths),
+        "queue_depth_max": max(depths, default=0),
+        "queue_size": WS_SEND_QUEUE_SIZE,
+        "slow_consumer_policy": WS_SLOW_CONSUMER_POLICY,
+    }
@@ -0,0 +1,66 @@
+import asyncio
+import json
+import os
+import time
+from typing import Callable, Iterable
+
+from ws_connection import ClientConnection
+
+# Ping heartbeat sockets this often; reap them once nothing has been received for WS_IDLE_TIMEOUT
+WS_HEARTBEAT_INTERVAL = float(os.getenv("WS_HEARTBEAT_INTERVAL", "25"))
+WS_IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", "75"))
+
+PING_FRAME = json.dumps({"type": "ping"})
+
+lifecycle_stats = {
+    "pings_sent": 0,
+    "reaped_idle": 0,
+    "reaped_dead": 0,
+}
+
+
+class LifecycleManager:
+    """
+    Periodic sweep over every live connection: pings heartbeat sockets,
+    closes the ones that went quiet and releases sockets whose writer died.
+    """
+
+    def __init__(self, connections: Callable[[], Iterable[ClientConnection]], release: Callable[[ClientConnection], None]):
+        self.connections = connections
+        self.release = release
+        self._task = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(WS_HEARTBEAT_INTERVAL)
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"❌ Connection sweep failed: {e}")
+
+    async def sweep(self):
+        now = time.monotonic()
+        for connection in list(self.connections()):
+            if connection.closed:
+                self.release(connection)
+                lifecycle_stats["reaped_dead"] += 1
+                continue
+
+            if not connection.heartbeat:
+                continue
+
+            if now - connection.last_seen > WS_IDLE_TIMEOUT:
+                print(f"💤 Reaping idle client [{connection.user_id}]")
+                self.release(connection)
+                await connection.close(code=1001)
+                lifecycle_stats["reaped_idle"] += 1
+            elif connection.send(PING_FRAME):
+                lifecycle_stats["pings_sent"] += 1
@@ -85,7 +85,10 @@ export default function NavBar() {
         throw new Error("Failed to fetch notifications");
       }
       setNotifications(res.data.notifications || []);
-      setUnreadCount(res.data.unread_count || 0);
+      // null when the server couldn't count them; keep the badge we have
+      if (typeof res.data.unread_count === "number") {
+        setUnreadCount(res.data.unread_count);
+      }
     } catch (error) {
       if (error.response?.status === 401) {
         console.log("Unauthorized - token may be invalid, skipping notification fetch");
@@ -104,22 +107,75 @@ export default function NavBar() {
       fetchNotifications();
     }, 500);
 
-    const interval = setInterval(fetchNotifications, 30000);
+    // New notifications are pushed over the WebSocket; polling is only a fallback
+    const interval = setInterval(fetchNotifications, 300000);
+
+    const token = localStorage.getItem("access_token");
+    const wsUrl = import.meta.env.VITE_API_KEY.replace('https://', 'wss://').replace('http://', 'ws://');
+    let ws = null;
+    let reconnectTimer = null;
+    let attempts = 0;
+    let stopped = false;
+
+    const connect = () => {
+      ws = new WebSocket(`${wsUrl}/ws?token=${token}`);
+
+      ws.onopen = () => {
+        // Pushes sent while we were disconnected are lost; catch up from the API
+        if (attempts > 0) fetchNotifications();
+        attempts = 0;
+      };
+
+      ws.onmessage = (event) => {
+        const frame = JSON.parse(event.data);
+        if (frame.type === "ping") {
+          ws.send(JSON.stringify({ type: "pong" }));
+        } else if (frame.type === "notification") {
+          setNotifications(prev => [frame.notification, ...prev]);
+          setUnreadCount(frame.unread_count);
+        } else if (frame.type === "notifications_read") {
+          setUnreadCount(frame.unread_count);
+          if (frame.unread_count === 0) {
+            setNotifications(prev => prev.map(n => ({ ...n, is_read: true })));
+          }
+        }
+      };
+
+      ws.onerror = () => ws.close();
+
+      // Deploys, broker hand-overs, slow-consumer closes and network blips all end
+      // up here; reconnect with backoff (1s, 2s, 4s... up to 30s)
+      ws.onclose = (event) => {
+        // 1008: the token was rejected, retrying won't help
+        if (stopped || event.code === 1008) return;
+        const delay = Math.min(1000 * 2 ** attempts, 30000);
+        attempts += 1;
+        reconnectTimer = setTimeout(connect, delay);
+      };
+    };
+
+    if (token) connect();
 
     return () => {
+      stopped = true;
       clearTimeout(timer);
       clearInterval(interval);
+      clearTimeout(reconnectTimer);
+      if (ws) ws.close();
     };
   }, [isAuthenticated, fetchNotifications]);
 
   const markAllAsRead = async () => {
   try {
+    // Only what is on screen; anything newer stays unread
+    const until = notifications[0]?.created_at;
     setNotifications(prev => prev.map(n => ({ ...n, is_read: true })));
     setUnreadCount(0);
     const res = await axios.patch(
       `${import.meta.env.VITE_API_KEY}/notifications/mark-all-read`,
       {},
       {
+        params: until ? { until } : {},
         headers: {
           Authorization: `Bearer ${localStorage.getItem("access_token")}`,
         },
@@ -245,8 +301,8 @@ export default function NavBar() {
         }),
       ]);
       const combined = [
-        ...devRes.data.map((item) => ({ type: "dev", ...item })),
-        ...projectRes.data.map((item) => ({ type: "project", ...item })),
+        ...devRes.data.devs.map((item) => ({ type: "dev", ...item })),
+        ...projectRes.data.projects.map((item) => ({ type: "project", ...item })),
       ];
       setSearchResults(combined);
     } catch (error) {
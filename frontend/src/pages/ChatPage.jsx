@@ -10,6 +10,7 @@ import {
   ListItemText,
   Paper,
   InputAdornment,
+  Button,
 } from "@mui/material";
 import SearchIcon from "@mui/icons-material/Search";
 import SendIcon from "@mui/icons-material/Send";
@@ -34,6 +35,10 @@ export default function ChatPage() {
   const [messages, setMessages] = useState([]);
   const [selectedDev, setSelectedDev] = useState(null);
   const [socket, setSocket] = useState(null);
+  // Messages come a page at a time; next_cursor pages further back
+  const [olderCursor, setOlderCursor] = useState(null);
+  const [loadingOlder, setLoadingOlder] = useState(false);
+  const keepScrollRef = useRef(false);
   const user = JSON.parse(localStorage.getItem("user") || "{}");
   const userId = user?.id;
 
@@ -43,6 +48,11 @@ export default function ChatPage() {
   };
 
   useEffect(() => {
+    // Older messages go on top; stay where the user was reading
+    if (keepScrollRef.current) {
+      keepScrollRef.current = false;
+      return;
+    }
     scrollToBottom();
   }, [messages]);
 
@@ -134,20 +144,52 @@ export default function ChatPage() {
 
         if (res.status === 200) {
           setMessages(res.data.messages || []);
+          setOlderCursor(res.data.next_cursor || null);
         } else {
           toast.error("❌ Failed to load messages");
           setMessages([]);
+          setOlderCursor(null);
         }
       } catch (err) {
         console.error("Error fetching room messages:", err);
         toast.error("❌ Could not fetch messages");
         setMessages([]);
+        setOlderCursor(null);
       }
     };
 
     fetchMessages();
   }, [selectedDev]);
 
+  const loadOlderMessages = async () => {
+    if (!selectedDev || !olderCursor || loadingOlder) return;
+    setLoadingOlder(true);
+    try {
+      const res = await axios.get(
+        `${import.meta.env.VITE_API_KEY}/chat/rooms/${selectedDev.room_id}/messages`,
+        {
+          params: { before: olderCursor },
+          withCredentials: true,
+          headers: {
+            Authorization: `Bearer ${localStorage.getItem("access_token")}`,
+          },
+        }
+      );
+      const older = res.data.messages || [];
+      keepScrollRef.current = true;
+      setMessages(prev => {
+        const shown = new Set(prev.map(m => m.id));
+        return [...older.filter(m => !shown.has(m.id)), ...prev];
+      });
+      setOlderCursor(res.data.next_cursor || null);
+    } catch (err) {
+      console.error("Error fetching older messages:", err);
+      toast.error("❌ Could not load older messages");
+    } finally {
+      setLoadingOlder(false);
+    }
+  };
+
   const handleSelectConversation = (conv) => {
     setSelectedDev(conv);
   };
@@ -324,6 +366,16 @@ export default function ChatPage() {
                 gap: 2,
               }}
             >
+              {olderCursor && (
+                <Button
+                  size="small"
+                  onClick={loadOlderMessages}
+                  disabled={loadingOlder}
+                  sx={{ alignSelf: "center", color: "#93c5fd", textTransform: "none" }}
+                >
+                  {loadingOlder ? "Loading..." : "Load older messages"}
+                </Button>
+              )}
               {messages.map((msg) => {
                 const isMine = msg.sender_id?.toString() === userId;
                 return (
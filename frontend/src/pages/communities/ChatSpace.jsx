@@ -16,7 +16,8 @@ import {
   Chip,
   CircularProgress,
   Popover,
-  MenuItem
+  MenuItem,
+  Button
 } from '@mui/material';
 import SendIcon from '@mui/icons-material/Send';
 import ArrowBackIcon from '@mui/icons-material/ArrowBack';
@@ -39,6 +40,10 @@ export default function ChatSpace() {
   const [isLoading, setIsLoading] = useState(true);
   const [ws, setWs] = useState(null);
   const [anchorEl, setAnchorEl] = useState(null);
+  // Messages come a page at a time; next_cursor pages further back
+  const [olderCursor, setOlderCursor] = useState(null);
+  const [loadingOlder, setLoadingOlder] = useState(false);
+  const keepScrollRef = useRef(false);
   const messagesEndRef = useRef(null);
   const BASE = import.meta.env.VITE_API_KEY;
   const WS_URL = import.meta.env.VITE_API_KEY.replace('https://', 'wss://').replace('http://', 'ws://');
@@ -105,6 +110,7 @@ export default function ChatSpace() {
         }));
         
         setMessages(enhancedMessages);
+        setOlderCursor(messagesRes.data.next_cursor || null);
         setIsLoading(false);
 
         // Setup WebSocket connection
@@ -151,9 +157,42 @@ export default function ChatSpace() {
 
   // Auto-scroll to bottom when messages update
   useEffect(() => {
+    // Older messages go on top; stay where the user was reading
+    if (keepScrollRef.current) {
+      keepScrollRef.current = false;
+      return;
+    }
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
   }, [messages]);
 
+  const loadOlderMessages = async () => {
+    if (!olderCursor || loadingOlder) return;
+    setLoadingOlder(true);
+    try {
+      const res = await axios.get(`${BASE}/communities/${roomId}/chat`, {
+        params: { before: olderCursor },
+        headers: { Authorization: `Bearer ${localStorage.getItem('access_token')}` }
+      });
+      const userMap = createUserMap(members);
+      const older = (res.data.messages || []).map(msg => ({
+        ...msg,
+        sender_name: userMap[msg.sender_id]?.username || `User-${msg.sender_id.slice(0, 4)}`,
+        avatar_url: userMap[msg.sender_id]?.avatar_url
+      }));
+      keepScrollRef.current = true;
+      setMessages(prev => {
+        const shown = new Set(prev.map(m => m.id));
+        return [...older.filter(m => !shown.has(m.id)), ...prev];
+      });
+      setOlderCursor(res.data.next_cursor || null);
+    } catch (err) {
+      console.error("Failed to load older messages:", err);
+      toast.error("Failed to load older messages");
+    } finally {
+      setLoadingOlder(false);
+    }
+  };
+
   const handleSendMessage = async () => {
     if (!newMessage.trim() || !ws) return;
 
@@ -285,10 +324,22 @@ export default function ChatSpace() {
           p: 2,
           bgcolor: '#0f172a'
         }}>
+          {olderCursor && (
+            <Box sx={{ display: 'flex', justifyContent: 'center', mb: 1 }}>
+              <Button
+                size="small"
+                onClick={loadOlderMessages}
+                disabled={loadingOlder}
+                sx={{ color: '#93c5fd', textTransform: 'none' }}
+              >
+                {loadingOlder ? 'Loading...' : 'Load older messages'}
+              </Button>
+            </Box>
+          )}
           <List>
             {messages.map((message, index) => (
               <ListItem 
-                key={index} 
+                key={message.id || index} 
                 sx={{
                   display: 'flex',
                   flexDirection: message.sender_id === currentUserId ? 
@@ -42,7 +42,9 @@ export default function Dashboard() {
   useAuthGuard();
 
   const [posts, setPosts] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [commentText, setCommentText] = useState({});
   const [openPostModal, setOpenPostModal] = useState(false);
   const [newPostContent, setNewPostContent] = useState("");
@@ -64,15 +66,62 @@ export default function Dashboard() {
       
       const data = await res.json();
       console.log("Feed data received:", data);
-      setPosts(data);
+      setPosts(data.posts || []);
+      setNextCursor(data.next_cursor);
     } catch (err) {
       console.error("Failed to fetch posts:", err);
       setPosts([]);
+      setNextCursor(null);
     } finally {
       setLoading(false);
     }
   };
 
+  const loadMorePosts = async () => {
+    if (!nextCursor) return;
+    try {
+      setLoadingMore(true);
+      const res = await fetch(`${API_BASE_URL}/feed/${userId}?cursor=${encodeURIComponent(nextCursor)}`);
+      if (!res.ok) {
+        throw new Error(`HTTP ${res.status}: ${res.statusText}`);
+      }
+      const data = await res.json();
+      setPosts(prev => [...prev, ...(data.posts || [])]);
+      setNextCursor(data.next_cursor);
+    } catch (err) {
+      console.error("Failed to fetch more posts:", err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  const loadMoreComments = async (post) => {
+    try {
+      // Comments older than the oldest one shown, or the post's next_cursor from a previous load
+      const params = post.comments_cursor ? `?before=${encodeURIComponent(post.comments_cursor)}` : "";
+      const res = await fetch(`${API_BASE_URL}/feed/${post.id}/comments${params}`);
+      if (!res.ok) {
+        throw new Error(`HTTP ${res.status}: ${res.statusText}`);
+      }
+      const data = await res.json();
+      setPosts(prevPosts =>
+        prevPosts.map(p =>
+          p.id === post.id
+            ? {
+                ...p,
+                // The first load re-fetches the inline comments, so it replaces them
+                comments: post.comments_cursor ? [...data.comments, ...p.comments] : data.comments,
+                comments_cursor: data.next_cursor,
+                has_more_comments: !!data.next_cursor,
+              }
+            : p
+        )
+      );
+    } catch (err) {
+      console.error("Failed to fetch comments:", err);
+    }
+  };
+
   useEffect(() => {
     if (userId) fetchFeed();
   }, [userId]);
@@ -356,7 +405,7 @@ export default function Dashboard() {
                     {post.liked_by_user ? <FavoriteIcon /> : <FavoriteBorderIcon />}
                   </IconButton>
                   <Typography variant="body2" sx={{ color: "#aaa" }}>
-                    {post.likes || post.like_count || 0} Likes • {post.comments?.length || post.comment_count || 0} Comments
+                    {post.like_count ?? post.likes ?? 0} Likes • {post.comment_count ?? post.comments?.length ?? 0} Comments
                   </Typography>
                 </Box>
 
@@ -395,6 +444,15 @@ export default function Dashboard() {
                       </Typography>
                     </Box>
                   ))}
+                  {post.has_more_comments && (
+                    <Button
+                      size="small"
+                      onClick={() => loadMoreComments(post)}
+                      sx={{ color: marshGreen, mt: 1, textTransform: "none" }}
+                    >
+                      View more comments
+                    </Button>
+                  )}
                 </Box>
               </CardContent>
             </Card>
@@ -404,6 +462,17 @@ export default function Dashboard() {
             No posts found based on your profile tags.
           </Typography>
         )}
+
+        {!loading && nextCursor && (
+          <Button
+            variant="outlined"
+            onClick={loadMorePosts}
+            disabled={loadingMore}
+            sx={{ color: marshGreen, borderColor: marshGreen }}
+          >
+            {loadingMore ? "Loading..." : "Load more"}
+          </Button>
+        )}
       </Box>
 
       {/* Floating "+ Post" Button */}
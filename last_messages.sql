@@ -0,0 +1,13 @@
+-- Latest message of each requested room in one round trip (used by /chat/conversations)
+CREATE OR REPLACE FUNCTION get_last_messages(room_ids uuid[])
+RETURNS SETOF messages
+LANGUAGE sql STABLE
+AS $$
+  SELECT DISTINCT ON (room_id) *
+  FROM messages
+  WHERE room_id = ANY(room_ids)
+  ORDER BY room_id, created_at DESC;
+$$;
+
+-- Lets the DISTINCT ON above (and per-room history queries) read one index range per room
+CREATE INDEX IF NOT EXISTS messages_room_id_created_at_idx ON messages (room_id, created_at DESC);
@@ -0,0 +1,102 @@
+-- Tables the backend reads and writes besides app_projects.sql, with the columns it uses.
+-- Not a migration: backend/fake_supabase.py builds its in-memory tables from this file,
+-- app_projects.sql and post_counters.sql when SUPABASE_BACKEND=fake.
+-- private_room_details and notification_with_sender are views; the fake computes them.
+
+CREATE TABLE IF NOT EXISTS profiles (
+  id uuid PRIMARY KEY,
+  email text,
+  username text,
+  full_name text,
+  avatar_url text,
+  bio text,
+  location text,
+  skills text[],
+  projects text[],
+  github_url text,
+  linkedin_url text,
+  stackoverflow_url text,
+  website_url text,
+  embedding vector(1024),
+  created_at timestamptz DEFAULT now(),
+  updated_at timestamptz DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS rooms (
+  id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+  name text NOT NULL,
+  type text DEFAULT 'private',
+  description text,
+  created_by uuid REFERENCES profiles(id),
+  created_at timestamptz DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS private_rooms (
+  id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+  room_id uuid REFERENCES rooms(id) ON DELETE CASCADE,
+  user1_id uuid REFERENCES profiles(id),
+  user2_id uuid REFERENCES profiles(id),
+  UNIQUE(room_id)
+);
+
+CREATE TABLE IF NOT EXISTS room_members (
+  id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+  room_id uuid REFERENCES rooms(id) ON DELETE CASCADE,
+  user_id uuid REFERENCES profiles(id) ON DELETE CASCADE,
+  role text DEFAULT 'member',
+  joined_at timestamptz DEFAULT now(),
+  UNIQUE(room_id, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS messages (
+  id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+  room_id uuid REFERENCES rooms(id) ON DELETE CASCADE,
+  sender_id uuid REFERENCES profiles(id) ON DELETE CASCADE,
+  content text NOT NULL,
+  message_type text DEFAULT 'text',
+  created_at timestamptz DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS notifications (
+  id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+  recipient_id uuid REFERENCES profiles(id) ON DELETE CASCADE,
+  sender_id uuid REFERENCES profiles(id) ON DELETE CASCADE,
+  type text NOT NULL,
+  title text,
+  message text NOT NULL,
+  reference_id uuid,
+  is_read boolean DEFAULT false,
+  read_at timestamptz,
+  created_at timestamptz DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS user_connections (
+  id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+  follower_id uuid REFERENCES profiles(id) ON DELETE CASCADE,
+  following_id uuid REFERENCES profiles(id) ON DELETE CASCADE,
+  created_at timestamptz DEFAULT now(),
+  UNIQUE(follower_id, following_id)
+);
+
+CREATE TABLE IF NOT EXISTS posts (
+  id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+  author_id uuid REFERENCES profiles(id) ON DELETE CASCADE,
+  content text NOT NULL,
+  tags text[] DEFAULT '{}',
+  created_at timestamptz DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS post_likes (
+  id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+  post_id uuid REFERENCES posts(id) ON DELETE CASCADE,
+  user_id uuid REFERENCES profiles(id) ON DELETE CASCADE,
+  created_at timestamptz DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS post_comments (
+  id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+  post_id uuid REFERENCES posts(id) ON DELETE CASCADE,
+  user_id uuid REFERENCES profiles(id) ON DELETE CASCADE,
+  text text NOT NULL,
+  created_at timestamptz DEFAULT now()
+);
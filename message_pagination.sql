@@ -0,0 +1,4 @@
+-- Keyset pagination over a room's messages on (created_at, id); see get_message_page in backend/db.py.
+-- Covers the DISTINCT ON lookup in last_messages.sql too, so that narrower index can go.
+CREATE INDEX IF NOT EXISTS messages_room_id_created_at_id_idx ON messages (room_id, created_at DESC, id DESC);
+DROP INDEX IF EXISTS messages_room_id_created_at_idx;
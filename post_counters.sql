@@ -0,0 +1,59 @@
+-- Denormalized engagement counters on posts, kept current by triggers so the feed
+-- never has to load like or comment rows just to count them
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS like_count integer NOT NULL DEFAULT 0;
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS comment_count integer NOT NULL DEFAULT 0;
+
+CREATE OR REPLACE FUNCTION bump_post_like_count()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    UPDATE posts SET like_count = like_count + 1 WHERE id = NEW.post_id;
+  ELSE
+    UPDATE posts SET like_count = GREATEST(like_count - 1, 0) WHERE id = OLD.post_id;
+  END IF;
+  RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION bump_post_comment_count()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    UPDATE posts SET comment_count = comment_count + 1 WHERE id = NEW.post_id;
+  ELSE
+    UPDATE posts SET comment_count = GREATEST(comment_count - 1, 0) WHERE id = OLD.post_id;
+  END IF;
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS post_likes_count ON post_likes;
+CREATE TRIGGER post_likes_count
+AFTER INSERT OR DELETE ON post_likes
+FOR EACH ROW EXECUTE FUNCTION bump_post_like_count();
+
+DROP TRIGGER IF EXISTS post_comments_count ON post_comments;
+CREATE TRIGGER post_comments_count
+AFTER INSERT OR DELETE ON post_comments
+FOR EACH ROW EXECUTE FUNCTION bump_post_comment_count();
+
+-- One like per user per post; lets /feed/{post_id}/like be a single idempotent upsert
+DELETE FROM post_likes a USING post_likes b
+WHERE a.post_id = b.post_id AND a.user_id = b.user_id AND a.ctid > b.ctid;
+CREATE UNIQUE INDEX IF NOT EXISTS post_likes_post_id_user_id_key ON post_likes (post_id, user_id);
+
+-- Backfill (after the de-duplication above) from the rows that exist today
+UPDATE posts p SET
+  like_count = (SELECT count(*) FROM post_likes l WHERE l.post_id = p.id),
+  comment_count = (SELECT count(*) FROM post_comments c WHERE c.post_id = p.id);
+
+-- Viewer's likes for a page of posts
+CREATE INDEX IF NOT EXISTS post_likes_user_id_post_id_idx ON post_likes (user_id, post_id);
+
+-- Feed pages and per-post comment pages, newest first
+CREATE INDEX IF NOT EXISTS posts_created_at_id_idx ON posts (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS post_comments_post_id_created_at_idx ON post_comments (post_id, created_at DESC, id DESC);